@@ -1,15 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Set, Tuple, TypeVar
+import asyncio
+import hmac
 import logging
+import json
 import jwt
 import httpx
 import os
-from datetime import datetime
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
-from core.database import get_db, SessionModel
-from services.llm_service import llm_service
+from core.config import settings
+from core.database import get_db, SessionLocal, SessionModel, JobModel, ConversationModel, TokenUsageModel
+from services.llm_service import llm_service, LLMResult
+from services.token_accounting import estimate_tokens, token_rollup
+from services.conversation import conversation_memory
+from services.bulkhead import BulkheadFullError
+from services.job_runner import job_runner, RetryJob, QUEUED, SUCCEEDED, FAILED, FINISHED
+from core.http_clients import http_clients
+from services.clerk_verifier import (
+    clerk_verifier,
+    verified_token_cache,
+    rejected_token_cache,
+    precheck_token,
+    user_id_from_claims,
+)
+from clerk_backend_api.jwks_helpers import TokenVerificationError, TokenVerificationErrorReason
 from dotenv import load_dotenv
 
 
@@ -21,10 +44,21 @@ security = HTTPBearer()
 
 load_dotenv(".env")
 
+T = TypeVar("T")
+
+# Nginx's status for a request the client closed before the response; the client never sees it
+CLIENT_CLOSED_REQUEST = 499
+CANCELLED_MESSAGE = "Cancelled: the client disconnected before the answer was complete"
+
+# Work started on behalf of a request that has already gone away; referenced so it is not collected mid-run
+_background_tasks: Set[asyncio.Task] = set()
+
 # Pydantic models
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000, description="The question to ask the LLM")
     llm_provider: str = Field(default="deepseek", description="LLM provider to use")
+    conversation: bool = Field(default=False, description="Start a conversation that follow-up questions can continue")
+    conversation_id: Optional[str] = Field(default=None, description="Continue this conversation")
 
 class QuestionResponse(BaseModel):
     answer: str
@@ -32,6 +66,37 @@ class QuestionResponse(BaseModel):
     is_successful: bool = True
     error_message: Optional[str] = ""
     session_id: Optional[int] = None
+    cache_hit: bool = False
+    llm_provider: str = ""
+    tier: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    prompt_cache_hit_tokens: Optional[int] = None
+    conversation_id: Optional[str] = None
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, description="Questions to ask, answered concurrently")
+    llm_provider: str = Field(default="deepseek", description="LLM provider to use")
+
+class BatchItemResponse(QuestionResponse):
+    index: int
+    question: str
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResponse]
+    total: int
+    successful: int
+    failed: int
+    response_time_ms: int
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error_message: Optional[str] = None
+    result: Optional[QuestionResponse] = None
 
 class SessionResponse(BaseModel):
     id: int
@@ -41,6 +106,12 @@ class SessionResponse(BaseModel):
     response_time_ms: int
     created_at: str
     is_successful: bool
+    cache_hit: bool = False
+    cancelled: bool = False
+    conversation_id: Optional[str] = None
+    tier: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
 
 class HistoryResponse(BaseModel):
     sessions: List[SessionResponse]
@@ -58,6 +129,20 @@ class DeleteResponse(BaseModel):
     message: str
     deleted_count: Optional[int] = None
 
+# Failures caused by Clerk being unreachable or a throttled JWKS refetch rather than by the token itself
+TRANSIENT_VERIFICATION_REASONS = (
+    TokenVerificationErrorReason.JWK_FAILED_TO_LOAD,
+    TokenVerificationErrorReason.JWK_REMOTE_INVALID,
+    TokenVerificationErrorReason.JWK_KID_REFETCH_RATE_LIMITED,
+)
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired authentication token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 # Enhanced Clerk JWT verification with proper security
 async def verify_clerk_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """
@@ -78,6 +163,43 @@ async def verify_clerk_token(credentials: HTTPAuthorizationCredentials = Depends
     clerk_secret_key = os.getenv('CLERK_SECRET_KEY')
     environment = os.getenv('ENVIRONMENT', 'development')
     
+    # Reuse a recent successful verification of the same token
+    cached_claims = verified_token_cache.get(token)
+    if cached_claims:
+        user_id = user_id_from_claims(cached_claims)
+        if user_id:
+            return user_id
+    
+    # Fast rejection of recently rejected or structurally invalid tokens, before any network work
+    if rejected_token_cache.is_rejected(token):
+        raise _unauthorized()
+    
+    problem = precheck_token(token, strict=environment != 'development')
+    if problem:
+        logger.warning(f"Rejected token before verification: {problem}")
+        rejected_token_cache.remember(token, problem)
+        raise _unauthorized()
+    
+    # Transient failures (Clerk unreachable) must not land the token in the negative cache
+    transient_failure = False
+    
+    # Local JWKS verification - Clerk is only contacted when the signing key (kid) is unknown
+    if clerk_verifier.enabled:
+        try:
+            claims = await clerk_verifier.verify(token)
+            user_id = user_id_from_claims(claims)
+            if user_id:
+                logger.info(f"Token verified locally for user: {user_id}")
+                verified_token_cache.put(token, claims)
+                return user_id
+            logger.error("No user ID found in verified token claims")
+        except TokenVerificationError as e:
+            logger.warning(f"Local token verification failed: {e.reason.value[0]}")
+            transient_failure = e.reason in TRANSIENT_VERIFICATION_REASONS
+        except Exception as e:
+            logger.error(f"Unexpected local verification error: {e}")
+            transient_failure = True
+    
     # For development with Clerk setup
     if environment == 'development':
         logger.info("Running in development mode with authentication")
@@ -86,26 +208,29 @@ async def verify_clerk_token(credentials: HTTPAuthorizationCredentials = Depends
         if clerk_secret_key:
             try:
                 logger.info("Attempting Clerk API verification...")
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    # Verify session with Clerk
-                    response = await client.get(
-                        f"https://api.clerk.com/v1/sessions/{token}",
-                        headers={"Authorization": f"Bearer {clerk_secret_key}"}
-                    )
-                    
-                    if response.status_code == 200:
-                        session_data = response.json()
-                        user_id = session_data.get("user_id")
-                        if user_id:
-                            logger.info(f"Successfully verified user: {user_id}")
-                            return user_id
-                    else:
-                        logger.warning(f"Clerk API returned status: {response.status_code}")
+                # Verify session with Clerk over the shared keep-alive pool
+                response = await http_clients.clerk.get(
+                    f"https://api.clerk.com/v1/sessions/{token}",
+                    headers={"Authorization": f"Bearer {clerk_secret_key}"}
+                )
+                
+                if response.status_code == 200:
+                    session_data = response.json()
+                    user_id = session_data.get("user_id")
+                    if user_id:
+                        logger.info(f"Successfully verified user: {user_id}")
+                        verified_token_cache.put(token, session_data)
+                        return user_id
+                else:
+                    logger.warning(f"Clerk API returned status: {response.status_code}")
+                    transient_failure = transient_failure or response.status_code >= 500
                         
             except httpx.TimeoutException:
                 logger.error("Clerk API request timed out")
+                transient_failure = True
             except Exception as e:
                 logger.error(f"Clerk API verification failed: {e}")
+                transient_failure = True
         
         # Option 2: Development JWT decode (if token is a JWT)
         try:
@@ -116,6 +241,8 @@ async def verify_clerk_token(credentials: HTTPAuthorizationCredentials = Depends
                 user_id = payload.get("sub") or payload.get("user_id") or payload.get("userId")
                 if user_id:
                     logger.info(f"JWT decoded successfully for user: {user_id}")
+                    # Not cached: verified_token_cache is shared with the verified paths and must
+                    # only ever hold claims whose signature was checked
                     return user_id
                 else:
                     logger.error("No user ID found in JWT payload")
@@ -128,32 +255,33 @@ async def verify_clerk_token(credentials: HTTPAuthorizationCredentials = Depends
         except Exception as e:
             logger.error(f"Unexpected JWT error: {e}")
     
-    # Production mode - strict verification
-    elif clerk_secret_key:
+    # Production mode - strict verification (Clerk API only when local verification is disabled)
+    elif clerk_secret_key and not clerk_verifier.enabled:
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"https://api.clerk.com/v1/sessions/verify",
-                    headers={"Authorization": f"Bearer {clerk_secret_key}"},
-                        json={"token": token}
-                )
-                
-                if response.status_code == 200:
-                    session_data = response.json()
-                    user_id = session_data.get("user_id")
-                    if user_id:
-                        return user_id
+            response = await http_clients.clerk.post(
+                f"https://api.clerk.com/v1/sessions/verify",
+                headers={"Authorization": f"Bearer {clerk_secret_key}"},
+                json={"token": token}
+            )
+            
+            if response.status_code == 200:
+                session_data = response.json()
+                user_id = session_data.get("user_id")
+                if user_id:
+                    verified_token_cache.put(token, session_data)
+                    return user_id
+            elif response.status_code >= 500:
+                transient_failure = True
                         
         except Exception as e:
             logger.error(f"Production Clerk verification failed: {e}")
+            transient_failure = True
     
     # If we get here, authentication failed
     logger.error("Authentication failed - invalid or expired token")
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid or expired authentication token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    if not transient_failure:
+        rejected_token_cache.remember(token, "verification-failed")
+    raise _unauthorized()
 
 # Optional authentication helper
 async def optional_auth(request: Request) -> Optional[str]:
@@ -177,9 +305,205 @@ async def optional_auth(request: Request) -> Optional[str]:
 # Initialize router
 router = APIRouter(prefix="/api/v1", tags=["QA"])
 
+def _overloaded(error: BulkheadFullError) -> HTTPException:
+    logger.warning(f"Rejecting question: {error}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The assistant is busy right now. Please try again shortly.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+def _today_start() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _tokens_used_today(db: Session, user_id: str) -> int:
+    """Tokens of today's answers plus other work done for the user, such as conversation summaries"""
+    used = db.query(func.sum(
+        func.coalesce(SessionModel.prompt_tokens, 0) + func.coalesce(SessionModel.completion_tokens, 0)
+    )).filter(
+        SessionModel.user_id == user_id,
+        SessionModel.created_at >= _today_start()
+    ).scalar()
+    other = db.query(func.sum(TokenUsageModel.prompt_tokens + TokenUsageModel.completion_tokens)).filter(
+        TokenUsageModel.user_id == user_id,
+        TokenUsageModel.created_at >= _today_start()
+    ).scalar()
+    return int(used or 0) + int(other or 0)
+
+def _completion_budget(db: Session, user_id: str, questions: List[str],
+                       history: Optional[List[Dict[str, str]]] = None) -> Optional[int]:
+    """
+    max_tokens left for each answer by the user's daily token budget, None when budgets are off.
+    Refuses the questions with a 429 when what is left would not cover useful answers.
+    """
+    if settings.USER_DAILY_TOKEN_BUDGET <= 0:
+        return None
+    remaining = settings.USER_DAILY_TOKEN_BUDGET - _tokens_used_today(db, user_id)
+    prompts = sum(llm_service.estimate_prompt_tokens(question, history) for question in questions)
+    max_tokens = (remaining - prompts) // len(questions)
+    if max_tokens < settings.TOKEN_BUDGET_MIN_COMPLETION_TOKENS:
+        logger.warning(f"Daily token budget exhausted for user {user_id} ({remaining} tokens left)")
+        reset_in = _today_start() + timedelta(days=1) - datetime.utcnow()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily token budget used up. Please try again tomorrow.",
+            headers={"Retry-After": str(int(reset_in.total_seconds()) + 1)},
+        )
+    return max_tokens
+
+def _session_model(
+    user_id: str,
+    question: str,
+    answer: str,
+    response_time: int,
+    is_successful: bool,
+    error_message: Optional[str],
+    cache_hit: bool = False,
+    llm_provider: Optional[str] = None,
+    tier: Optional[str] = None,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    prompt_cache_hit_tokens: Optional[int] = None,
+    cancelled: bool = False,
+    conversation_id: Optional[str] = None
+) -> SessionModel:
+    return SessionModel(
+        user_id=user_id,
+        question=question,
+        answer=answer,
+        response_time_ms=response_time,
+        is_successful=is_successful,
+        error_message=error_message if not is_successful else None,
+        cache_hit=cache_hit,
+        llm_provider=llm_provider or llm_service.provider,
+        tier=tier or None,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_cache_hit_tokens=prompt_cache_hit_tokens,
+        cancelled=cancelled,
+        conversation_id=conversation_id,
+        created_at=datetime.utcnow()
+    )
+
+def _session_from_result(user_id: str, question: str, result: LLMResult) -> SessionModel:
+    return _session_model(
+        user_id, question, result.answer, result.response_time_ms, result.is_successful,
+        result.error_message, result.cache_hit, result.provider, result.tier,
+        result.prompt_tokens, result.completion_tokens, result.prompt_cache_hit_tokens
+    )
+
+def _conversation_history(
+    db: Session,
+    user_id: str,
+    request: QuestionRequest
+) -> Tuple[Optional[str], Optional[List[Dict[str, str]]]]:
+    """
+    The conversation a question belongs to and the earlier turns to send with it,
+    (None, None) for a standalone question
+    """
+    if not (request.conversation or request.conversation_id):
+        return None, None
+    if not conversation_memory.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Conversation mode is disabled"
+        )
+    if request.conversation_id:
+        conversation = conversation_memory.find(db, user_id, request.conversation_id)
+        if conversation is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found or access denied"
+            )
+    else:
+        conversation = conversation_memory.start(db, user_id)
+    return conversation.id, conversation_memory.history(db, conversation)
+
+def _save_session(db: Session, user_id: str, *args, **kwargs) -> Optional[int]:
+    """
+    Store a QA session, returns the session id or None if the write failed
+    """
+    try:
+        session = _session_model(user_id, *args, **kwargs)
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+        
+        logger.info(f"Session {session.id} created for user {user_id}")
+        return session.id
+        
+    except Exception as db_error:
+        logger.error(f"Database error for user {user_id}: {str(db_error)}")
+        db.rollback()
+        # Continue without storing - the user still gets their answer
+        return None
+
+def _save_sessions(db: Session, user_id: str, answered: List[Any]) -> List[Optional[int]]:
+    """
+    Store the (question, LLMResult) pairs of a batch in one transaction.
+    Returns their session ids, all None if the write failed.
+    """
+    try:
+        sessions = [_session_from_result(user_id, question, result) for question, result in answered]
+        db.add_all(sessions)
+        # Flushing assigns the ids; expire_on_commit would otherwise reload each row separately
+        db.flush()
+        session_ids = [session.id for session in sessions]
+        db.commit()
+        
+        logger.info(f"{len(session_ids)} batch sessions created for user {user_id}")
+        return session_ids
+        
+    except Exception as db_error:
+        logger.error(f"Database error storing batch for user {user_id}: {str(db_error)}")
+        db.rollback()
+        return [None] * len(answered)
+
+def _save_session_standalone(*args, **kwargs) -> Optional[int]:
+    """
+    Store a QA session with its own database session, for work that outlives the request dependencies
+    """
+    db = SessionLocal()
+    try:
+        return _save_session(db, *args, **kwargs)
+    finally:
+        db.close()
+
+def _spawn(coroutine: Awaitable[Any]):
+    task = asyncio.ensure_future(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def _until_disconnected(http_request: Request):
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL_SECONDS)
+
+async def _unless_disconnected(http_request: Request, work: Awaitable[T]) -> Optional[T]:
+    """
+    Await work, cancelling it if the client disconnects first.
+    Cancelling releases the bulkhead slot and closes the upstream connection. Returns None if cancelled.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_until_disconnected(http_request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if not task.done() or task.cancelled():
+        await asyncio.gather(task, return_exceptions=True)
+        return None
+    return task.result()
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/qa/ask", response_model=QuestionResponse)
 async def ask_question(
     request: QuestionRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(verify_clerk_token),
     db: Session = Depends(get_db)
 ):
@@ -196,51 +520,62 @@ async def ask_question(
                 detail="Question cannot be empty"
             )
         
+        conversation_id, history = _conversation_history(db, user_id, request)
+        max_tokens = _completion_budget(db, user_id, [request.question], history)
+        
         # Get answer from LLM service
         start_time = datetime.utcnow()
         try:
-            answer, response_time, is_successful, error_message = await llm_service.get_answer(
+            result = await _unless_disconnected(http_request, llm_service.get_answer(
                 question=request.question,
                 user_id=user_id,
-                llm_provider=request.llm_provider
-            )
+                llm_provider=request.llm_provider,
+                max_tokens=max_tokens,
+                history=history
+            ))
+        except BulkheadFullError as overload:
+            raise _overloaded(overload)
         except Exception as llm_error:
             logger.error(f"LLM service error: {llm_error}")
-            answer = "I apologize, but I encountered an error processing your question."
+            result = LLMResult(
+                answer="I apologize, but I encountered an error processing your question.",
+                response_time_ms=int((datetime.utcnow() - start_time).total_seconds() * 1000),
+                is_successful=False,
+                error_message=str(llm_error)
+            )
+        
+        if result is None:
             response_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            is_successful = False
-            error_message = str(llm_error)
+            logger.info(f"Client disconnected, cancelled question for user {user_id} after {response_time}ms")
+            _save_session(db, user_id, request.question, "", response_time, False, CANCELLED_MESSAGE,
+                          cancelled=True, conversation_id=conversation_id)
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=CANCELLED_MESSAGE)
         
         # Store the session in database
-        session_id = None
-        try:
-            session = SessionModel(
-                user_id=user_id,
-                question=request.question,
-                answer=answer,
-                response_time_ms=response_time,
-                is_successful=is_successful,
-                error_message=error_message if not is_successful else None,
-                created_at=datetime.utcnow()
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-            session_id = session.id
-            
-            logger.info(f"Session {session_id} created for user {user_id}")
-            
-        except Exception as db_error:
-            logger.error(f"Database error for user {user_id}: {str(db_error)}")
-            db.rollback()
-            # Continue without storing - the user still gets their answer
+        session_id = _save_session(
+            db, user_id, request.question, result.answer, result.response_time_ms,
+            result.is_successful, result.error_message, cache_hit=result.cache_hit,
+            llm_provider=result.provider, tier=result.tier,
+            prompt_tokens=result.prompt_tokens, completion_tokens=result.completion_tokens,
+            prompt_cache_hit_tokens=result.prompt_cache_hit_tokens, conversation_id=conversation_id
+        )
+        if conversation_id:
+            # Summarize old turns once the answer is out, not in front of the next question
+            background_tasks.add_task(conversation_memory.compact, conversation_id)
         
         return QuestionResponse(
-            answer=answer,
-            response_time_ms=response_time,
-            is_successful=is_successful,
-            error_message=error_message if not is_successful else "",
-            session_id=session_id
+            answer=result.answer,
+            response_time_ms=result.response_time_ms,
+            is_successful=result.is_successful,
+            error_message=result.error_message if not result.is_successful else "",
+            session_id=session_id,
+            cache_hit=result.cache_hit,
+            llm_provider=result.provider,
+            tier=result.tier,
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            prompt_cache_hit_tokens=result.prompt_cache_hit_tokens,
+            conversation_id=conversation_id
         )
             
     except HTTPException:
@@ -252,6 +587,376 @@ async def ask_question(
             detail="Failed to process question. Please try again."
         )
 
+@router.post("/qa/ask/batch", response_model=BatchResponse)
+async def ask_question_batch(
+    request: BatchQuestionRequest,
+    user_id: str = Depends(verify_clerk_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Ask several questions at once for the authenticated user.
+    Questions are answered concurrently, at most QA_BATCH_CONCURRENCY at a time, and all sessions
+    are stored in one transaction. Results keep the request order; a failed question does not fail
+    the others.
+    """
+    if len(request.questions) > settings.QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.QA_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    if any(not question.strip() or len(question) > 1000 for question in request.questions):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Questions must be between 1 and 1000 characters"
+        )
+    
+    logger.info(f"Batch of {len(request.questions)} questions received from user {user_id}")
+    max_tokens = _completion_budget(db, user_id, request.questions)
+    start_time = datetime.utcnow()
+    limit = asyncio.Semaphore(max(1, settings.QA_BATCH_CONCURRENCY))
+    
+    async def answer(question: str) -> LLMResult:
+        item_start = datetime.utcnow()
+        async with limit:
+            try:
+                return await llm_service.get_answer(
+                    question=question,
+                    user_id=user_id,
+                    llm_provider=request.llm_provider,
+                    max_tokens=max_tokens
+                )
+            except BulkheadFullError as overload:
+                error_message = f"The assistant is busy right now. Please retry in {overload.retry_after} seconds."
+            except Exception as llm_error:
+                logger.error(f"LLM service error in batch for user {user_id}: {llm_error}")
+                error_message = str(llm_error)
+        return LLMResult(
+            answer="",
+            response_time_ms=int((datetime.utcnow() - item_start).total_seconds() * 1000),
+            is_successful=False,
+            error_message=error_message
+        )
+    
+    results = await asyncio.gather(*(answer(question) for question in request.questions))
+    session_ids = _save_sessions(db, user_id, list(zip(request.questions, results)))
+    
+    items = [
+        BatchItemResponse(
+            index=index,
+            question=question,
+            answer=result.answer,
+            response_time_ms=result.response_time_ms,
+            is_successful=result.is_successful,
+            error_message=result.error_message if not result.is_successful else "",
+            session_id=session_id,
+            cache_hit=result.cache_hit,
+            llm_provider=result.provider,
+            tier=result.tier,
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            prompt_cache_hit_tokens=result.prompt_cache_hit_tokens
+        )
+        for index, (question, result, session_id) in enumerate(zip(request.questions, results, session_ids))
+    ]
+    successful = sum(1 for item in items if item.is_successful)
+    return BatchResponse(
+        results=items,
+        total=len(items),
+        successful=successful,
+        failed=len(items) - successful,
+        response_time_ms=int((datetime.utcnow() - start_time).total_seconds() * 1000)
+    )
+
+@router.post("/qa/ask/stream")
+async def ask_question_stream(
+    request: QuestionRequest,
+    http_request: Request,
+    user_id: str = Depends(verify_clerk_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Ask a question and stream the answer as Server-Sent Events.
+    Emits "delta" events with answer fragments as they arrive, then a final "done" event
+    with the session_id and timings once the session has been stored. If the client goes away
+    the upstream stream is closed and the partial answer is stored as a cancelled session.
+    """
+    if not request.question.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question cannot be empty"
+        )
+    
+    logger.info(f"Streaming question received from user {user_id}: {request.question[:50]}...")
+    conversation_id, history = _conversation_history(db, user_id, request)
+    max_tokens = _completion_budget(db, user_id, [request.question], history)
+    start_time = time.time()
+    
+    events = llm_service.stream_answer(
+        question=request.question,
+        user_id=user_id,
+        llm_provider=request.llm_provider,
+        max_tokens=max_tokens,
+        history=history
+    )
+    # Wait for the first event before sending headers, so an overloaded provider still gets a real 503
+    try:
+        first_event = await _unless_disconnected(http_request, events.__anext__())
+    except BulkheadFullError as overload:
+        raise _overloaded(overload)
+    if first_event is None:
+        response_time = int((time.time() - start_time) * 1000)
+        logger.info(f"Client disconnected before the stream started for user {user_id} after {response_time}ms")
+        _save_session(db, user_id, request.question, "", response_time, False, CANCELLED_MESSAGE,
+                      cancelled=True, conversation_id=conversation_id)
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=CANCELLED_MESSAGE)
+    
+    async def relay():
+        yield first_event
+        async for event in events:
+            yield event
+    
+    async def cancelled(parts: List[str]):
+        # Runs as its own task: the streaming task is being torn down and may not await any more
+        await events.aclose()
+        answer = "".join(parts).strip()
+        response_time = int((time.time() - start_time) * 1000)
+        logger.info(f"Client disconnected mid-stream for user {user_id} after {response_time}ms")
+        await run_in_threadpool(
+            _save_session_standalone, user_id, request.question, answer, response_time, False, CANCELLED_MESSAGE,
+            prompt_tokens=llm_service.estimate_prompt_tokens(request.question, history) if parts else None,
+            completion_tokens=estimate_tokens(answer) if parts else None,
+            cancelled=True,
+            conversation_id=conversation_id
+        )
+    
+    async def event_stream():
+        result = None
+        parts = []
+        try:
+            async for event in relay():
+                if event["type"] == "delta":
+                    parts.append(event["content"])
+                    yield _sse("delta", {"content": event["content"]})
+                else:
+                    result = event
+        except (asyncio.CancelledError, GeneratorExit):
+            # Starlette cancels the response, or stops iterating it, once the client disconnects
+            _spawn(cancelled(parts))
+            raise
+        
+        # The request scoped db session is already closed once streaming starts, use a fresh one
+        session_id = await run_in_threadpool(
+            _save_session_standalone,
+            user_id,
+            request.question,
+            result["answer"],
+            result["response_time_ms"],
+            result["is_successful"],
+            result["error_message"],
+            result["cache_hit"],
+            result["provider"],
+            result["tier"],
+            result["prompt_tokens"],
+            result["completion_tokens"],
+            result["prompt_cache_hit_tokens"],
+            conversation_id=conversation_id
+        )
+        
+        yield _sse("done", {
+            "session_id": session_id,
+            "response_time_ms": result["response_time_ms"],
+            "time_to_first_token_ms": result["time_to_first_token_ms"],
+            "is_successful": result["is_successful"],
+            "error_message": result["error_message"],
+            "cache_hit": result["cache_hit"],
+            "llm_provider": result["provider"],
+            "tier": result["tier"],
+            "prompt_tokens": result["prompt_tokens"],
+            "completion_tokens": result["completion_tokens"],
+            "prompt_cache_hit_tokens": result["prompt_cache_hit_tokens"],
+            "conversation_id": conversation_id
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Summarize old turns once the stream has ended, not in front of the next question
+        background=BackgroundTask(conversation_memory.compact, conversation_id) if conversation_id else None
+    )
+
+def _load_job(job_id: str) -> Optional[JobModel]:
+    db = SessionLocal()
+    try:
+        return db.query(JobModel).filter(JobModel.id == job_id).first()
+    finally:
+        db.close()
+
+def _finish_job(job_id: str, result: LLMResult):
+    """
+    Store a finished job's answer as a session and mark the job done, in one transaction
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(JobModel).filter(JobModel.id == job_id).first()
+        session = _session_from_result(job.user_id, job.question, result)
+        db.add(session)
+        db.flush()
+        job.status = SUCCEEDED if result.is_successful else FAILED
+        job.session_id = session.id
+        job.error_message = result.error_message if not result.is_successful else None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Job {job_id} {job.status}, session {session.id} created for user {job.user_id}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def _run_job(job_id: str):
+    """Answer a claimed job's question; runs in the background on the job runner"""
+    job = await run_in_threadpool(_load_job, job_id)
+    start_time = datetime.utcnow()
+    try:
+        result = await llm_service.get_answer(
+            question=job.question,
+            user_id=job.user_id,
+            llm_provider=job.llm_provider,
+            max_tokens=job.max_tokens
+        )
+    except BulkheadFullError as overload:
+        # Nobody is waiting on the connection, so wait for a free slot instead of failing
+        logger.info(f"Job {job_id} deferred for {overload.retry_after}s: {overload}")
+        raise RetryJob(overload.retry_after)
+    except Exception as llm_error:
+        logger.error(f"LLM service error in job {job_id}: {llm_error}")
+        result = LLMResult(
+            answer="I apologize, but I encountered an error processing your question.",
+            response_time_ms=int((datetime.utcnow() - start_time).total_seconds() * 1000),
+            is_successful=False,
+            error_message=str(llm_error)
+        )
+    await run_in_threadpool(_finish_job, job_id, result)
+
+job_runner.set_handler(_run_job)
+
+def _job_response(db: Session, job: JobModel) -> JobResponse:
+    result = None
+    if job.session_id is not None:
+        session = db.query(SessionModel).filter(SessionModel.id == job.session_id).first()
+        if session is not None:
+            result = QuestionResponse(
+                answer=session.answer,
+                response_time_ms=session.response_time_ms,
+                is_successful=session.is_successful,
+                error_message=session.error_message or "",
+                session_id=session.id,
+                cache_hit=bool(session.cache_hit),
+                llm_provider=session.llm_provider or "",
+                tier=session.tier or "",
+                prompt_tokens=session.prompt_tokens or 0,
+                completion_tokens=session.completion_tokens or 0,
+                prompt_cache_hit_tokens=session.prompt_cache_hit_tokens
+            )
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at.isoformat(),
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+        error_message=job.error_message,
+        result=result
+    )
+
+@router.post("/qa/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    request: QuestionRequest,
+    response: Response,
+    user_id: str = Depends(verify_clerk_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a question and return its job id straight away.
+    The answer is generated in the background and stored as a session; poll GET /qa/jobs/{job_id}.
+    """
+    if not request.question.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question cannot be empty"
+        )
+    
+    max_tokens = _completion_budget(db, user_id, [request.question])
+    try:
+        job = JobModel(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            question=request.question,
+            llm_provider=request.llm_provider,
+            max_tokens=max_tokens,
+            status=QUEUED,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception as e:
+        logger.error(f"Error creating job for user {user_id}: {str(e)}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue question. Please try again."
+        )
+    
+    if settings.JOB_RUN_IN_PROCESS:
+        job_runner.submit(job.id)
+    logger.info(f"Job {job.id} queued for user {user_id}: {request.question[:50]}...")
+    response.headers["Location"] = f"{router.prefix}/qa/jobs/{job.id}"
+    return _job_response(db, job)
+
+@router.get("/qa/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    wait: float = 0,
+    user_id: str = Depends(verify_clerk_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a job's status, and its answer once finished.
+    With wait > 0 this long-polls: it returns as soon as the job finishes, or after wait seconds
+    (at most JOB_MAX_WAIT_SECONDS) with the job still queued or running.
+    """
+    deadline = time.monotonic() + max(0.0, min(wait, settings.JOB_MAX_WAIT_SECONDS))
+    while True:
+        job = db.query(JobModel).filter(JobModel.id == job_id, JobModel.user_id == user_id).first()
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found or access denied"
+            )
+        remaining = deadline - time.monotonic()
+        if job.status in FINISHED or remaining <= 0:
+            return _job_response(db, job)
+        
+        # End the read transaction so the next look sees what other instances committed
+        db.rollback()
+        if job_runner.runs(job_id):
+            await job_runner.wait(job_id, remaining)
+        else:
+            await asyncio.sleep(min(remaining, settings.JOB_POLL_INTERVAL_SECONDS))
+
+@router.get("/cron/jobs")
+async def run_queued_jobs(request: Request):
+    """
+    Run queued jobs and requeue stale ones, within this request.
+    For serverless hosts, where background work stops when a response is sent; call it on a
+    schedule (Vercel Cron) with Authorization: Bearer CRON_SECRET.
+    """
+    expected = f"Bearer {settings.CRON_SECRET}"
+    if not settings.CRON_SECRET or not hmac.compare_digest(request.headers.get("authorization", ""), expected):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return await job_runner.drain(settings.JOB_CRON_MAX_SECONDS, settings.JOB_CRON_MAX_JOBS)
+
 @router.get("/qa/history", response_model=HistoryResponse)
 async def get_user_history(
     page: int = 1,
@@ -288,6 +993,12 @@ async def get_user_history(
                 llm_provider=session.llm_provider or "deepseek",
                 response_time_ms=session.response_time_ms,
                 is_successful=session.is_successful,
+                cache_hit=bool(session.cache_hit),
+                cancelled=bool(session.cancelled),
+                conversation_id=session.conversation_id,
+                tier=session.tier,
+                prompt_tokens=session.prompt_tokens,
+                completion_tokens=session.completion_tokens,
                 created_at=session.created_at.isoformat() if session.created_at else datetime.utcnow().isoformat()
             ))
         
@@ -361,6 +1072,8 @@ async def clear_user_history(
     """
     try:
         deleted_count = db.query(SessionModel).filter(SessionModel.user_id == user_id).delete()
+        # Conversation summaries are history too
+        db.query(ConversationModel).filter(ConversationModel.user_id == user_id).delete()
         db.commit()
         
         logger.info(f"Cleared {deleted_count} sessions for user {user_id}")
@@ -423,6 +1136,39 @@ async def health_check(user_id: Optional[str] = Depends(optional_auth)):
             llm_service_status={"status": "error", "error": str(e)}
         )
 
+@router.get("/metrics")
+async def get_metrics():
+    """Cache and runtime metrics for performance monitoring"""
+    return {
+        "llm": llm_service.metrics(),
+        "jobs": job_runner.stats(),
+        "conversations": conversation_memory.stats(),
+        "auth": {
+            "verified_token_cache": verified_token_cache.stats(),
+            "rejected_token_cache": rejected_token_cache.stats(),
+            "jwks": clerk_verifier.jwks.stats()
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+async def require_admin(user_id: str = Depends(verify_clerk_token)) -> str:
+    """Authenticated user who is listed in ADMIN_USER_IDS"""
+    if user_id not in settings.ADMIN_USER_IDS:
+        logger.warning(f"User {user_id} denied access to an admin route")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user_id
+
+@router.get("/admin/usage")
+async def get_admin_usage(limit: int = 10, admin_id: str = Depends(require_admin)):
+    """Heaviest users by generation time since startup; names users, so admins only"""
+    return {
+        "top_users_by_generation_time": token_rollup.top_users(max(1, min(100, limit))),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 # Simple health endpoint for basic monitoring
 @router.get("/health/simple")
 async def simple_health_check():
@@ -457,11 +1203,26 @@ async def get_user_stats(
         if avg_response:
             avg_response_time = sum(r[0] for r in avg_response if r[0]) / len(avg_response)
         
+        # Latency per answer tier, cache hits excluded so they do not flatter the fast tier
+        tier_rows = db.query(
+            SessionModel.tier,
+            func.count(SessionModel.id),
+            func.avg(SessionModel.response_time_ms)
+        ).filter(
+            SessionModel.user_id == user_id,
+            SessionModel.is_successful == True,
+            func.coalesce(SessionModel.cache_hit, False) == False
+        ).group_by(SessionModel.tier).all()
+        
         return {
             "total_sessions": total_sessions,
             "successful_sessions": successful_sessions,
             "success_rate": (successful_sessions / total_sessions * 100) if total_sessions > 0 else 0,
-            "average_response_time_ms": round(avg_response_time, 2)
+            "average_response_time_ms": round(avg_response_time, 2),
+            "by_tier": {
+                (tier or "untiered"): {"sessions": count, "average_response_time_ms": round(float(avg or 0), 2)}
+                for tier, count, avg in tier_rows
+            }
         }
         
     except Exception as e:
@@ -470,3 +1231,80 @@ async def get_user_stats(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve user statistics"
         )
+
+@router.get("/qa/usage")
+async def get_user_usage(
+    user_id: str = Depends(verify_clerk_token),
+    db: Session = Depends(get_db)
+):
+    """Token usage for the user: today's spend against the daily budget, and totals per answer tier"""
+    try:
+        used_today = _tokens_used_today(db, user_id)
+        budget = settings.USER_DAILY_TOKEN_BUDGET
+        
+        tier_rows = db.query(
+            SessionModel.tier,
+            func.count(SessionModel.id),
+            func.sum(func.coalesce(SessionModel.prompt_tokens, 0)),
+            func.sum(func.coalesce(SessionModel.completion_tokens, 0)),
+            func.sum(SessionModel.response_time_ms),
+            func.sum(SessionModel.prompt_cache_hit_tokens),
+            # Only prompts whose provider reports prefix caching count towards the hit ratio
+            func.sum(case((SessionModel.prompt_cache_hit_tokens.isnot(None), SessionModel.prompt_tokens), else_=0))
+        ).filter(
+            SessionModel.user_id == user_id,
+            func.coalesce(SessionModel.cache_hit, False) == False
+        ).group_by(SessionModel.tier).all()
+        
+        by_tier = {
+            (tier or "untiered"): {
+                "sessions": count,
+                "prompt_tokens": int(prompt or 0),
+                "completion_tokens": int(completion or 0),
+                "generation_ms": int(generation or 0),
+                "prompt_cache_hit_tokens": int(cache_hits or 0),
+                "prompt_cache_hit_ratio": round(cache_hits / cacheable, 4) if cacheable else None
+            }
+            for tier, count, prompt, completion, generation, cache_hits, cacheable in tier_rows
+        }
+        # Tokens spent on the user's behalf outside answers, e.g. conversation summaries
+        usage_rows = db.query(
+            TokenUsageModel.purpose,
+            func.count(TokenUsageModel.id),
+            func.sum(TokenUsageModel.prompt_tokens),
+            func.sum(TokenUsageModel.completion_tokens),
+            func.sum(TokenUsageModel.response_time_ms)
+        ).filter(TokenUsageModel.user_id == user_id).group_by(TokenUsageModel.purpose).all()
+        for purpose, count, prompt, completion, generation in usage_rows:
+            by_tier[purpose] = {
+                "sessions": count,
+                "prompt_tokens": int(prompt or 0),
+                "completion_tokens": int(completion or 0),
+                "generation_ms": int(generation or 0),
+                "prompt_cache_hit_tokens": 0,
+                "prompt_cache_hit_ratio": None
+            }
+        cache_hits = sum(t["prompt_cache_hit_tokens"] for t in by_tier.values())
+        cacheable = sum(int(row[6] or 0) for row in tier_rows)
+        return {
+            "today": {
+                "tokens": used_today,
+                "daily_budget": budget or None,
+                "remaining": max(0, budget - used_today) if budget > 0 else None
+            },
+            "total": {
+                "prompt_tokens": sum(t["prompt_tokens"] for t in by_tier.values()),
+                "completion_tokens": sum(t["completion_tokens"] for t in by_tier.values()),
+                "generation_ms": sum(t["generation_ms"] for t in by_tier.values()),
+                "prompt_cache_hit_tokens": cache_hits,
+                "prompt_cache_hit_ratio": round(cache_hits / cacheable, 4) if cacheable else None
+            },
+            "by_tier": by_tier
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting token usage for user {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve token usage"
+        )
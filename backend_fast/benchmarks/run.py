@@ -0,0 +1,321 @@
+"""
+End-to-end performance benchmarks.
+
+Drives the FastAPI app in-process through httpx's ASGI transport, against a local SQLite database
+seeded with sessions and the mock LLM provider, so runs are offline and comparable. Tokens are
+RS256 JWTs signed with a key generated per run and verified locally (CLERK_JWT_KEY). The app runs
+with ENVIRONMENT=production, so tokens take the production verification path, only without the
+network, and none of the development fallbacks.
+
+From backend_fast/:
+
+    python -m benchmarks.run --rows 100000 --output baseline.json
+    python -m benchmarks.run --rows 100000 --baseline baseline.json --max-regression 0.2
+
+With --baseline the run exits with status 1 when a scenario's p50 or p95 latency grew, or its
+throughput fell, by more than --max-regression (a fraction) compared with the baseline file.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+SCENARIOS = ["history_first_page", "history_deep_page", "stats", "auth_cached", "auth_cold", "ask"]
+PAGE_SIZE = 50
+AUTHORIZED_PARTY = "http://localhost:3000"
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'qa_bench.db')}"
+QUESTION_PREFIX = "Benchmark run"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / count, 3) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3) if count else 0.0,
+    }
+
+
+async def measure(call: Callable[[int], Awaitable[bool]], requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """
+    Run call(i) for i in range(requests) on concurrency workers and time each call.
+    call returns False for a failed request; exceptions count as failures too.
+    """
+    for i in range(warmup):
+        await call(-1 - i)
+
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                ok = await call(index)
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            max_regression: float, min_delta_ms: float) -> List[str]:
+    """Regressions of results against baseline; latency changes under min_delta_ms are noise"""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            limit = before[metric] * (1 + max_regression)
+            if current[metric] > limit and current[metric] - before[metric] > min_delta_ms:
+                regressions.append(f"{name}: {metric} {current[metric]} > {round(limit, 3)} (baseline {before[metric]})")
+        floor = before["throughput_rps"] * (1 - max_regression)
+        if current["throughput_rps"] < floor:
+            regressions.append(f"{name}: throughput_rps {current['throughput_rps']} < {round(floor, 2)} "
+                               f"(baseline {before['throughput_rps']})")
+        if current["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error_rate {current['error_rate']} (baseline {before['error_rate']})")
+    return regressions
+
+
+def _signing_key():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_key, public_pem
+
+
+def _token(private_key, user_id: str) -> str:
+    import jwt
+
+    now = datetime.utcnow()
+    claims = {
+        "sub": user_id,
+        "azp": AUTHORIZED_PARTY,
+        "iat": now,
+        "nbf": now - timedelta(seconds=5),
+        "exp": now + timedelta(hours=1),
+        "jti": uuid.uuid4().hex,  # Distinct tokens, so each one misses the verified token cache
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256")
+
+
+def _configure_environment(args: argparse.Namespace, public_pem: str):
+    """Settings are read at import, so everything is pinned before the app is imported"""
+    os.environ.update(
+        DATABASE_URL=args.database_url,
+        ENVIRONMENT="production",
+        # No real providers or Clerk API: every call stays in the process
+        DEEPSEEK_API_KEY="",
+        OPENAI_API_KEY="",
+        ANTHROPIC_API_KEY="",
+        GOOGLE_API_KEY="",
+        CLERK_SECRET_KEY="",
+        CLERK_PUBLISHABLE_KEY="",
+        CLERK_JWT_KEY=public_pem,
+        CLERK_VERIFICATION_MODE="jwks",
+        CLERK_AUTHORIZED_PARTIES=AUTHORIZED_PARTY,
+        MOCK_LLM_ENABLED="true",
+        LLM_PROVIDER="mock",
+        MOCK_LLM_LATENCY=args.llm_latency,
+        MOCK_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        USER_DAILY_TOKEN_BUDGET="0",
+    )
+    if not args.answer_cache:
+        # Otherwise most asks after the first few are answer cache or near-duplicate hits
+        os.environ.update(ANSWER_CACHE_ENABLED="false", NEAR_DUP_ENABLED="false")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    private_key, public_pem = _signing_key()
+    _configure_environment(args, public_pem)
+
+    # Imported here, after the environment above is in place
+    import httpx
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    from api.endpoints.qa import verify_clerk_token
+    from benchmarks.seed import BENCH_USER, seed_sessions, session_counts
+    from core.database import SessionLocal, SessionModel, init_database
+    from main import app
+
+    logging.getLogger().setLevel(args.log_level)
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(args.log_level)
+
+    init_database()
+    counts = session_counts()
+    if counts["total"] != args.rows and not (args.reseed or counts["total"] == 0 or args.database_url == DEFAULT_DATABASE_URL):
+        # Seeding replaces the sessions table, never do that to a database that may be real by accident
+        raise SystemExit(f"{args.database_url} has {counts['total']} sessions, not {args.rows}; pass --reseed to replace them")
+    if args.reseed or counts["total"] != args.rows:
+        print(f"Seeding {args.rows} sessions...", file=sys.stderr)
+        started = time.perf_counter()
+        seed_sessions(args.rows, users=args.users, bench_user_share=args.bench_user_share)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        counts = session_counts()
+    deep_page = max(1, math.ceil(counts["bench_user"] / PAGE_SIZE))
+
+    cached_token = _token(private_key, BENCH_USER)
+    cold_tokens = [_token(private_key, BENCH_USER) for _ in range(args.requests + args.warmup)]
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Authorization": f"Bearer {cached_token}"}, timeout=60) as client:
+
+            async def get(path: str) -> bool:
+                response = await client.get(path)
+                return response.status_code == 200
+
+            async def auth(token: str) -> bool:
+                return await verify_clerk_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)) == BENCH_USER
+
+            async def ask(index: int) -> bool:
+                question = f"{QUESTION_PREFIX} {run_id} question {index}: does a Chilean citizen need a visa for Peru?"
+                response = await client.post("/api/v1/qa/ask", json={"question": question, "llm_provider": "mock"})
+                return response.status_code == 200 and response.json().get("is_successful", False)
+
+            calls = {
+                "history_first_page": lambda i: get(f"/api/v1/qa/history?page=1&size={PAGE_SIZE}"),
+                "history_deep_page": lambda i: get(f"/api/v1/qa/history?page={deep_page}&size={PAGE_SIZE}"),
+                "stats": lambda i: get("/api/v1/qa/stats"),
+                "auth_cached": lambda i: auth(cached_token),
+                "auth_cold": lambda i: auth(cold_tokens[i]),
+                "ask": ask,
+            }
+            try:
+                for name in args.scenarios:
+                    print(f"Running {name}...", file=sys.stderr)
+                    results[name] = await measure(calls[name], args.requests, args.concurrency, args.warmup)
+            finally:
+                # Leave the seeded data as it was, so the next run measures the same table
+                db = SessionLocal()
+                try:
+                    db.query(SessionModel).filter(
+                        SessionModel.question.like(f"{QUESTION_PREFIX} {run_id} %")
+                    ).delete(synchronize_session=False)
+                    db.commit()
+                finally:
+                    db.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rows": counts["total"],
+            "bench_user_rows": counts["bench_user"],
+            "deep_page": deep_page,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "llm_latency": args.llm_latency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "answer_cache": args.answer_cache,
+        },
+        "results": results,
+    }
+
+
+def _print_table(results: Dict[str, Dict[str, Any]]):
+    print(f"{'scenario':<20} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['throughput_rps']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10} {r['errors']:>7}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="In-process end-to-end benchmarks of the Q&A API")
+    parser.add_argument("--rows", type=int, default=100000, help="Sessions to seed the database with")
+    parser.add_argument("--users", type=int, default=1000, help="Other users the seeded sessions are spread over")
+    parser.add_argument("--bench-user-share", type=float, default=0.1,
+                        help="Share of seeded sessions belonging to the benchmark user")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--reseed", action="store_true",
+                        help="Replace the sessions table even if its row count already matches")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-latency", choices=["fixed", "lognormal", "replay"], default="fixed")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="Mock provider latency; 0 measures the service's own overhead")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache and near-duplicate matching on")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with the results JSON of an earlier run and fail on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Latency increases smaller than this are never regressions")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    _print_table(report["results"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("rows", "concurrency", "llm_latency_ms"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"Warning: baseline was run with {key}={baseline['meta'].get(key)}, this run with "
+                      f"{key}={report['meta'][key]}", file=sys.stderr)
+        regressions = compare(report["results"], baseline["results"], args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("Performance regressions:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
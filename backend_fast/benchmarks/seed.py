@@ -0,0 +1,70 @@
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import func
+
+from core.database import engine, SessionLocal, SessionModel
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BENCH_USER = "user_bench"
+BATCH_SIZE = 10000
+
+_DESTINATIONS = ["Peru", "Japan", "Kenya", "Canada", "Vietnam", "Brazil", "India", "Turkey", "Egypt", "Australia"]
+_NATIONALITIES = ["Chilean", "German", "Indian", "Nigerian", "American", "Filipino", "Mexican", "Polish"]
+_TIERS = ["fast", "full", None]
+
+
+def session_counts() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {
+            "total": db.query(func.count(SessionModel.id)).scalar(),
+            "bench_user": db.query(func.count(SessionModel.id)).filter(SessionModel.user_id == BENCH_USER).scalar(),
+        }
+    finally:
+        db.close()
+
+
+def seed_sessions(rows: int, users: int = 1000, bench_user_share: float = 0.1, seed: int = 0):
+    """
+    Fill the sessions table with rows plausible sessions, bench_user_share of them belonging to
+    BENCH_USER (the user the benchmarks authenticate as) and the rest spread over other users.
+    Rows are inserted in batches with executemany, which is orders of magnitude faster than the ORM.
+    """
+    rng = random.Random(seed)
+    table = SessionModel.__table__
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / max(rows, 1)
+
+    with engine.begin() as conn:
+        conn.execute(table.delete())
+        for offset in range(0, rows, BATCH_SIZE):
+            batch = []
+            for index in range(offset, min(offset + BATCH_SIZE, rows)):
+                destination = rng.choice(_DESTINATIONS)
+                successful = rng.random() > 0.03
+                cache_hit = successful and rng.random() < 0.2
+                completion_tokens = rng.randint(80, 900) if successful else None
+                batch.append({
+                    "user_id": BENCH_USER if rng.random() < bench_user_share else f"user_{rng.randrange(users)}",
+                    "question": f"Does a {rng.choice(_NATIONALITIES)} citizen need a visa for {destination}? #{index}",
+                    "answer": (f"Travel requirements for {destination}. " * 12) if successful else "",
+                    "llm_provider": "deepseek",
+                    "response_time_ms": rng.randint(5, 40) if cache_hit else int(rng.lognormvariate(7.6, 0.5)),
+                    "is_successful": successful,
+                    "error_message": None if successful else "Failed to get response from DeepSeek API",
+                    "cache_hit": cache_hit,
+                    "tier": rng.choice(_TIERS),
+                    "prompt_tokens": rng.randint(150, 400) if successful else None,
+                    "completion_tokens": completion_tokens,
+                    "cancelled": False,
+                    "created_at": start + step * index,
+                })
+            conn.execute(table.insert(), batch)
+            if (offset // BATCH_SIZE) % 10 == 9:
+                logger.info(f"Seeded {offset + len(batch)} of {rows} sessions")
+    logger.info(f"Seeded {rows} sessions")
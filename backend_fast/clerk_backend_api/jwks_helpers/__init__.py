@@ -12,6 +12,10 @@ from .verifytoken import (
     VerifyTokenOptions,
     verify_token,
 )
+from .asyncjwks import (
+    AsyncJWKSProvider,
+    verify_token_async,
+)
 
 __all__ = [
     "AuthErrorReason",
@@ -23,5 +27,7 @@ __all__ = [
     "TokenVerificationErrorReason",
     "VerifyTokenOptions",
     "verify_token",
+    "AsyncJWKSProvider",
+    "verify_token_async",
     "Requestish",
 ]
@@ -0,0 +1,223 @@
+import asyncio
+import re
+import time
+import httpx
+import jwt
+from typing import Any, Dict, Optional
+
+from .verifytoken import (
+    TokenVerificationError,
+    TokenVerificationErrorReason,
+    VerifyTokenOptions,
+    decode_token,
+    jwk_to_pem,
+)
+
+
+class AsyncJWKSProvider:
+    """
+    Non-blocking JWKS provider for async applications.
+
+    Keys are fetched with an httpx.AsyncClient and kept in memory per kid. Concurrent
+    cache misses share a single in-flight fetch, the key set is refreshed in the background
+    shortly before it expires, and refetches triggered by unknown kids are rate limited so
+    forged tokens cannot force repeated JWKS downloads.
+
+    Attributes:
+        options (VerifyTokenOptions): Supplies the secret key, api_url and api_version.
+        client (Optional[httpx.AsyncClient]): Shared client to use. A private one is created when omitted.
+        ttl (float): Seconds a fetched key set stays fresh. Defaults to 300.
+        refresh_ahead (float): Seconds before expiry at which a background refresh starts. Defaults to 60.
+        min_refetch_interval (float): Minimum seconds between fetches caused by unknown kids. Defaults to 30.
+        timeout (float): Timeout in seconds for a single JWKS request. Defaults to 5.
+        retries (int): Additional attempts on timeouts and connection errors. Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        options: VerifyTokenOptions,
+        client: Optional[httpx.AsyncClient] = None,
+        ttl: float = 300.0,
+        refresh_ahead: float = 60.0,
+        min_refetch_interval: float = 30.0,
+        timeout: float = 5.0,
+        retries: int = 2,
+    ):
+        self.options = options
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.retries = retries
+
+        self._client = client
+        self._owns_client = client is None
+        self._keys: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._last_fetch_attempt: Optional[float] = None
+        self._inflight: Optional[asyncio.Task] = None
+
+        self.fetch_count = 0
+        self.coalesced_count = 0
+        self.rate_limited_count = 0
+
+    def set_client(self, client: httpx.AsyncClient):
+        """ Use a shared, externally managed client for subsequent fetches."""
+
+        self._client = client
+        self._owns_client = False
+
+    async def aclose(self):
+        if self._fetch_in_flight():
+            self._inflight.cancel()
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_key(self, kid: Optional[str]) -> str:
+        """ Resolve the PEM public key for a kid, fetching the JWKS only when needed."""
+
+        if kid is None:
+            raise TokenVerificationError(TokenVerificationErrorReason.TOKEN_INVALID)
+
+        now = time.monotonic()
+        pem = self._keys.get(kid)
+
+        if pem is not None:
+            if now >= self._expires_at and not self._recently_fetched(now):
+                try:
+                    await self._refresh()
+                except TokenVerificationError:
+                    # Serve the stale key rather than failing every request while Clerk is unreachable
+                    return pem
+                return self._keys.get(kid, pem)
+
+            if now >= self._expires_at - self.refresh_ahead and not self._recently_fetched(now):
+                self._refresh_in_background()
+            return pem
+
+        # Unknown kid: join a fetch in flight, otherwise refetch at most once per min_refetch_interval
+        if not self._fetch_in_flight() and self._recently_fetched(now):
+            self.rate_limited_count += 1
+            # Not JWK_KID_MISMATCH: the key may well exist once the next refetch is allowed
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_KID_REFETCH_RATE_LIMITED)
+
+        await self._refresh()
+
+        pem = self._keys.get(kid)
+        if pem is None:
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_KID_MISMATCH)
+        return pem
+
+    def _fetch_in_flight(self) -> bool:
+        return self._inflight is not None and not self._inflight.done()
+
+    def _recently_fetched(self, now: float) -> bool:
+        return self._last_fetch_attempt is not None and now - self._last_fetch_attempt < self.min_refetch_interval
+
+    def _refresh_in_background(self):
+        if self._fetch_in_flight():
+            return
+        self._inflight = asyncio.ensure_future(self._fetch())
+        self._inflight.add_done_callback(_consume_exception)
+
+    async def _refresh(self):
+        """ Refresh the key set, joining a fetch that is already in flight."""
+
+        if self._fetch_in_flight():
+            self.coalesced_count += 1
+        else:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(_consume_exception)
+
+        # Shield so a cancelled caller does not abort the fetch other callers are waiting on
+        await asyncio.shield(self._inflight)
+
+    async def _fetch(self):
+        self._last_fetch_attempt = time.monotonic()
+        self.fetch_count += 1
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._owns_client = True
+
+        jwks_url = f'{self.options.api_url}/{self.options.api_version}/jwks'
+        headers = {'Accept': 'application/json', 'Authorization': f'Bearer {self.options.secret_key}'}
+
+        http_res = None
+        for _ in range(self.retries + 1):
+            try:
+                http_res = await self._client.get(jwks_url, headers=headers, timeout=self.timeout)
+            except (httpx.TimeoutException, httpx.ConnectError):
+                continue
+            break
+
+        if http_res is None or http_res.status_code != 200:
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_FAILED_TO_LOAD)
+
+        try:
+            jwks = http_res.json().get('keys')
+        except Exception as e:
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_FAILED_TO_LOAD) from e
+
+        if not jwks:
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_REMOTE_INVALID)
+
+        keys = {}
+        for key in jwks:
+            kid = key.get('kid')
+            if kid is None:
+                continue
+            try:
+                pem = jwk_to_pem(key)
+            except Exception:
+                continue
+            if pem is not None:
+                keys[kid] = pem
+
+        if not keys:
+            raise TokenVerificationError(TokenVerificationErrorReason.JWK_FAILED_TO_RESOLVE)
+
+        self._keys = keys
+        self._expires_at = time.monotonic() + self.ttl
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keys': len(self._keys),
+            'fresh_for_seconds': max(0.0, round(self._expires_at - time.monotonic(), 1)),
+            'fetches': self.fetch_count,
+            'coalesced': self.coalesced_count,
+            'rate_limited': self.rate_limited_count,
+        }
+
+
+def _consume_exception(task: asyncio.Task):
+    # Background refreshes have no awaiter; retrieve the exception so it is not logged as unhandled
+    if not task.cancelled():
+        task.exception()
+
+
+async def verify_token_async(token: str, options: VerifyTokenOptions, provider: AsyncJWKSProvider) -> Dict[str, Any]:
+    """ Async counterpart of verify_token. Networkless if the options.jwt_key is provided.
+    Otherwise the signing key is resolved through the AsyncJWKSProvider without blocking the event loop.
+
+    Args:
+        token (str): The token to verify.
+        options (VerifyTokenOptions): Options to configure the verification.
+        provider (AsyncJWKSProvider): Provider used to resolve the signing key.
+    """
+
+    if options.jwt_key is not None:
+        jwt_key = re.sub(r'(\r\n|\n|\r)', '', options.jwt_key)
+
+    elif options.secret_key is not None:
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError as e:
+            raise TokenVerificationError(TokenVerificationErrorReason.TOKEN_INVALID) from e
+        jwt_key = await provider.get_key(kid)
+
+    else:
+        raise TokenVerificationError(TokenVerificationErrorReason.SECRET_KEY_MISSING)
+
+    return decode_token(token, jwt_key, options)
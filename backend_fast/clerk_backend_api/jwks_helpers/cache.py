@@ -1,29 +1,135 @@
+import threading
 import time
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
 
 class Cache:
-    """ In-memory cache with expiration. """
+    """ Bounded, thread-safe in-memory LRU cache with per-entry expiration.
 
-    def __init__(self):
-        self.cache = {}
-        self.expiration_time = 300 # 5 minutes
+    get() and set() are O(1). Expired entries are dropped when read, and every set() sweeps a few
+    of the least recently used entries, so expired keys that are never read again do not pile up.
+    When the cache is full the least recently used entry is evicted.
 
-    def set(self, key: Optional[str], value: str):
-        if key is None:
-            return
+    Attributes:
+        maxsize (int): Maximum number of entries. Defaults to 1024.
+        ttl (float): Default time to live in seconds. Defaults to 300 (5 minutes).
+        sweep_batch (int): Number of LRU entries examined for expiry on each set(). Defaults to 8.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, sweep_batch: int = 8):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sweep_batch = sweep_batch
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
-        self.cache[key] = (value, time.time() + self.expiration_time)
+    @property
+    def expiration_time(self) -> float:
+        # Kept for backwards compatibility with the previous fixed-expiry cache
+        return self.ttl
 
-    def get(self, key: Optional[str]) -> Optional[str]:
+    def get(self, key: Optional[Hashable]) -> Optional[Any]:
         if key is None:
             return None
 
-        if key in self.cache:
-            value, expiration = self.cache[key]
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Optional[Hashable], value: Any, ttl: Optional[float] = None):
+        """ Store a value. A ttl larger than the cache ttl is capped, a non-positive ttl stores nothing."""
+
+        if key is None:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+
+        with self._lock:
+            if ttl <= 0:
+                self._data.pop(key, None)
+                return
+
+            now = time.monotonic()
+            self._data[key] = (value, now + ttl)
+            self._data.move_to_end(key)
+            self._sweep_lru(now)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _sweep_lru(self, now: float):
+        # Amortized sweeping: look at a bounded number of the least recently used entries
+        for _ in range(min(self.sweep_batch, len(self._data) - 1)):
+            key, (_, expires_at) = next(iter(self._data.items()))
+            if now < expires_at:
+                break
+            del self._data[key]
+            self.expirations += 1
+
+    def sweep(self) -> int:
+        """ Drop every expired entry. Intended for periodic background maintenance."""
+
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for key, (_, expires_at) in self._data.items() if now >= expires_at]
+            for key in expired:
+                del self._data[key]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """ Drop every entry whose value matches predicate, returns the number removed."""
+
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
 
-            if time.time() < expiration:
-                return value
+    def clear(self):
+        with self._lock:
+            self._data.clear()
 
-            del self.cache[key]
+    def __len__(self) -> int:
+        return len(self._data)
 
-        return None
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
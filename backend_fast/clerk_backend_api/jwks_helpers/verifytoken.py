@@ -11,7 +11,7 @@ from typing import Any, Dict, List, Union, Optional, cast
 
 from .cache import Cache
 
-__jwkcache = Cache()
+__jwkcache = Cache(maxsize=64, ttl=300)
 
 
 class TokenVerificationErrorReason(Enum):
@@ -36,6 +36,11 @@ class TokenVerificationErrorReason(Enum):
         'Unable to find a signing key in JWKS that matches the kid of the provided session token.'
     )
 
+    JWK_KID_REFETCH_RATE_LIMITED = (
+        'jwk-kid-refetch-rate-limited',
+        'No signing key in JWKS matches the kid of the provided session token, and JWKS was fetched too recently to refetch.'
+    )
+
     TOKEN_EXPIRED = (
         'token-expired',
         'Token has expired and is no longer valid.'
@@ -158,20 +163,29 @@ def get_remote_jwt_key(token: str, options: VerifyTokenOptions) -> str:
 
     for key in jwks:
         if key.get('kid') == kid:
-            public_key = RSAAlgorithm.from_jwk(key)
-            if isinstance(public_key, RSAPublicKey):
-                public_key = cast(RSAPublicKey, public_key)
-                pem = public_key.public_bytes(
-                    encoding=serialization.Encoding.PEM,
-                    format=serialization.PublicFormat.SubjectPublicKeyInfo
-                )
-                decoded_pem = pem.decode('utf-8')
+            decoded_pem = jwk_to_pem(key)
+            if decoded_pem is not None:
                 __jwkcache.set(kid, decoded_pem)
                 return decoded_pem
 
     raise TokenVerificationError(TokenVerificationErrorReason.JWK_KID_MISMATCH)
 
 
+def jwk_to_pem(key: Dict[str, Any]) -> Optional[str]:
+    """ Convert an RSA JWK into a PEM encoded public key. Returns None for non-RSA keys."""
+
+    public_key = RSAAlgorithm.from_jwk(key)
+    if not isinstance(public_key, RSAPublicKey):
+        return None
+
+    public_key = cast(RSAPublicKey, public_key)
+    pem = public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return pem.decode('utf-8')
+
+
 def verify_token(token: str, options: VerifyTokenOptions) -> Dict[str, Any]:
     """ Verifies a Clerk-generated token signature. Networkless if the options.jwt_key is provided.
     Otherwise, performs a network call to retrieve the JWKS from Clerk's Backend API.
@@ -191,6 +205,18 @@ def verify_token(token: str, options: VerifyTokenOptions) -> Dict[str, Any]:
     else:
         raise TokenVerificationError(TokenVerificationErrorReason.SECRET_KEY_MISSING)
 
+    return decode_token(token, jwt_key, options)
+
+
+def decode_token(token: str, jwt_key: str, options: VerifyTokenOptions) -> Dict[str, Any]:
+    """ Verifies the token signature and claims against an already resolved PEM public key.
+
+    Args:
+        token (str): The token to verify.
+        jwt_key (str): PEM public key matching the kid of the token.
+        options (VerifyTokenOptions): Options to configure the verification.
+    """
+
     try:
         payload = jwt.decode(
             token,
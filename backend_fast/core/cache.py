@@ -0,0 +1,10 @@
+# core/cache.py
+"""
+Shared in-process cache used by the auth and application caches.
+
+The implementation lives in clerk_backend_api.jwks_helpers.cache so the JWKS key cache and the
+app caches use the same bounded, thread-safe TTL-LRU.
+"""
+from clerk_backend_api.jwks_helpers.cache import Cache as TTLCache
+
+__all__ = ["TTLCache"]
@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import List, Union
+from typing import Dict, List, Union
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from pydantic import field_validator, Field
@@ -42,11 +42,57 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = ""
     DEEPSEEK_API_KEY: str = ""
     DEEPSEEK_BASE_URL: str = "https://api.deepseek.com"
+    DEEPSEEK_MODEL: str = "deepseek-chat"
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    ANTHROPIC_BASE_URL: str = "https://api.anthropic.com"
+    ANTHROPIC_MODEL: str = "claude-3-5-haiku-latest"
+    GOOGLE_BASE_URL: str = "https://generativelanguage.googleapis.com"
+    GOOGLE_MODEL: str = "gemini-1.5-flash"
+    
+    # Local mock provider for load tests and offline work; set LLM_PROVIDER=mock to route to it
+    MOCK_LLM_ENABLED: bool = False
+    MOCK_LLM_ANSWER_TEMPLATE: str = ""  # {question} and {model} are filled in; empty for a built-in answer
+    MOCK_LLM_ANSWER_TOKENS: int = 300  # Answers are padded to this length, 0 = up to max_tokens
+    MOCK_LLM_LATENCY: str = "fixed"  # fixed, lognormal or replay
+    MOCK_LLM_LATENCY_MS: float = 800.0  # The fixed latency, or the lognormal median
+    MOCK_LLM_LATENCY_SIGMA: float = 0.5
+    MOCK_LLM_LATENCY_REPLAY_FILE: str = ""  # Recorded latencies in ms; empty replays stored sessions' response_time_ms
+    MOCK_LLM_TOKENS_PER_SECOND: float = 50.0  # Streaming rate, 0 = all at once
+    MOCK_LLM_ERROR_RATE: float = 0.0  # Share of calls failing with a 500
+    MOCK_LLM_RATE_LIMIT_RATE: float = 0.0  # Share of calls rejected with a 429
+    MOCK_LLM_RETRY_AFTER_SECONDS: float = 1.0
+    MOCK_LLM_SEED: int = 0
+    
+    # Provider routing: requests fail over to other configured providers when the primary degrades
+    LLM_FAILOVER_ENABLED: bool = True
+    LLM_FAILOVER_ORDER: Union[str, List[str]] = Field(default="deepseek,openai,anthropic,google")
+    LLM_ROUTER_DEGRADED_ERROR_RATE: float = 0.5
     
     # Clerk Authentication
     CLERK_SECRET_KEY: str = ""
     CLERK_PUBLISHABLE_KEY: str = ""
-    
+    CLERK_API_URL: str = "https://api.clerk.com"
+    # "jwks" verifies session JWTs locally against Clerk's JWKS, "api" keeps the Clerk session API calls
+    CLERK_VERIFICATION_MODE: str = "jwks"
+    CLERK_JWT_KEY: str = ""  # Optional PEM public key for fully networkless verification
+    CLERK_ISSUER: str = ""  # Derived from CLERK_PUBLISHABLE_KEY when empty
+    CLERK_AUTHORIZED_PARTIES: Union[str, List[str]] = Field(default="")  # Defaults to CORS_ORIGINS when empty
+    ADMIN_USER_IDS: Union[str, List[str]] = Field(default="")  # Clerk user ids allowed on /admin routes
+    CLERK_CLOCK_SKEW_MS: int = 5000
+    CLERK_JWKS_TTL_SECONDS: int = 300
+    CLERK_JWKS_REFRESH_AHEAD_SECONDS: int = 60  # Background refresh window before the key set expires
+    CLERK_JWKS_MIN_REFETCH_SECONDS: int = 30  # Rate limit for refetches caused by unknown kids
+
+    # Verified token cache (entries live until min(token exp, TTL))
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    # Rejected token cache - short lived so a fixed client clock or refreshed session recovers quickly
+    AUTH_NEGATIVE_CACHE_TTL_SECONDS: int = 30
+    AUTH_NEGATIVE_CACHE_MAX_SIZE: int = 50000
+    AUTH_MAX_TOKEN_LENGTH: int = 8192
+
     # App Configuration
     SECRET_KEY: str = "your-secret-key-change-in-production"
     DEBUG: bool = True
@@ -76,6 +122,93 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 2000
     TEMPERATURE: float = 0.3
     
+    # Complexity tiering: short factual questions get a smaller answer budget (and optionally a faster model)
+    TIERING_ENABLED: bool = True
+    TIER_THRESHOLD: float = 0.5
+    TIER_FAST_MAX_TOKENS: int = 600
+    TIER_FAST_MODELS: Dict[str, str] = Field(default_factory=dict)  # e.g. {"openai": "gpt-4o-mini"}
+    
+    # Token budgets: prompt + completion tokens a user may spend per UTC day (0 = unlimited)
+    USER_DAILY_TOKEN_BUDGET: int = 0
+    # Below this many completion tokens left an answer is not worth starting, the question is refused
+    TOKEN_BUDGET_MIN_COMPLETION_TOKENS: int = 150
+    
+    # Conversation mode: earlier turns are sent along, older ones compacted into a rolling summary
+    CONVERSATION_ENABLED: bool = True
+    CONVERSATION_MAX_CONTEXT_TOKENS: int = 1500  # Hard ceiling on summary + earlier turns per request
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = 300
+    
+    # Batch endpoint: questions per request, and how many of them are answered at once
+    QA_BATCH_MAX_QUESTIONS: int = 50
+    QA_BATCH_CONCURRENCY: int = 4
+    
+    # Background jobs: answers run detached from the request and are polled for
+    JOB_CONCURRENCY: int = 8
+    JOB_STALE_SECONDS: float = 300.0  # A job running this long was lost with its instance and is requeued
+    JOB_MAX_WAIT_SECONDS: float = 25.0  # Longest long-poll on a job's status
+    JOB_POLL_INTERVAL_SECONDS: float = 0.5
+    # In-process running needs a long-lived process (uvicorn, a container). On serverless hosts
+    # (Vercel) set it to False and schedule GET /api/v1/cron/jobs, which runs jobs within the request
+    JOB_RUN_IN_PROCESS: bool = True
+    JOB_SWEEP_INTERVAL_SECONDS: float = 60.0  # How often a long-lived process requeues stale jobs
+    JOB_CRON_MAX_SECONDS: float = 40.0  # Stop claiming new jobs after this; leave room for one answer
+    JOB_CRON_MAX_JOBS: int = 50
+    CRON_SECRET: str = ""  # Bearer token the cron route requires; Vercel Cron sends it, empty disables the route
+    
+    # How often a waiting ask request checks whether its client has gone away
+    DISCONNECT_POLL_INTERVAL_SECONDS: float = 0.25
+    
+    # Outbound HTTP connection pools (shared by Clerk and LLM clients)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    CLERK_HTTP_TIMEOUT_SECONDS: float = 10.0
+    LLM_HTTP_TIMEOUT_SECONDS: float = 120.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    
+    # Retries of transient provider errors (the SDK's own retries are disabled)
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.25
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_REQUEST_DEADLINE_SECONDS: float = 60.0
+    LLM_RETRY_BUDGET_RATIO: float = 0.1
+    LLM_RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+    LLM_RETRY_BUDGET_WINDOW_SECONDS: float = 10.0
+    
+    # Hedged requests: a second attempt when the first is slower than the observed quantile
+    HEDGING_ENABLED: bool = False
+    HEDGING_QUANTILE: float = 0.95
+    HEDGING_MIN_DELAY_MS: float = 500
+    HEDGING_MAX_DELAY_MS: float = 20000
+    HEDGING_MIN_SAMPLES: int = 20
+    HEDGING_MAX_RATIO: float = 0.05  # At most this share of requests gets a second attempt
+    
+    # Per-provider bulkhead: concurrent calls plus a bounded FIFO wait queue
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_PROVIDER_CONCURRENCY: Dict[str, int] = Field(default_factory=dict)  # e.g. {"deepseek": 8}
+    LLM_MAX_QUEUE: int = 64
+    LLM_MAX_QUEUE_WAIT_SECONDS: float = 10.0
+    
+    # Circuit breaker around provider calls
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_FAILURE_RATE_THRESHOLD: float = 0.5
+    CIRCUIT_SLOW_CALL_MS: int = 30000
+    CIRCUIT_SLOW_CALL_RATE_THRESHOLD: float = 0.8
+    CIRCUIT_WINDOW_SIZE: int = 20
+    CIRCUIT_MINIMUM_CALLS: int = 10
+    CIRCUIT_OPEN_SECONDS: float = 30.0
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = 3
+    
+    # Answer cache (exact match on the normalized question)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL_SECONDS: int = 21600
+    ANSWER_CACHE_MAX_SIZE: int = 5000
+    
+    # Near-duplicate question matching (cosine similarity of canonical term and ordered term-pair shingles)
+    NEAR_DUP_ENABLED: bool = True
+    NEAR_DUP_THRESHOLD: float = 0.9
+    NEAR_DUP_MAX_ENTRIES: int = 5000
+    
     # Pagination
     DEFAULT_PAGE_SIZE: int = 50
     MAX_PAGE_SIZE: int = 100
@@ -119,6 +252,41 @@ class Settings(BaseSettings):
             return v
         return ["http://localhost:3000", "https://travelling-gpt.vercel.app"]
     
+    @field_validator("ADMIN_USER_IDS", mode="before")
+    @classmethod
+    def validate_admin_user_ids(cls, v) -> List[str]:
+        if isinstance(v, str):
+            return [user_id.strip() for user_id in v.split(",") if user_id.strip()]
+        elif isinstance(v, list):
+            return v
+        return []
+
+    @field_validator("CLERK_AUTHORIZED_PARTIES", mode="before")
+    @classmethod
+    def validate_authorized_parties(cls, v) -> List[str]:
+        if isinstance(v, str):
+            return [party.strip() for party in v.split(",") if party.strip()]
+        elif isinstance(v, list):
+            return v
+        return []
+
+    @field_validator("LLM_FAILOVER_ORDER", mode="before")
+    @classmethod
+    def validate_failover_order(cls, v) -> List[str]:
+        if isinstance(v, str):
+            return [provider.strip().lower() for provider in v.split(",") if provider.strip()]
+        elif isinstance(v, list):
+            return v
+        return []
+
+    @field_validator("CLERK_VERIFICATION_MODE", mode="before")
+    @classmethod
+    def validate_verification_mode(cls, v):
+        v = (v or "jwks").lower()
+        if v not in ("jwks", "api"):
+            raise ValueError("CLERK_VERIFICATION_MODE must be 'jwks' or 'api'")
+        return v
+
     @field_validator("LOG_LEVEL", mode="before")
     @classmethod
     def validate_log_level(cls, v):
@@ -151,6 +319,12 @@ class Settings(BaseSettings):
             return self.ALLOWED_ORIGINS
         return [origin.strip() for origin in str(self.ALLOWED_ORIGINS).split(",")]
 
+    def get_clerk_authorized_parties(self) -> List[str]:
+        """Get the allowed azp values for Clerk session tokens"""
+        if self.CLERK_AUTHORIZED_PARTIES:
+            return list(self.CLERK_AUTHORIZED_PARTIES)
+        return self.get_cors_origins()
+
 # # Create settings instance
 # settings = Settings()
 try:
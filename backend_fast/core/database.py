@@ -1,6 +1,6 @@
 # core/database.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, DateTime, Boolean, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
@@ -52,11 +52,68 @@ class SessionModel(Base):
     response_time_ms = Column(Integer, default=0)
     is_successful = Column(Boolean, default=True)
     error_message = Column(Text, nullable=True)
+    cache_hit = Column(Boolean, default=False)
+    tier = Column(String(16), nullable=True)  # Answer tier chosen by the complexity classifier
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    prompt_cache_hit_tokens = Column(Integer, nullable=True)  # Null when the provider does not report prefix caching
+    cancelled = Column(Boolean, default=False)  # The client disconnected before the answer was complete
+    conversation_id = Column(String(32), nullable=True, index=True)
     created_at = Column(DateTime, nullable=False)
 
     def __repr__(self):
         return f"<SessionModel(id={self.id}, user_id='{self.user_id}', question='{self.question[:50]}...')>"
 
+# Conversations: the rolling summary of turns too old to send in full
+class ConversationModel(Base):
+    __tablename__ = "conversations"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String, nullable=False, index=True)
+    summary = Column(Text, nullable=False, default="")
+    summarized_through = Column(Integer, nullable=False, default=0)  # Last session id folded into the summary
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ConversationModel(id='{self.id}', user_id='{self.user_id}')>"
+
+# Tokens spent for a user on work that is not an answer, e.g. conversation summaries; counted
+# against the daily token budget alongside the sessions
+class TokenUsageModel(Base):
+    __tablename__ = "token_usage"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False, index=True)
+    purpose = Column(String(16), nullable=False)
+    llm_provider = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    response_time_ms = Column(Integer, default=0)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<TokenUsageModel(id={self.id}, user_id='{self.user_id}', purpose='{self.purpose}')>"
+
+# Background question jobs; the answer is stored as a session when the job finishes
+class JobModel(Base):
+    __tablename__ = "qa_jobs"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String, nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    llm_provider = Column(String, default="deepseek")
+    max_tokens = Column(Integer, nullable=True)  # Cap from the user's token budget at submission
+    status = Column(String(16), nullable=False, index=True)  # queued, running, succeeded, failed
+    session_id = Column(Integer, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<JobModel(id='{self.id}', user_id='{self.user_id}', status='{self.status}')>"
+
 # Dependency to get database session
 def get_db() -> Session:
     db = SessionLocal()
@@ -79,6 +136,49 @@ def create_tables():
         logger.error(f"Error creating tables: {e}")
         raise
 
+# Columns added to the sessions table after its first release: (name, DDL type)
+SESSION_COLUMN_MIGRATIONS = [
+    ("cache_hit", "BOOLEAN DEFAULT FALSE"),
+    ("tier", "VARCHAR(16)"),
+    ("prompt_tokens", "INTEGER"),
+    ("completion_tokens", "INTEGER"),
+    ("prompt_cache_hit_tokens", "INTEGER"),
+    ("cancelled", "BOOLEAN DEFAULT FALSE"),
+    ("conversation_id", "VARCHAR(32)"),
+]
+
+# Migration helper for existing databases
+def migrate_add_session_columns():
+    """
+    Add any missing columns to an existing sessions table
+    Idempotent, and safe when several workers start at once: a column another worker
+    added in the meantime is skipped
+    """
+    table = SessionModel.__tablename__
+    try:
+        existing = {column["name"] for column in inspect(engine).get_columns(table)}
+        for name, ddl in SESSION_COLUMN_MIGRATIONS:
+            if name in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                logger.info(f"Migration: added column {name} to {table}")
+            except Exception:
+                if name not in {column["name"] for column in inspect(engine).get_columns(table)}:
+                    raise
+    except Exception as e:
+        logger.error(f"Error migrating tables: {e}")
+        raise
+
+def init_database():
+    """
+    Bring the schema up to date: create missing tables, then add missing columns to existing ones
+    Called on application startup, so a database created by an older release keeps working
+    """
+    create_tables()
+    migrate_add_session_columns()
+
 # Function to test database connection
 def test_connection():
     """Test database connection"""
@@ -94,6 +194,6 @@ def test_connection():
 
 # Initialize database on import
 if __name__ == "__main__":
-    create_tables()
+    init_database()
     test_connection()
 
@@ -0,0 +1,77 @@
+# core/http_clients.py
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def llm_timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.LLM_HTTP_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+class HTTPClients:
+    """
+    Long-lived, pooled outbound HTTP clients shared by the auth and LLM layers.
+
+    Opened and closed by the application lifespan. The properties create a client lazily
+    when accessed outside the lifespan (serverless cold paths, scripts), so callers never
+    need to build a client per request.
+    """
+
+    def __init__(self):
+        self._clerk: Optional[httpx.AsyncClient] = None
+        self._llm: Optional[httpx.AsyncClient] = None
+
+    @property
+    def clerk(self) -> httpx.AsyncClient:
+        if self._clerk is None or self._clerk.is_closed:
+            self._clerk = httpx.AsyncClient(
+                base_url=settings.CLERK_API_URL,
+                timeout=httpx.Timeout(settings.CLERK_HTTP_TIMEOUT_SECONDS, connect=5.0),
+                limits=_limits(),
+                http2=HTTP2_AVAILABLE,
+            )
+        return self._clerk
+
+    @property
+    def llm(self) -> httpx.AsyncClient:
+        if self._llm is None or self._llm.is_closed:
+            self._llm = httpx.AsyncClient(
+                timeout=llm_timeout(),
+                limits=_limits(),
+                http2=HTTP2_AVAILABLE,
+            )
+        return self._llm
+
+    def startup(self):
+        """Open the pools eagerly so the first request does not pay for it"""
+        _ = self.clerk, self.llm
+        logger.info(f"Outbound HTTP pools ready (http2={HTTP2_AVAILABLE})")
+
+    async def shutdown(self):
+        if self._clerk is not None:
+            await self._clerk.aclose()
+            self._clerk = None
+        if self._llm is not None:
+            await self._llm.aclose()
+            self._llm = None
+        logger.info("Outbound HTTP pools closed")
+
+
+# Create the shared clients instance
+http_clients = HTTPClients()
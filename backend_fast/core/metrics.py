@@ -0,0 +1,54 @@
+# core/metrics.py
+import bisect
+from typing import Any, Dict, Optional, Sequence
+
+# Default bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative counts, in the style of Prometheus histograms.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 2),
+            "mean": round(self.sum / self.count, 2) if self.count else 0.0,
+            "max": round(self.max, 2),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
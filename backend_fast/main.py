@@ -6,6 +6,12 @@ import logging
 # Import your router - choose the correct import based on your file structure:
 # Option 1: If you have api/endpoints/qa.py
 from api.endpoints.qa import router as qa_router
+from core.config import settings
+from core.database import init_database
+from core.http_clients import http_clients
+from services.clerk_verifier import clerk_verifier
+from services.llm_service import llm_service
+from services.job_runner import job_runner
 
 # Option 2: If you have a file named router.py in the same directory
 # from router import router as qa_router
@@ -22,10 +28,22 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting up Query GPT API...")
-    # You can add any startup logic here (database initialization, etc.)
+    # Create missing tables and columns, so an existing database does not fail with "no such column"
+    init_database()
+    # Pooled, keep-alive outbound clients shared by auth and LLM calls
+    http_clients.startup()
+    clerk_verifier.jwks.set_client(http_clients.clerk)
+    llm_service.bind_http_client(http_clients.llm)
+    # Pick up background question jobs left queued by a previous run, and keep sweeping for stale ones
+    if settings.JOB_RUN_IN_PROCESS:
+        await job_runner.recover()
+        job_runner.start_sweeper()
     yield
     # Shutdown
     logger.info("Shutting down Query GPT API...")
+    await job_runner.shutdown()
+    await clerk_verifier.jwks.aclose()
+    await http_clients.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
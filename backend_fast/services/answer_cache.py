@@ -0,0 +1,61 @@
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+from core.cache import TTLCache
+from core.config import settings
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a question for cache lookups.
+    Case, unicode variants, punctuation and whitespace differences map to the same key.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class AnswerCache:
+    """
+    Exact-match cache of successful answers.
+
+    Keyed on the normalized question plus model, temperature and system prompt version, so a
+    prompt or sampling change never serves answers produced under different settings.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def make_key(question: str, model: str, temperature: float, prompt_version: str) -> str:
+        raw = f"{model}|{temperature}|{prompt_version}|{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self._cache.get(key)
+
+    def put(self, key: str, answer: str):
+        if self.enabled and answer:
+            self._cache.set(key, answer)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self._cache.stats()}
+
+
+# Create the cache instance
+answer_cache = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_MAX_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+    enabled=settings.ANSWER_CACHE_ENABLED,
+)
@@ -1,10 +1,12 @@
 import os
-import httpx
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer
 from typing import Optional
 import jwt
 from jwt.exceptions import InvalidTokenError
+from clerk_backend_api.jwks_helpers import TokenVerificationError
+from core.http_clients import http_clients
+from services.clerk_verifier import clerk_verifier, verified_token_cache
 
 # Get your Clerk secret key
 CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
@@ -22,20 +24,19 @@ class ClerkAuth:
     async def verify_session_token(self, token: str) -> dict:
         """Verify session token with Clerk API"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://api.clerk.dev/v1/sessions/{token}/verify",
-                    headers={
-                        "Authorization": f"Bearer {self.secret_key}",
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    print(f"Clerk session verification failed: {response.status_code} - {response.text}")
-                    return None
+            response = await http_clients.clerk.get(
+                f"https://api.clerk.dev/v1/sessions/{token}/verify",
+                headers={
+                    "Authorization": f"Bearer {self.secret_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                print(f"Clerk session verification failed: {response.status_code} - {response.text}")
+                return None
                     
         except Exception as e:
             print(f"Error verifying session token: {str(e)}")
@@ -43,9 +44,18 @@ class ClerkAuth:
     
     async def verify_jwt_token(self, token: str) -> dict:
         """Verify JWT token locally (faster method)"""
+        if clerk_verifier.enabled:
+            try:
+                return await clerk_verifier.verify(token)
+            except TokenVerificationError as e:
+                print(f"JWT verification failed: {e.reason.value[0]}")
+                return None
+        
+        # Unverified decode is only acceptable in development
+        if os.getenv("ENVIRONMENT", "development") != "development":
+            return None
+        
         try:
-            # For development, you can skip JWT signature verification
-            # In production, you should verify with Clerk's public key
             decoded = jwt.decode(token, options={"verify_signature": False})
             return decoded
         except InvalidTokenError as e:
@@ -54,19 +64,33 @@ class ClerkAuth:
 
 clerk_auth = ClerkAuth()
 
-async def get_current_user(credentials = Depends(security)) -> dict:
-    """Dependency to get current user from Clerk token"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Authorization header required")
-    
-    token = credentials.credentials
+async def verify_token_cached(token: str) -> Optional[dict]:
+    """Verify a token, reusing a recent successful verification of the same token"""
+    user_data = verified_token_cache.get(token)
+    if user_data:
+        return user_data
     
     # Try JWT verification first (faster)
     user_data = await clerk_auth.verify_jwt_token(token)
+    # Without local verification that was an unverified development decode, which is never cached
+    verified = clerk_verifier.enabled
     
     if not user_data:
         # Fallback to session verification
         user_data = await clerk_auth.verify_session_token(token)
+        verified = True
+    
+    if user_data and verified:
+        verified_token_cache.put(token, user_data)
+    return user_data
+
+async def get_current_user(credentials = Depends(security)) -> dict:
+    """Dependency to get current user from Clerk token"""
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Authorization header required")
+    
+    token = credentials.credentials
+    user_data = await verify_token_cached(token)
     
     if not user_data:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -80,11 +104,7 @@ async def get_current_user_optional(credentials = Depends(security)) -> Optional
         return None
         
     try:
-        token = credentials.credentials
-        user_data = await clerk_auth.verify_jwt_token(token)
-        if not user_data:
-            user_data = await clerk_auth.verify_session_token(token)
-        return user_data
+        return await verify_token_cached(credentials.credentials)
     except Exception as e:
         print(f"Auth error: {str(e)}")
         return None
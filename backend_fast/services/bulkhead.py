@@ -0,0 +1,143 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from core.metrics import Histogram
+
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class BulkheadFullError(Exception):
+    """Raised when a call cannot get a slot: the wait queue is full or the wait timed out"""
+
+    def __init__(self, name: str, reason: str, retry_after: int):
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{name} is overloaded ({reason}), retry after {retry_after}s")
+
+
+class BulkheadSlot:
+    """A slot held inside Bulkhead.slot(); it can be handed back while its holder only waits"""
+
+    def __init__(self, bulkhead: "Bulkhead"):
+        self.bulkhead = bulkhead
+        self.held = True
+
+    @asynccontextmanager
+    async def released(self) -> AsyncIterator[None]:
+        """Give the slot up for the duration, e.g. a retry backoff, then queue for it again"""
+        self.bulkhead.release()
+        self.held = False
+        yield
+        # Not reached if the body raised: the slot is not taken back just to be released
+        await self.bulkhead.acquire()
+        self.held = True
+
+
+class Bulkhead:
+    """
+    Concurrency limit with a bounded FIFO wait queue.
+
+    At most max_concurrent calls run at once; up to max_queue further callers wait in arrival
+    order for at most max_wait seconds. Anything beyond that fails fast with BulkheadFullError
+    instead of piling more load onto an upstream that is already saturated.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_ms = Histogram()
+        self.queue_depth = Histogram(QUEUE_DEPTH_BUCKETS)
+        self.call_ms = Histogram()
+
+    def _retry_after(self) -> int:
+        # Roughly how long until the queue ahead drains, from the mean call duration
+        mean_seconds = (self.call_ms.sum / self.call_ms.count / 1000) if self.call_ms.count else 1.0
+        waves = (len(self._waiters) + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(mean_seconds * waves))
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now, never queueing behind waiters"""
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return True
+        return False
+
+    async def acquire(self):
+        start = time.monotonic()
+        self.queue_depth.observe(len(self._waiters))
+
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self.wait_ms.observe(0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, "queue full", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise BulkheadFullError(self.name, "queue wait timed out", self._retry_after()) from None
+            raise
+
+        self.wait_ms.observe((time.monotonic() - start) * 1000)
+
+    def release(self):
+        # Hand the slot straight to the next live waiter, FIFO
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[BulkheadSlot]:
+        await self.acquire()
+        held = BulkheadSlot(self)
+        start = time.monotonic()
+        try:
+            yield held
+        finally:
+            self.call_ms.observe((time.monotonic() - start) * 1000)
+            if held.held:
+                self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_depth": self.queue_depth.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
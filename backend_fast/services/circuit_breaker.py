@@ -0,0 +1,172 @@
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} circuit is open, retry after {retry_after}s")
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a rolling window of recent calls.
+
+    The circuit opens when, over the last window_size calls (and at least minimum_calls), the
+    failure rate or the rate of calls slower than slow_call_ms crosses its threshold. While open,
+    calls fail immediately with CircuitOpenError. After open_seconds the circuit goes half-open
+    and lets half_open_max_calls probe calls through: if all of them succeed it closes again,
+    the first failing or slow probe opens it for another open_seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_ms: float = 30000,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 3,
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # (failed, slow) per call, newest last
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_opened_reason = ""
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def retry_after(self) -> int:
+        remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def allows_calls(self) -> bool:
+        """Cheap check without taking a half-open probe slot"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls)
+
+    def acquire(self):
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+            self._probes_in_flight += 1
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def record(self, duration_ms: float, failed: bool):
+        slow = duration_ms >= self.slow_call_ms
+
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed or slow:
+                self._open("probe failed" if failed else "probe slow")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self._state = CLOSED
+                self._window.clear()
+            return
+
+        if self._state == OPEN:
+            # A call that started before the circuit opened
+            return
+
+        self._window.append((failed, slow))
+        if len(self._window) < self.minimum_calls:
+            return
+        failure_rate, slow_rate = self._rates()
+        if failure_rate >= self.failure_rate_threshold:
+            self._open(f"failure rate {failure_rate:.0%}")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._open(f"slow call rate {slow_rate:.0%}")
+
+    def release(self):
+        """Give back a probe slot for a call that ended without a verdict (e.g. cancelled)"""
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    @contextmanager
+    def guard(self):
+        """Acquire, time the wrapped call and record its outcome"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record((time.monotonic() - start) * 1000, failed=self.is_failure(e))
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record((time.monotonic() - start) * 1000, failed=False)
+
+    def _rates(self) -> Tuple[float, float]:
+        if not self._window:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        return failures / len(self._window), slow / len(self._window)
+
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self.times_opened += 1
+        self.last_opened_reason = reason
+
+    def reset(self):
+        self._state = CLOSED
+        self._window.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        failure_rate, slow_rate = self._rates()
+        retry_after: Optional[int] = self.retry_after() if state == OPEN else None
+        return {
+            "state": state,
+            "window_calls": len(self._window),
+            "failure_rate": round(failure_rate, 4),
+            "slow_call_rate": round(slow_rate, 4),
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "last_opened_reason": self.last_opened_reason,
+            "retry_after_seconds": retry_after,
+        }
@@ -0,0 +1,207 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from clerk_backend_api.jwks_helpers import (
+    AsyncJWKSProvider,
+    TokenVerificationError,
+    TokenVerificationErrorReason,
+    VerifyTokenOptions,
+    verify_token_async,
+)
+from core.cache import TTLCache
+from core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def issuer_from_publishable_key(publishable_key: str) -> Optional[str]:
+    """
+    Derive the Clerk Frontend API issuer from a publishable key.
+    pk_test_/pk_live_ keys carry the base64 encoded frontend API host followed by '$'.
+    """
+    if not publishable_key or not publishable_key.startswith(("pk_test_", "pk_live_")):
+        return None
+    encoded = publishable_key.split("_", 2)[2]
+    try:
+        decoded = base64.b64decode(encoded + "=" * (-len(encoded) % 4)).decode("utf-8")
+    except Exception:
+        logger.warning("Could not decode CLERK_PUBLISHABLE_KEY to derive the token issuer")
+        return None
+    host = decoded.rstrip("$")
+    return f"https://{host}" if host else None
+
+
+def user_id_from_claims(claims: Dict[str, Any]) -> Optional[str]:
+    """Extract the Clerk user ID from verified session claims"""
+    return claims.get("sub") or claims.get("user_id") or claims.get("userId")
+
+
+def token_digest(token: str) -> str:
+    """Digest used as cache key so raw bearer tokens are never kept in memory"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    Cache of successful token verifications keyed by token digest.
+    Each entry expires at min(token exp, AUTH_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        return self._cache.get(token_digest(token))
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        if not self.enabled:
+            return
+        ttl = None
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = exp - time.time()
+        self._cache.set(token_digest(token), claims, ttl=ttl)
+
+    # Invalidation hooks (sign-out webhooks, revoked sessions, key rotation)
+    def invalidate_token(self, token: str) -> bool:
+        return self._cache.invalidate(token_digest(token))
+
+    def invalidate_user(self, user_id: str) -> int:
+        return self._cache.invalidate_where(lambda claims: user_id_from_claims(claims) == user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self._cache.stats()}
+
+
+class RejectedTokenCache:
+    """
+    Short-lived negative cache of rejected token digests.
+    Lets repeated attempts with the same bad token be refused without any verification work.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def is_rejected(self, token: str) -> bool:
+        return self._cache.get(token_digest(token)) is not None
+
+    def remember(self, token: str, reason: str):
+        self._cache.set(token_digest(token), reason)
+
+    def invalidate_token(self, token: str) -> bool:
+        return self._cache.invalidate(token_digest(token))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+def _b64url_json(segment: str) -> Optional[Dict[str, Any]]:
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    return decoded if isinstance(decoded, dict) else None
+
+
+def precheck_token(token: str, strict: bool = True) -> Optional[str]:
+    """
+    Cheap structural checks run before any cryptographic or network work.
+    Returns the rejection reason, or None when the token is worth verifying.
+    With strict=True the token must be a three segment JWT with an RS256 header and a usable kid.
+    """
+    if not token or len(token) > settings.AUTH_MAX_TOKEN_LENGTH:
+        return "token-length"
+
+    # Development still accepts opaque session tokens for the Clerk session API fallback
+    if not strict:
+        return None
+
+    segments = token.split(".")
+    if len(segments) != 3 or not all(segments):
+        return "token-malformed"
+
+    header = _b64url_json(segments[0])
+    if header is None:
+        return "token-malformed-header"
+
+    if header.get("alg") != "RS256":
+        return "token-unsupported-alg"
+
+    kid = header.get("kid")
+    if not settings.CLERK_JWT_KEY and (not isinstance(kid, str) or not kid or len(kid) > 128):
+        return "token-invalid-kid"
+
+    return None
+
+
+class ClerkTokenVerifier:
+    """
+    Local (networkless) verification of Clerk session JWTs.
+
+    Checks the RS256 signature, exp/nbf, azp and iss against Clerk's JWKS. Signing keys are
+    cached per kid by an AsyncJWKSProvider, so Clerk is only contacted for unknown kids and
+    key set refreshes, and never from inside the event loop's critical path.
+    """
+
+    def __init__(self):
+        self.secret_key = settings.CLERK_SECRET_KEY
+        self.jwt_key = settings.CLERK_JWT_KEY or None
+        self.issuer = settings.CLERK_ISSUER or issuer_from_publishable_key(settings.CLERK_PUBLISHABLE_KEY)
+        self.options = VerifyTokenOptions(
+            authorized_parties=settings.get_clerk_authorized_parties() or None,
+            clock_skew_in_ms=settings.CLERK_CLOCK_SKEW_MS,
+            jwt_key=self.jwt_key,
+            secret_key=self.secret_key or None,
+            api_url=settings.CLERK_API_URL,
+        )
+        self.jwks = AsyncJWKSProvider(
+            self.options,
+            ttl=settings.CLERK_JWKS_TTL_SECONDS,
+            refresh_ahead=settings.CLERK_JWKS_REFRESH_AHEAD_SECONDS,
+            min_refetch_interval=settings.CLERK_JWKS_MIN_REFETCH_SECONDS,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CLERK_VERIFICATION_MODE == "jwks" and bool(self.secret_key or self.jwt_key)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a session token and return its claims.
+        Raises TokenVerificationError when the token is rejected.
+        """
+        claims = await verify_token_async(token, self.options, self.jwks)
+
+        if self.issuer and claims.get("iss") != self.issuer:
+            logger.warning(f"Token issuer mismatch: {claims.get('iss')}")
+            raise TokenVerificationError(TokenVerificationErrorReason.TOKEN_INVALID)
+
+        return claims
+
+
+# Create the verifier and cache instances
+clerk_verifier = ClerkTokenVerifier()
+verified_token_cache = VerifiedTokenCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    enabled=settings.AUTH_CACHE_ENABLED,
+)
+rejected_token_cache = RejectedTokenCache(
+    maxsize=settings.AUTH_NEGATIVE_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_NEGATIVE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Request coalescing for identical in-flight work.
+
+    Concurrent callers with the same key await one shared task instead of each starting their own.
+    A cancelled caller only detaches itself; the shared task keeps running for the remaining
+    callers and is cancelled only when the last caller goes away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Run fn() for key, or join the call already in flight for it.
+        Returns (result, shared) where shared is True when the result came from another caller's call.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shield so cancelling this caller does not cancel the call the others are waiting on
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                # The task only finishes cancelling later; a caller arriving meanwhile starts afresh
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            # Retrieve the exception so an abandoned call is not reported as never retrieved
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream_calls": self.upstream_calls,
+            "upstream_calls_saved": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,127 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from services.answer_cache import normalize_question
+
+FAST = "fast"
+FULL = "full"
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z'\-]*")
+
+# Cues that an answer needs several sections: itineraries, multi-step processes, comparisons
+COMPLEX_CUES = frozenset("""
+itinerary route routes layover layovers transit connecting multiple several various compare comparison
+difference differences versus vs between then after before afterwards countries schengen
+work study residence residency permanent family dependents business explain step steps
+""".split())
+
+# Cues that the user wants the documents and process spelled out
+DETAIL_CUES = frozenset("""
+documents document requirements required apply application process procedure checklist
+""".split())
+
+# Openers of short yes/no or single-fact questions
+FACTUAL_OPENERS = (
+    "do ", "does ", "is ", "are ", "can ", "should ", "will ",
+    "how long ", "how much ", "how many ", "when ", "what is the ",
+)
+
+
+@dataclass
+class Tier:
+    name: str
+    max_tokens: int
+    # Per-provider model override for this tier; providers without one keep their model
+    models: Dict[str, str]
+
+    def model_for(self, provider: str) -> Optional[str]:
+        return self.models.get(provider) or None
+
+
+@dataclass
+class Classification:
+    tier: Tier
+    score: float
+    features: Dict[str, float]
+
+
+class QuestionClassifier:
+    """
+    Local complexity classifier deciding which answer tier a question gets.
+
+    A small logistic model over cheap features of the question text: length, how many places
+    are named, complexity and detail cues, several questions in one, and yes/no openers. Short
+    factual questions score low and go to the fast tier with a small max_tokens; anything at
+    or above the threshold gets the full budget. Weights are hand-set, not learned.
+    """
+
+    WEIGHTS = {
+        "bias": -2.0,
+        "words": 0.06,
+        "extra_places": 0.6,
+        "complex_cues": 0.9,
+        "detail_cues": 0.6,
+        "extra_questions": 0.5,
+        "conjunctions": 0.3,
+        "factual_opener": -0.8,
+    }
+
+    def __init__(self, fast: Tier, full: Tier, threshold: float = 0.5, enabled: bool = True):
+        self.fast = fast
+        self.full = full
+        self.threshold = threshold
+        self.enabled = enabled
+        self.counts = {FAST: 0, FULL: 0}
+
+    @staticmethod
+    def features(question: str) -> Dict[str, float]:
+        normalized = normalize_question(question)
+        tokens = normalized.split()
+        words = _WORD.findall(question)
+        # Capitalized words past the first are mostly countries, cities and nationalities
+        places = sum(1 for word in words[1:] if word[0].isupper() and word.upper() != word)
+        return {
+            "words": float(len(tokens)),
+            "extra_places": float(max(0, places - 2)),
+            "complex_cues": float(sum(1 for token in tokens if token in COMPLEX_CUES)),
+            "detail_cues": float(min(2, sum(1 for token in tokens if token in DETAIL_CUES))),
+            "extra_questions": float(max(0, question.count("?") - 1)),
+            "conjunctions": float(tokens.count("and") + question.count(",") + question.count(";")),
+            "factual_opener": 1.0 if normalized.startswith(FACTUAL_OPENERS) else 0.0,
+        }
+
+    def score(self, features: Dict[str, float]) -> float:
+        z = self.WEIGHTS["bias"] + sum(self.WEIGHTS[name] * value for name, value in features.items())
+        return 1 / (1 + math.exp(-z))
+
+    def classify(self, question: str) -> Classification:
+        if not self.enabled:
+            return Classification(self.full, 1.0, {})
+        features = self.features(question)
+        score = self.score(features)
+        tier = self.full if score >= self.threshold else self.fast
+        self.counts[tier.name] += 1
+        return Classification(tier, score, features)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "fast": self.counts[FAST],
+            "full": self.counts[FULL],
+            "fast_rate": round(self.counts[FAST] / total, 4) if total else 0.0,
+            "max_tokens": {FAST: self.fast.max_tokens, FULL: self.full.max_tokens},
+        }
+
+
+# Create the classifier instance
+question_classifier = QuestionClassifier(
+    fast=Tier(FAST, settings.TIER_FAST_MAX_TOKENS, settings.TIER_FAST_MODELS),
+    full=Tier(FULL, settings.MAX_TOKENS, {}),
+    threshold=settings.TIER_THRESHOLD,
+    enabled=settings.TIERING_ENABLED,
+)
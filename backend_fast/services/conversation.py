@@ -0,0 +1,194 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import ConversationModel, SessionLocal, SessionModel, TokenUsageModel
+from services.llm_service import LLMResult, llm_service
+from services.token_accounting import TOKENS_PER_MESSAGE, estimate_tokens
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "Summary of the conversation so far:\n"
+
+
+class Turn(NamedTuple):
+    session_id: int
+    question: str
+    answer: str
+
+    @property
+    def tokens(self) -> int:
+        return 2 * TOKENS_PER_MESSAGE + estimate_tokens(self.question) + estimate_tokens(self.answer)
+
+
+def _newest(turns: List[Turn], budget: int) -> List[Turn]:
+    """The most recent turns that fit in budget tokens, oldest first"""
+    keep, used = [], 0
+    for turn in reversed(turns):
+        if used + turn.tokens > budget:
+            break
+        keep.insert(0, turn)
+        used += turn.tokens
+    return keep
+
+
+def _transcript(summary: str, turns: List[Turn]) -> str:
+    lines = [f"Previous summary:\n{summary or '(none)'}", "", "New turns:"]
+    for turn in turns:
+        lines.append(f"User: {turn.question}")
+        lines.append(f"Assistant: {turn.answer}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Context for follow-up questions in a conversation.
+
+    Earlier turns come from the user's stored sessions. The newest turns are sent verbatim and
+    older ones are folded into a rolling summary stored on the conversation, under a hard ceiling
+    of max_context_tokens for summary and turns together. When the turns outgrow their share, the
+    oldest are compacted until the rest fit in half of it, so the summary is rewritten once every
+    few turns rather than every turn, and between rewrites the prompt prefix stays byte-identical
+    for provider prefix caching.
+
+    Compaction runs after an answer has been sent, never in front of a question: until it has
+    caught up, the oldest turns are simply left out. The summary's tokens are stored as the
+    user's token usage, so they count against the daily budget.
+    """
+
+    def __init__(self, max_context_tokens: int = 1500, summary_max_tokens: int = 300, enabled: bool = True):
+        self.max_context_tokens = max_context_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.enabled = enabled
+        self._compacting: Set[str] = set()
+        self.compactions = 0
+        self.compaction_failures = 0
+        self.dropped_turns = 0
+
+    @property
+    def turn_budget(self) -> int:
+        # The summary's share is reserved up front, so summary + turns never exceed the ceiling
+        return max(0, self.max_context_tokens - self.summary_max_tokens)
+
+    def start(self, db: Session, user_id: str) -> ConversationModel:
+        now = datetime.utcnow()
+        conversation = ConversationModel(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            summary="",
+            summarized_through=0,
+            created_at=now,
+            updated_at=now
+        )
+        db.add(conversation)
+        db.commit()
+        return conversation
+
+    def find(self, db: Session, user_id: str, conversation_id: str) -> Optional[ConversationModel]:
+        return db.query(ConversationModel).filter(
+            ConversationModel.id == conversation_id,
+            ConversationModel.user_id == user_id
+        ).first()
+
+    def _turns(self, db: Session, conversation: ConversationModel) -> List[Turn]:
+        """Answered turns not yet folded into the summary, oldest first"""
+        rows = db.query(SessionModel.id, SessionModel.question, SessionModel.answer, SessionModel.cancelled).filter(
+            SessionModel.user_id == conversation.user_id,
+            SessionModel.conversation_id == conversation.id,
+            SessionModel.id > conversation.summarized_through,
+            SessionModel.is_successful == True
+        ).order_by(SessionModel.id).all()
+        return [Turn(session_id, question, answer) for session_id, question, answer, cancelled in rows
+                if answer and not cancelled]
+
+    def history(self, db: Session, conversation: ConversationModel) -> List[Dict[str, str]]:
+        """The messages to send before the next question: summary first, then recent turns"""
+        turns = self._turns(db, conversation)
+        recent = _newest(turns, self.turn_budget)
+        if len(recent) < len(turns):
+            # Waiting for a compaction to fold them into the summary
+            self.dropped_turns += len(turns) - len(recent)
+
+        messages = []
+        if conversation.summary:
+            messages.append({"role": "system", "content": SUMMARY_HEADER + conversation.summary})
+        for turn in recent:
+            messages.append({"role": "user", "content": turn.question})
+            messages.append({"role": "assistant", "content": turn.answer})
+        return messages
+
+    async def compact(self, conversation_id: str):
+        """
+        Fold the oldest turns into the summary if the turns outgrew their share of the context.
+        Meant to run after a turn was answered; it opens its own database session.
+        """
+        if conversation_id in self._compacting:
+            return
+        self._compacting.add(conversation_id)
+        db = SessionLocal()
+        try:
+            conversation = db.query(ConversationModel).filter(ConversationModel.id == conversation_id).first()
+            if conversation is None:
+                return
+            turns = self._turns(db, conversation)
+            if sum(turn.tokens for turn in turns) <= self.turn_budget:
+                return
+            older = turns[:len(turns) - len(_newest(turns, self.turn_budget // 2))]
+
+            result = await llm_service.summarize(_transcript(conversation.summary, older), conversation.user_id)
+            if result is not None:
+                self._record_usage(db, conversation.user_id, result)
+            if result is None or not result.is_successful:
+                self.compaction_failures += 1
+                logger.warning(f"Could not compact conversation {conversation.id}, {len(older)} turns stay left out")
+                return
+
+            conversation.summary = result.answer
+            conversation.summarized_through = older[-1].session_id
+            conversation.updated_at = datetime.utcnow()
+            db.commit()
+            self.compactions += 1
+            logger.info(f"Compacted {len(older)} turns of conversation {conversation.id} into its summary")
+        except Exception as e:
+            db.rollback()
+            self.compaction_failures += 1
+            logger.error(f"Error compacting conversation {conversation_id}: {e}")
+        finally:
+            db.close()
+            self._compacting.discard(conversation_id)
+
+    @staticmethod
+    def _record_usage(db: Session, user_id: str, result: LLMResult):
+        db.add(TokenUsageModel(
+            user_id=user_id,
+            purpose="summary",
+            llm_provider=result.provider,
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            response_time_ms=result.response_time_ms,
+            created_at=datetime.utcnow()
+        ))
+        db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_context_tokens": self.max_context_tokens,
+            "summary_max_tokens": self.summary_max_tokens,
+            "compactions": self.compactions,
+            "compaction_failures": self.compaction_failures,
+            "dropped_turns": self.dropped_turns,
+        }
+
+
+# Create the conversation memory instance
+conversation_memory = ConversationMemory(
+    max_context_tokens=settings.CONVERSATION_MAX_CONTEXT_TOKENS,
+    summary_max_tokens=settings.CONVERSATION_SUMMARY_MAX_TOKENS,
+    enabled=settings.CONVERSATION_ENABLED,
+)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from services.bulkhead import Bulkhead
+from services.retry_policy import RetryBudget
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    Hedged requests for tail latency.
+
+    If the first attempt has not answered after an adaptive delay (the observed `quantile` of
+    recent successful latencies, clamped to [min_delay_ms, max_delay_ms]), a second identical
+    attempt is started and whichever succeeds first wins; the other is cancelled. Hedges are
+    paid for from a budget capped at max_ratio of requests, so hedging cannot double spend.
+    Given the caller's bulkhead, a hedge also needs a slot of its own there, taken without
+    waiting, so hedging never pushes concurrency past the bulkhead's limit.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_delay_ms: float = 500,
+        max_delay_ms: float = 20000,
+        min_samples: int = 20,
+        window_size: int = 500,
+        budget: Optional[RetryBudget] = None,
+        enabled: bool = True,
+    ):
+        self.quantile = quantile
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self.budget = budget or RetryBudget(ratio=0.05, min_per_second=0, window_seconds=60)
+        self._latencies: Deque[float] = deque(maxlen=window_size)
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+        self.no_slot = 0
+
+    def delay_ms(self) -> float:
+        """How long the first attempt gets before a hedge is considered"""
+        if len(self._latencies) < self.min_samples:
+            return self.max_delay_ms
+        ordered = sorted(self._latencies)
+        rank = min(len(ordered) - 1, max(0, math.ceil(self.quantile * len(ordered)) - 1))
+        return min(self.max_delay_ms, max(self.min_delay_ms, ordered[rank]))
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[Any]]] = None,
+        bulkhead: Optional[Bulkhead] = None,
+    ) -> T:
+        """
+        Run call(), hedging it with a second call() if it is slow.
+        discard(result) releases a successful result that lost the race (e.g. closes a stream).
+        bulkhead is where the caller holds its slot; the hedge is skipped if it has none free.
+        """
+        if not self.enabled:
+            return await call()
+
+        self.requests += 1
+        self.budget.record_request()
+        primary = asyncio.ensure_future(call())
+        attempts = [primary]
+        started = {primary: time.monotonic()}
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.delay_ms() / 1000)
+            if not done:
+                if bulkhead is not None and not bulkhead.try_acquire():
+                    self.no_slot += 1
+                elif not self.budget.try_spend():
+                    if bulkhead is not None:
+                        bulkhead.release()
+                    self.over_budget += 1
+                else:
+                    self.hedged += 1
+                    logger.info(f"Hedging slow LLM call after {self.delay_ms():.0f}ms")
+                    hedge = asyncio.ensure_future(call())
+                    if bulkhead is not None:
+                        # Finished, failed or cancelled, the hedge's slot goes back
+                        hedge.add_done_callback(lambda _: bulkhead.release())
+                    attempts.append(hedge)
+                    started[hedge] = time.monotonic()
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in attempts if task in done and not task.cancelled() and task.exception() is None]
+                if winners:
+                    winner = winners[0]
+                    for loser in winners[1:]:
+                        if discard is not None:
+                            await discard(loser.result())
+                    if winner is not primary:
+                        self.hedge_wins += 1
+                    # The winning attempt's own latency, so hedging does not skew the threshold it is driven by
+                    self._latencies.append((time.monotonic() - started[winner]) * 1000)
+                    return winner.result()
+
+            # Every attempt failed, surface the primary's error
+            return primary.result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+            for task in attempts:
+                # Retrieve errors of abandoned attempts so they are not reported as never retrieved
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "delay_ms": round(self.delay_ms(), 1),
+            "samples": len(self._latencies),
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "over_budget": self.over_budget,
+            "no_slot": self.no_slot,
+        }
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.database import SessionLocal, JobModel
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class RetryJob(Exception):
+    """Raised by a handler to put its job back in the queue and retry it after retry_after seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _claim(job_id: str) -> bool:
+    """Move a job from queued to running; False if another worker got there first"""
+    db = SessionLocal()
+    try:
+        claimed = db.query(JobModel).filter(
+            JobModel.id == job_id,
+            JobModel.status == QUEUED
+        ).update({JobModel.status: RUNNING, JobModel.started_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def _requeue(job_ids: List[str]):
+    db = SessionLocal()
+    try:
+        db.query(JobModel).filter(
+            JobModel.id.in_(job_ids),
+            JobModel.status == RUNNING
+        ).update({JobModel.status: QUEUED, JobModel.started_at: None}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _fail(job_id: str, error_message: str):
+    db = SessionLocal()
+    try:
+        db.query(JobModel).filter(JobModel.id == job_id).update(
+            {JobModel.status: FAILED, JobModel.error_message: error_message, JobModel.finished_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _recoverable(stale_seconds: float) -> List[str]:
+    """Requeue jobs whose worker died mid-run, and return every queued job"""
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        db.query(JobModel).filter(
+            JobModel.status == RUNNING,
+            JobModel.started_at < stale_before
+        ).update({JobModel.status: QUEUED, JobModel.started_at: None}, synchronize_session=False)
+        db.commit()
+        return [job_id for (job_id,) in db.query(JobModel.id).filter(JobModel.status == QUEUED).all()]
+    finally:
+        db.close()
+
+
+class JobRunner:
+    """
+    Runs queued question jobs in the background of this instance.
+
+    Job state lives in the qa_jobs table, so any instance can report on any job. A job is claimed
+    with a conditional UPDATE before it runs, so it runs once even when several instances pick
+    it up. The handler does the actual work and records the outcome; jobs whose instance went away
+    mid-run are requeued once they have been running for longer than stale_seconds.
+
+    Background tasks only finish in a long-lived process, which also sweeps for stale and queued
+    jobs every sweep_interval seconds. Serverless hosts freeze the process once the response is
+    sent, so there jobs are run by drain() from a scheduled (cron) request instead.
+    """
+
+    def __init__(self, max_concurrent: int = 8, stale_seconds: float = 300.0, sweep_interval: float = 60.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.stale_seconds = stale_seconds
+        self.sweep_interval = sweep_interval
+        self._sweeper: Optional[asyncio.Task] = None
+        self.handler: Optional[Callable[[str], Awaitable[None]]] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._finished: Dict[str, asyncio.Event] = {}
+        self.completed = 0
+        self.retried = 0
+        self.errors = 0
+
+    def set_handler(self, handler: Callable[[str], Awaitable[None]]):
+        self.handler = handler
+
+    def submit(self, job_id: str, delay: float = 0.0) -> bool:
+        """Run a queued job here, after delay seconds; False if this instance already has it"""
+        if job_id in self._finished:
+            return False
+        self._finished[job_id] = asyncio.Event()
+        self._schedule(job_id, delay)
+        return True
+
+    def _schedule(self, job_id: str, delay: float):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        task = asyncio.create_task(self._run(job_id, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: str, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        async with self._slots:
+            if not await run_in_threadpool(_claim, job_id):
+                self._finished.pop(job_id, None)
+                return
+            self._running[job_id] = asyncio.current_task()
+            retry_after = None
+            try:
+                await self.handler(job_id)
+                self.completed += 1
+            except RetryJob as retry:
+                retry_after = retry.retry_after
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The handler records ordinary failures itself; this is a bug or a database outage
+                self.errors += 1
+                logger.error(f"Job {job_id} crashed: {e}")
+                try:
+                    await run_in_threadpool(_fail, job_id, "Failed to process question. Please try again.")
+                except Exception as db_error:
+                    logger.error(f"Could not mark job {job_id} as failed: {db_error}")
+            finally:
+                self._running.pop(job_id, None)
+                if retry_after is None:
+                    event = self._finished.pop(job_id, None)
+                    if event is not None:
+                        event.set()
+
+        if retry_after is not None:
+            self.retried += 1
+            await run_in_threadpool(_requeue, [job_id])
+            self._schedule(job_id, retry_after)
+
+    def runs(self, job_id: str) -> bool:
+        """Whether this instance has the job queued or running"""
+        return job_id in self._finished
+
+    async def wait(self, job_id: str, timeout: float) -> bool:
+        """Wait up to timeout for a job of this instance to finish; False on timeout"""
+        event = self._finished.get(job_id)
+        if event is None:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def recover(self):
+        """Pick up queued and abandoned jobs, e.g. after a restart"""
+        try:
+            job_ids = await run_in_threadpool(_recoverable, self.stale_seconds)
+        except Exception as e:
+            logger.error(f"Could not recover queued jobs: {e}")
+            return
+        submitted = sum(1 for job_id in job_ids if self.submit(job_id))
+        if submitted:
+            logger.info(f"Recovered {submitted} queued jobs")
+
+    def start_sweeper(self):
+        """Periodically requeue stale jobs and pick up queued ones; for long-lived processes only"""
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.recover()
+
+    async def drain(self, budget_seconds: float, max_jobs: int) -> Dict[str, int]:
+        """
+        Requeue stale jobs and run queued ones to completion within this call, for a cron request
+        on a serverless host. No new job is claimed after budget_seconds; jobs already running finish.
+        """
+        try:
+            job_ids = await run_in_threadpool(_recoverable, self.stale_seconds)
+        except Exception as e:
+            logger.error(f"Could not load queued jobs: {e}")
+            return {"attempted": 0, "left_queued": 0}
+        job_ids = [job_id for job_id in job_ids if not self.runs(job_id)][:max(0, max_jobs)]
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget_seconds
+        attempted = 0
+
+        async def worker():
+            nonlocal attempted
+            while job_ids and loop.time() < deadline:
+                job_id = job_ids.pop(0)
+                self._finished[job_id] = asyncio.Event()
+                attempted += 1
+                await self._run(job_id, 0.0)
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrent)))
+        if attempted:
+            logger.info(f"Drained {attempted} queued jobs, {len(job_ids)} left for the next run")
+        return {"attempted": attempted, "left_queued": len(job_ids)}
+
+    async def shutdown(self):
+        """Stop local work and hand interrupted jobs back to the queue for another instance"""
+        interrupted = list(self._running)
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if interrupted:
+            try:
+                await run_in_threadpool(_requeue, interrupted)
+                logger.info(f"Requeued {len(interrupted)} interrupted jobs")
+            except Exception as e:
+                logger.error(f"Could not requeue interrupted jobs: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "sweeping": self._sweeper is not None,
+            "running": len(self._running),
+            "pending": len(self._tasks) - len(self._running),
+            "completed": self.completed,
+            "retried": self.retried,
+            "errors": self.errors,
+        }
+
+
+# Create the runner instance
+job_runner = JobRunner(
+    max_concurrent=settings.JOB_CONCURRENCY,
+    stale_seconds=settings.JOB_STALE_SECONDS,
+    sweep_interval=settings.JOB_SWEEP_INTERVAL_SECONDS,
+)
@@ -1,136 +1,644 @@
+import asyncio
+import hashlib
+import json
 import time
 import logging
-import os
-from typing import Dict, Any, Tuple, Optional
-from openai import OpenAI
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Dict, Any, List, Tuple, Optional
+import httpx
 from core.config import settings
+from core.http_clients import llm_timeout
+from services.answer_cache import answer_cache
+from services.similarity_index import near_duplicate_index
+from services.coalescer import SingleFlight
+from services.bulkhead import Bulkhead, BulkheadFullError, BulkheadSlot
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN
+from services.retry_policy import (
+    DeadlineExceeded, RetryBudget, RetryPolicy, classify_error,
+    AUTH, CLIENT_ERROR, CIRCUIT_OPEN, CONNECTION, RATE_LIMITED, TIMEOUT
+)
+from services.hedging import HedgePolicy
+from services.providers import LLMProvider, build_providers
+from services.provider_router import ProviderRouter
+from services.complexity import Tier, question_classifier
+from services.token_accounting import TokenUsage, estimate_prompt_tokens, token_rollup, usage_from
+from services.prompts import TRAVEL_DOCS, CONVERSATION_SUMMARY, PromptTemplate, prompt_registry
 
 # Set up logging for debugging
 logger = logging.getLogger(__name__)
 
+@dataclass
+class LLMResult:
+    """Outcome of a single question"""
+    answer: str
+    response_time_ms: int
+    is_successful: bool
+    error_message: str = ""
+    cache_hit: bool = False
+    coalesced: bool = False
+    provider: str = ""
+    tier: str = ""
+    # Tokens this request spent upstream; zero for cache hits and coalesced followers
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Prompt tokens served from the provider's prefix cache, None when the provider does not say
+    prompt_cache_hit_tokens: Optional[int] = None
+
+def is_provider_fault(e: BaseException) -> bool:
+    """
+    Whether an error says the provider is degraded.
+    Bad requests and auth problems are on our side and must not open the circuit.
+    """
+    return classify_error(e) not in (AUTH, CLIENT_ERROR, CIRCUIT_OPEN)
+
+def _all_overloaded(errors: List[Tuple[str, Exception]]) -> Optional[BulkheadFullError]:
+    """The first bulkhead rejection if every provider was either saturated or circuit-open"""
+    overloads = [e for _, e in errors if isinstance(e, BulkheadFullError)]
+    if overloads and all(isinstance(e, (BulkheadFullError, CircuitOpenError)) for _, e in errors):
+        return overloads[0]
+    return None
+
+def _reportable(errors: List[Tuple[str, Exception]]) -> Tuple[str, Exception]:
+    """The provider error worth showing the user: the last one that was not just a full queue"""
+    return next(((p, e) for p, e in reversed(errors) if not isinstance(e, BulkheadFullError)), errors[-1])
+
 class LLMService:
     def __init__(self):
-        # Initialize OpenAI client configured for DeepSeek using environment variable
-        self.api_key = os.getenv('DEEPSEEK_API_KEY')
-        if not self.api_key:
-            raise ValueError("DEEPSEEK_API_KEY environment variable is required")
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.deepseek.com"
+        # One adapter per provider; only those with an API key are routed to
+        self.providers: Dict[str, LLMProvider] = build_providers()
+        configured = [name for name, provider in self.providers.items() if provider.configured]
+        if not configured:
+            raise ValueError("DEEPSEEK_API_KEY environment variable is required (or OPENAI_API_KEY, ANTHROPIC_API_KEY, GOOGLE_API_KEY, or MOCK_LLM_ENABLED)")
+        
+        self.provider = settings.LLM_PROVIDER if settings.LLM_PROVIDER in configured else configured[0]
+        self.router = ProviderRouter(
+            self.providers,
+            default=self.provider,
+            is_available=self._provider_available,
+            failover_order=settings.LLM_FAILOVER_ORDER or None,
+            failover_enabled=settings.LLM_FAILOVER_ENABLED,
+            degraded_error_rate=settings.LLM_ROUTER_DEGRADED_ERROR_RATE
+        )
+        # Identical questions in flight at the same time share one upstream completion
+        self.coalescer = SingleFlight()
+        # Per-provider concurrency limits with bounded wait queues
+        self.bulkheads: Dict[str, Bulkhead] = {}
+        # Per-provider circuit breakers so an outage fails fast instead of waiting out timeouts
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retry_policy = RetryPolicy(
+            max_retries=settings.LLM_MAX_RETRIES,
+            base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+            budget=RetryBudget(
+                ratio=settings.LLM_RETRY_BUDGET_RATIO,
+                min_per_second=settings.LLM_RETRY_BUDGET_MIN_PER_SECOND,
+                window_seconds=settings.LLM_RETRY_BUDGET_WINDOW_SECONDS
+            )
         )
-        self.provider = "deepseek"
-        logger.info("DeepSeek API client initialized successfully")
+        # Hedging thresholds per provider and per kind of call (full completions and stream starts
+        # have very different latencies); one shared budget keeps total hedging under HEDGING_MAX_RATIO
+        self.hedge_budget = RetryBudget(ratio=settings.HEDGING_MAX_RATIO, min_per_second=0, window_seconds=60)
+        self.hedgers: Dict[Tuple[str, bool], HedgePolicy] = {}
+        
+        logger.info(f"LLM providers initialized successfully (default {self.provider}, configured: {', '.join(configured)})")
+    
+    def bulkhead_for(self, provider: str) -> Bulkhead:
+        bulkhead = self.bulkheads.get(provider)
+        if bulkhead is None:
+            bulkhead = Bulkhead(
+                name=provider,
+                max_concurrent=settings.LLM_PROVIDER_CONCURRENCY.get(provider, settings.LLM_MAX_CONCURRENCY),
+                max_queue=settings.LLM_MAX_QUEUE,
+                max_wait=settings.LLM_MAX_QUEUE_WAIT_SECONDS
+            )
+            self.bulkheads[provider] = bulkhead
+        return bulkhead
+    
+    def breaker_for(self, provider: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name=provider,
+                failure_rate_threshold=settings.CIRCUIT_FAILURE_RATE_THRESHOLD,
+                slow_call_ms=settings.CIRCUIT_SLOW_CALL_MS,
+                slow_call_rate_threshold=settings.CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+                window_size=settings.CIRCUIT_WINDOW_SIZE,
+                minimum_calls=settings.CIRCUIT_MINIMUM_CALLS,
+                open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+                half_open_max_calls=settings.CIRCUIT_HALF_OPEN_MAX_CALLS,
+                is_failure=is_provider_fault
+            )
+            self.breakers[provider] = breaker
+        return breaker
+    
+    def hedger_for(self, provider: str, stream: bool) -> HedgePolicy:
+        hedger = self.hedgers.get((provider, stream))
+        if hedger is None:
+            hedger = HedgePolicy(
+                quantile=settings.HEDGING_QUANTILE,
+                min_delay_ms=settings.HEDGING_MIN_DELAY_MS,
+                max_delay_ms=settings.HEDGING_MAX_DELAY_MS,
+                min_samples=settings.HEDGING_MIN_SAMPLES,
+                budget=self.hedge_budget,
+                enabled=settings.HEDGING_ENABLED
+            )
+            self.hedgers[(provider, stream)] = hedger
+        return hedger
     
-    async def get_answer(self, question: str, user_id: Optional[str] = None,  llm_provider: str = "default") -> Tuple[str, int, bool, str]:
+    def _provider_available(self, provider: str) -> bool:
+        return not settings.CIRCUIT_BREAKER_ENABLED or self.breaker_for(provider).allows_calls()
+    
+    @contextmanager
+    def _guard(self, provider: str):
+        """Run a provider call under its circuit breaker, if enabled"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            yield
+            return
+        with self.breaker_for(provider).guard():
+            yield
+    
+    def _circuit_open(self, provider: str) -> Optional[CircuitOpenError]:
+        """Checked before queueing for the bulkhead, so an open circuit never waits for a slot"""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return None
+        breaker = self.breaker_for(provider)
+        if breaker.allows_calls():
+            return None
+        breaker.rejected += 1
+        return CircuitOpenError(provider, breaker.retry_after())
+    
+    async def _create_completion(self, provider: str, start_time: float, messages: List[Dict[str, str]],
+                                 tier: Tier, slot: BulkheadSlot, stream: bool = False):
+        """
+        Call a provider with retries and hedging, each attempt under the circuit breaker.
+        Attempts share one deadline measured from when the question arrived. The caller's
+        bulkhead slot is handed back during retry backoff, and a hedge needs a slot of its own.
+        Returns a Completion, or an opened TextStream when stream is True.
+        """
+        adapter = self.providers[provider]
+        deadline = self._deadline(start_time)
+        
+        async def single(remaining: Optional[float]):
+            call = adapter.open_stream if stream else adapter.complete
+            with self._guard(provider):
+                return await asyncio.wait_for(
+                    call(messages, tier.max_tokens, settings.TEMPERATURE,
+                         timeout=self._attempt_timeout(remaining), model=tier.model_for(provider)),
+                    timeout=remaining
+                )
+        
+        async def attempt(remaining: Optional[float]):
+            return await self.hedger_for(provider, stream).run(
+                lambda: single(remaining),
+                discard=self._close_stream if stream else None,
+                bulkhead=slot.bulkhead
+            )
+        
+        return await self.retry_policy.run(attempt, deadline=deadline, pause=slot.released)
+    
+    @staticmethod
+    def _deadline(start_time: float) -> float:
+        return start_time + settings.LLM_REQUEST_DEADLINE_SECONDS
+    
+    def _out_of_time(self, start_time: float, provider: str, user_id: Optional[str]) -> bool:
+        """Whether the shared deadline is spent, so failing over to provider could not even reach it"""
+        if time.time() < self._deadline(start_time):
+            return False
+        logger.warning(f"Request deadline spent, not failing over to {self.providers[provider].label} for user {user_id}")
+        return True
+    
+    @staticmethod
+    async def _close_stream(stream):
+        await stream.aclose()
+    
+    def _attempt_timeout(self, remaining: Optional[float]) -> httpx.Timeout:
+        if remaining is None:
+            return llm_timeout()
+        return httpx.Timeout(
+            min(settings.LLM_HTTP_TIMEOUT_SECONDS, remaining),
+            connect=min(settings.LLM_CONNECT_TIMEOUT_SECONDS, remaining)
+        )
+    
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        """Route provider calls through the shared connection pool owned by the app lifespan"""
+        for provider in self.providers.values():
+            provider.bind_http_client(http_client)
+    
+    def _model_key(self, provider: str, tier: Tier) -> str:
+        model = tier.model_for(provider) or self.providers[provider].model
+        return f"{provider}:{model}:{tier.name}:{tier.max_tokens}"
+    
+    @staticmethod
+    def _context_key(history: Optional[List[Dict[str, str]]]) -> str:
+        """Digest of the conversation history a question is asked in, empty for a standalone question"""
+        if not history:
+            return ""
+        return hashlib.sha256(json.dumps(history, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    
+    def _prompt_key(self, context: str) -> str:
+        # The prompt version is part of the key so answers to an old prompt are not served,
+        # and the conversation so far so a follow-up is only answered the same way in the same context
+        return f"{self._prompt().key}#{context}" if context else self._prompt().key
+    
+    def _cache_key(self, question: str, provider: str, tier: Tier, context: str = "") -> str:
+        return answer_cache.make_key(question, self._model_key(provider, tier), settings.TEMPERATURE, self._prompt_key(context))
+    
+    def _cache_namespace(self, provider: str, tier: Tier, context: str = "") -> str:
+        return f"{self._model_key(provider, tier)}|{settings.TEMPERATURE}|{self._prompt_key(context)}"
+    
+    def _cached_answer(self, question: str, cache_key: str, provider: str, tier: Tier, context: str = "") -> Optional[str]:
+        """
+        Look up an answer for the question, exact match first, then near-duplicate questions
+        """
+        cached_answer = answer_cache.get(cache_key)
+        if cached_answer or not settings.NEAR_DUP_ENABLED:
+            return cached_answer
+        
+        match = near_duplicate_index.lookup(question, namespace=self._cache_namespace(provider, tier, context))
+        if match is None:
+            return None
+        
+        cached_answer = answer_cache.get(match.cache_key)
+        if cached_answer:
+            logger.info(f"Near-duplicate cache hit (similarity {match.similarity:.2f}) for: {match.question[:50]}")
+        else:
+            # The answer expired, the index entry is useless now
+            near_duplicate_index.discard(match.cache_key)
+        return cached_answer
+    
+    def _remember_answer(self, question: str, cache_key: str, answer: str, provider: str, tier: Tier, context: str = ""):
+        answer_cache.put(cache_key, answer)
+        if settings.NEAR_DUP_ENABLED and answer_cache.enabled:
+            near_duplicate_index.add(question, cache_key, namespace=self._cache_namespace(provider, tier, context))
+    
+    def estimate_prompt_tokens(self, question: str, history: Optional[List[Dict[str, str]]] = None) -> int:
+        """Local estimate of the prompt tokens a question costs, before asking any provider"""
+        return estimate_prompt_tokens(self._build_messages(question, history))
+    
+    @staticmethod
+    def _within_budget(tier: Tier, max_tokens: Optional[int]) -> Tier:
+        """The tier with its answer budget lowered to max_tokens, if that is smaller"""
+        if max_tokens is None or max_tokens >= tier.max_tokens:
+            return tier
+        return replace(tier, max_tokens=max(1, max_tokens))
+    
+    async def get_answer(self, question: str, user_id: Optional[str] = None,  llm_provider: str = "default",
+                         max_tokens: Optional[int] = None, history: Optional[List[Dict[str, str]]] = None) -> LLMResult:
         """
         Get answer from LLM provider
         Args:
             question: The user's question
             user_id: The authenticated user ID from Clerk
-        Returns: (answer, response_time_ms, is_successful, error_message)
+            llm_provider: Preferred provider ("default" for LLM_PROVIDER); others are used on failover
+            max_tokens: Cap on completion tokens, e.g. what is left of the user's token budget
+            history: Earlier conversation messages to answer the question in, see services.conversation
+        Returns: LLMResult with answer, response_time_ms, is_successful, error_message, cache_hit, provider and token counts
         """
         start_time = time.time()
+        # Answers are cached per requested provider, whichever provider ended up answering
+        requested = self.router.resolve(llm_provider)
+        route = self.router.route(requested)
+        # Short factual questions get the fast tier's smaller answer budget
+        classified = question_classifier.classify(question).tier
         
-        try:
-            if self.provider == "deepseek":
-                return await self._call_deepseek(question, start_time, user_id)
-            else:
-                return "", 0, False, f"Unsupported LLM provider: {self.provider}"
-                
-        except Exception as e:
+        # Serve repeated and near-duplicate questions from the answer cache
+        context = self._context_key(history)
+        cache_key = self._cache_key(question, requested, classified, context)
+        cached_answer = self._cached_answer(question, cache_key, requested, classified, context)
+        if cached_answer:
             response_time = int((time.time() - start_time) * 1000)
-            logger.error(f"Unexpected error in get_answer for user {user_id}: {str(e)}")
-            return "", response_time, False, str(e)
+            logger.info(f"Answer cache hit for user {user_id or 'anonymous'} in {response_time}ms")
+            return LLMResult(cached_answer, response_time, True, "", cache_hit=True, provider=requested, tier=classified.name)
+        
+        # A budget-capped answer may be cut short: it is neither cached nor shared with uncapped callers
+        tier = self._within_budget(classified, max_tokens)
+        capped = tier is not classified
+        flight_key = f"{cache_key}|max_tokens={tier.max_tokens}" if capped else cache_key
+        result, shared = await self.coalescer.do(
+            flight_key, lambda: self._generate(question, cache_key, requested, route, tier, start_time, user_id,
+                                               cache=not capped, history=history)
+        )
+        if shared:
+            logger.info(f"Coalesced identical in-flight question for user {user_id or 'anonymous'}")
+            # Same answer, but timing is what this caller actually waited
+            return LLMResult(
+                result.answer,
+                int((time.time() - start_time) * 1000),
+                result.is_successful,
+                result.error_message,
+                coalesced=True,
+                provider=result.provider,
+                tier=result.tier
+            )
+        return result
     
-    async def _call_deepseek(self, question: str, start_time: float, user_id: Optional[str] = None) -> Tuple[str, int, bool, str]:
+    async def _generate(self, question: str, cache_key: str, requested: str, route: List[str],
+                        tier: Tier, start_time: float, user_id: Optional[str] = None, cache: bool = True,
+                        history: Optional[List[Dict[str, str]]] = None) -> LLMResult:
         """
-        Call DeepSeek API using OpenAI SDK
+        Try the routed providers in order until one answers, and cache a successful answer
         """
-        # Enhanced prompt for travel documentation with user context
-        system_prompt = """You are a helpful travel documentation assistant. When users ask about travel requirements, provide comprehensive, accurate, and up-to-date information including:
-        1. Visa requirements and application process
-        2. Passport requirements (validity period, blank pages)
-        3. Additional supporting documents
-        4. Health requirements (vaccinations, health certificates)
-        5. Travel advisories and restrictions
-        6. Useful tips and recommendations
+        messages = self._build_messages(question, history)
+        errors: List[Tuple[str, Exception]] = []
         
-        Format your response clearly with sections and bullet points for easy reading.
-        Be conversational and helpful while maintaining accuracy."""
-        
-        try:
-            # Log the request (without logging sensitive data)
-            logger.info(f"Making request to DeepSeek API for user: {user_id or 'anonymous'}")
-            logger.debug(f"Question length: {len(question)} characters")
+        for index, provider in enumerate(route):
+            if index:
+                if self._out_of_time(start_time, provider, user_id):
+                    break
+                self.router.record_failover(route[index - 1], provider)
             
-            # Make the API call with proper error handling
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question}
-                ],
-                max_tokens=2000,
-                temperature=0.3,
-                stream=False
-            )
+            open_error = self._circuit_open(provider)
+            if open_error:
+                errors.append((provider, open_error))
+                continue
             
-            response_time = int((time.time() - start_time) * 1000)
+            call_start = time.time()
+            try:
+                async with self.bulkhead_for(provider).slot() as slot:
+                    logger.info(f"Making request to {self.providers[provider].label} for user: {user_id or 'anonymous'}")
+                    completion = await self._create_completion(provider, start_time, messages, tier, slot)
+            except BulkheadFullError as overload:
+                # Saturated: spill over to the next provider, 503 only if all of them are
+                errors.append((provider, overload))
+                continue
+            except DeadlineExceeded as e:
+                # Never reached the provider, so its health is not in question
+                errors.append((provider, e))
+                break
+            except Exception as e:
+                self.router.record(provider, (time.time() - call_start) * 1000, ok=False)
+                errors.append((provider, e))
+                logger.warning(f"{self.providers[provider].label} call failed for user {user_id}: {e}")
+                if not is_provider_fault(e):
+                    # The request itself was refused, another provider will not do better
+                    break
+                continue
             
-            # Log successful response
-            logger.info(f"DeepSeek API response received successfully in {response_time}ms for user: {user_id or 'anonymous'}")
+            self.router.record(provider, (time.time() - call_start) * 1000, ok=True)
+            response_time = int((time.time() - start_time) * 1000)
+            answer = completion.text.strip()
+            usage = self._account(completion.usage, messages, answer, user_id, provider, tier, response_time)
+            if not answer:
+                logger.warning(f"Empty response from {provider} for user: {user_id}")
+                return LLMResult("", response_time, False, f"Empty response from {self.providers[provider].label} API",
+                                 provider=provider, tier=tier.name,
+                                 prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens,
+                                 prompt_cache_hit_tokens=usage.prompt_cache_hit_tokens)
             
-            # Extract and validate the answer
-            if response.choices and len(response.choices) > 0:
-                answer = response.choices[0].message.content
-                if answer and answer.strip():
-                    return answer.strip(), response_time, True, ""
-                else:
-                    logger.warning(f"Empty response from DeepSeek API for user: {user_id}")
-                    return "", response_time, False, "Empty response from DeepSeek API"
-            else:
-                logger.error(f"No choices in DeepSeek API response for user: {user_id}")
-                return "", response_time, False, "No choices in response from DeepSeek API"
-                
-        except Exception as e:
+            logger.info(f"{self.providers[provider].label} response received successfully in {response_time}ms for user: {user_id or 'anonymous'}")
+            if cache:
+                self._remember_answer(question, cache_key, answer, requested, tier, self._context_key(history))
+            return LLMResult(answer, response_time, True, provider=provider, tier=tier.name,
+                             prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens,
+                             prompt_cache_hit_tokens=usage.prompt_cache_hit_tokens)
+        
+        overload = _all_overloaded(errors)
+        if overload:
+            raise overload
+        
+        response_time = int((time.time() - start_time) * 1000)
+        provider, failed = _reportable(errors)
+        return LLMResult("", response_time, False, self._describe_error(failed, user_id, provider),
+                         provider=provider, tier=tier.name)
+    
+    def _account(self, reported: Dict[str, int], messages: List[Dict[str, str]], answer: str,
+                 user_id: Optional[str], provider: str, tier: Tier, response_time: int,
+                 prompt_key: Optional[str] = None) -> TokenUsage:
+        """Token usage of a generated answer, estimated locally where the provider did not report it"""
+        usage = usage_from(reported, messages, answer)
+        token_rollup.record(user_id, tier.name, provider, usage, response_time, prompt=prompt_key or self._prompt().key)
+        return usage
+    
+    async def summarize(self, text: str, user_id: Optional[str] = None) -> Optional[LLMResult]:
+        """
+        Condense conversation text with the summary prompt, on the first available provider.
+        Returns the summary with the tokens it cost, or None if no provider could be reached;
+        callers fall back to leaving old turns out.
+        """
+        prompt = prompt_registry.get(CONVERSATION_SUMMARY)
+        messages = prompt.build(text)
+        tier = Tier("summary", settings.CONVERSATION_SUMMARY_MAX_TOKENS, settings.TIER_FAST_MODELS)
+        start_time = time.time()
+        
+        for provider in self.router.route(self.provider):
+            if self._circuit_open(provider):
+                continue
+            try:
+                async with self.bulkhead_for(provider).slot() as slot:
+                    completion = await self._create_completion(provider, start_time, messages, tier, slot)
+            except Exception as e:
+                logger.warning(f"{self.providers[provider].label} summary failed for user {user_id}: {e}")
+                continue
+            summary = completion.text.strip()
+            response_time = int((time.time() - start_time) * 1000)
+            usage = self._account(completion.usage, messages, summary, user_id, provider, tier, response_time,
+                                  prompt_key=prompt.key)
+            return LLMResult(summary, response_time, bool(summary),
+                             "" if summary else f"Empty response from {self.providers[provider].label} API",
+                             provider=provider, tier=tier.name,
+                             prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens,
+                             prompt_cache_hit_tokens=usage.prompt_cache_hit_tokens)
+        return None
+    
+    @staticmethod
+    def _prompt() -> PromptTemplate:
+        return prompt_registry.get(TRAVEL_DOCS)
+    
+    def _build_messages(self, question: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a question: the active prompt's fixed prefix, any conversation
+        history, then the question
+        """
+        return self._prompt().build(question, history)
+    
+    def _describe_error(self, e: Exception, user_id: Optional[str] = None, provider: Optional[str] = None) -> str:
+        """
+        Turn a provider exception into a user facing error message
+        """
+        error_str = str(e)
+        error_class = classify_error(e)
+        label = self.providers[provider].label if provider in self.providers else "LLM"
+        
+        # Enhanced error handling with user context
+        if error_class == CIRCUIT_OPEN:
+            error_msg = f"{label} API is temporarily unavailable. Please try again in {e.retry_after} seconds."
+            logger.warning(f"Circuit open, failing fast for user {user_id}")
+        elif error_class == AUTH:
+            error_msg = f"Authentication failed. Please check your {label} API key configuration."
+            logger.error(f"Auth error for user {user_id}: {error_str}")
+        elif error_class == RATE_LIMITED:
+            error_msg = "Rate limit exceeded or quota exhausted. Please try again later."
+            logger.warning(f"Rate limit error for user {user_id}: {error_str}")
+        elif error_class == TIMEOUT:
+            error_msg = f"Request timeout - {label} API took too long to respond"
+            logger.error(f"Timeout error for user {user_id}: {error_str}")
+        elif error_class == CONNECTION:
+            error_msg = f"Network error: Unable to connect to {label} API"
+            logger.error(f"Network error for user {user_id}: {error_str}")
+        else:
+            error_msg = f"{label} API error: {error_str}"
+            logger.error(f"General API error for user {user_id}: {error_str}")
+        
+        return error_msg
+    
+    async def stream_answer(self, question: str, user_id: Optional[str] = None, llm_provider: str = "default",
+                            max_tokens: Optional[int] = None,
+                            history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an answer from the LLM provider as it is generated
+        Yields {"type": "delta", "content": str} events followed by a single
+        {"type": "done", ...} event carrying the full answer, timings and token counts
+        """
+        start_time = time.time()
+        first_token_ms = None
+        parts = []
+        requested = self.router.resolve(llm_provider)
+        route = self.router.route(requested)
+        classified = question_classifier.classify(question).tier
+        
+        context = self._context_key(history)
+        cache_key = self._cache_key(question, requested, classified, context)
+        cached_answer = self._cached_answer(question, cache_key, requested, classified, context)
+        if cached_answer:
             response_time = int((time.time() - start_time) * 1000)
-            error_str = str(e)
+            yield {"type": "delta", "content": cached_answer}
+            yield {
+                "type": "done",
+                "answer": cached_answer,
+                "response_time_ms": response_time,
+                "time_to_first_token_ms": response_time,
+                "is_successful": True,
+                "error_message": "",
+                "cache_hit": True,
+                "provider": requested,
+                "tier": classified.name,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_cache_hit_tokens": None
+            }
+            return
+        
+        tier = self._within_budget(classified, max_tokens)
+        messages = self._build_messages(question, history)
+        errors: List[Tuple[str, Exception]] = []
+        answer, is_successful, error_message, used = "", False, "", route[0]
+        usage = TokenUsage(0, 0)
+        
+        # Fail over only while opening the stream; once text has been sent the provider is fixed
+        for index, provider in enumerate(route):
+            if index:
+                if self._out_of_time(start_time, provider, user_id):
+                    break
+                self.router.record_failover(route[index - 1], provider)
             
-            # Enhanced error handling with user context
-            if "authentication" in error_str.lower() or "unauthorized" in error_str.lower():
-                error_msg = "Authentication failed. Please check your DeepSeek API key configuration."
-                logger.error(f"Auth error for user {user_id}: {error_str}")
-            elif "rate limit" in error_str.lower() or "quota" in error_str.lower():
-                error_msg = "Rate limit exceeded or quota exhausted. Please try again later."
-                logger.warning(f"Rate limit error for user {user_id}: {error_str}")
-            elif "timeout" in error_str.lower():
-                error_msg = "Request timeout - DeepSeek API took too long to respond"
-                logger.error(f"Timeout error for user {user_id}: {error_str}")
-            elif "connection" in error_str.lower() or "network" in error_str.lower():
-                error_msg = f"Network error: Unable to connect to DeepSeek API"
-                logger.error(f"Network error for user {user_id}: {error_str}")
-            else:
-                error_msg = f"DeepSeek API error: {error_str}"
-                logger.error(f"General API error for user {user_id}: {error_str}")
+            open_error = self._circuit_open(provider)
+            if open_error:
+                errors.append((provider, open_error))
+                continue
             
-            return "", response_time, False, error_msg
-
+            try:
+                async with self.bulkhead_for(provider).slot() as slot:
+                    logger.info(f"Making streaming request to {self.providers[provider].label} for user: {user_id or 'anonymous'}")
+                    call_start = time.time()
+                    try:
+                        # Only opening the stream is retried; the breaker judges how fast it starts
+                        stream = await self._create_completion(provider, start_time, messages, tier, slot, stream=True)
+                    except DeadlineExceeded as e:
+                        # Never reached the provider, so its health is not in question
+                        errors.append((provider, e))
+                        break
+                    except Exception as e:
+                        self.router.record(provider, (time.time() - call_start) * 1000, ok=False)
+                        errors.append((provider, e))
+                        logger.warning(f"{self.providers[provider].label} stream failed to start for user {user_id}: {e}")
+                        if is_provider_fault(e):
+                            continue
+                        break
+                    self.router.record(provider, (time.time() - call_start) * 1000, ok=True)
+                    used = provider
+                    
+                    try:
+                        async for delta in stream:
+                            if first_token_ms is None:
+                                first_token_ms = int((time.time() - start_time) * 1000)
+                            parts.append(delta)
+                            yield {"type": "delta", "content": delta}
+                        
+                        answer = "".join(parts).strip()
+                        is_successful = bool(answer)
+                        error_message = "" if is_successful else f"Empty response from {self.providers[provider].label} API"
+                        if is_successful and tier is classified:
+                            self._remember_answer(question, cache_key, answer, requested, tier, context)
+                    except Exception as e:
+                        answer = "".join(parts).strip()
+                        error_message = self._describe_error(e, user_id, provider)
+                    finally:
+                        # A stream cut short usually never reports usage; partial answers are estimated.
+                        # Accounted before closing, in case a cancelled close never returns
+                        usage = self._account(stream.usage, messages, "".join(parts), user_id, provider, tier,
+                                              int((time.time() - start_time) * 1000))
+                        await stream.aclose()
+                    break
+            except BulkheadFullError as overload:
+                # Raised before the first event, so an all-saturated route becomes a 503
+                errors.append((provider, overload))
+                continue
+        else:
+            overload = _all_overloaded(errors)
+            if overload:
+                raise overload
+        
+        if not is_successful and not error_message and errors:
+            used, failed = _reportable(errors)
+            error_message = self._describe_error(failed, user_id, used)
+        
+        response_time = int((time.time() - start_time) * 1000)
+        logger.info(f"Stream finished in {response_time}ms (first token {first_token_ms}ms) for user: {user_id or 'anonymous'}")
+        yield {
+            "type": "done",
+            "answer": answer,
+            "response_time_ms": response_time,
+            "time_to_first_token_ms": first_token_ms,
+            "is_successful": is_successful,
+            "error_message": error_message,
+            "cache_hit": False,
+            "provider": used,
+            "tier": tier.name,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "prompt_cache_hit_tokens": usage.prompt_cache_hit_tokens
+        }
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Runtime metrics for the LLM layer
+        """
+        return {
+            "answer_cache": answer_cache.stats(),
+            "near_duplicate_index": near_duplicate_index.stats(),
+            "coalescing": self.coalescer.stats(),
+            "router": self.router.stats(),
+            "tiering": question_classifier.stats(),
+            "tokens": token_rollup.stats(),
+            "prompts": prompt_registry.stats(),
+            "bulkheads": {name: bulkhead.stats() for name, bulkhead in self.bulkheads.items()},
+            "circuit_breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+            "retries": self.retry_policy.stats(),
+            "hedging": {
+                f"{provider}:{'stream' if stream else 'completion'}": hedger.stats()
+                for (provider, stream), hedger in self.hedgers.items()
+            }
+        }
+    
     # Health check method for the service
     def health_check(self) -> Dict[str, Any]:
         """
         Check the health of the LLM service
         """
         try:
-            # Simple check to see if we can initialize the client
-            if self.client and self.api_key:
-                return {
-                    "status": "healthy",
-                    "provider": self.provider,
-                    "api_configured": True,
-                    "timestamp": time.time()
-                }
-            else:
+            configured = self.router.configured()
+            if not configured:
                 return {
                     "status": "unhealthy",
                     "provider": self.provider,
@@ -138,6 +646,24 @@ class LLMService:
                     "error": "API client not properly configured",
                     "timestamp": time.time()
                 }
+            
+            circuits = {name: self.breaker_for(name).stats() for name in configured}
+            default_state = circuits.get(self.provider, {}).get("state")
+            if default_state == CLOSED:
+                status = "healthy"
+            elif default_state == HALF_OPEN or any(c["state"] == CLOSED for c in circuits.values()):
+                # The default provider is struggling but requests can still fail over
+                status = "degraded"
+            else:
+                status = "unhealthy"
+            return {
+                "status": status,
+                "provider": self.provider,
+                "api_configured": self.provider in configured,
+                "circuit_breaker": circuits.get(self.provider),
+                "providers": circuits,
+                "timestamp": time.time()
+            }
         except Exception as e:
             return {
                 "status": "unhealthy",
@@ -147,21 +673,5 @@ class LLMService:
                 "timestamp": time.time()
             }
 
-    # Placeholder methods for future LLM providers
-    async def _call_openai(self, question: str, start_time: float, user_id: Optional[str] = None) -> Tuple[str, int, bool, str]:
-        response_time = int((time.time() - start_time) * 1000)
-        logger.info(f"OpenAI integration requested for user {user_id} but not implemented")
-        return "", response_time, False, "OpenAI integration not implemented"
-    
-    async def _call_anthropic(self, question: str, start_time: float, user_id: Optional[str] = None) -> Tuple[str, int, bool, str]:
-        response_time = int((time.time() - start_time) * 1000)
-        logger.info(f"Anthropic integration requested for user {user_id} but not implemented")
-        return "", response_time, False, "Anthropic integration not implemented"
-    
-    async def _call_google(self, question: str, start_time: float, user_id: Optional[str] = None) -> Tuple[str, int, bool, str]:
-        response_time = int((time.time() - start_time) * 1000)
-        logger.info(f"Google Gemini integration requested for user {user_id} but not implemented")
-        return "", response_time, False, "Google Gemini integration not implemented"
-
 # Create the service instance
 llm_service = LLMService()
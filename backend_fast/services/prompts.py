@@ -0,0 +1,121 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+TRAVEL_DOCS = "travel-docs"
+CONVERSATION_SUMMARY = "conversation-summary"
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A versioned system prompt.
+
+    The system message is the shared prefix of every request built from the template, and
+    providers with prefix (context) caching only discount requests whose prefix is byte-for-byte
+    identical. So the text is fixed at registration and never formatted; everything that varies
+    per request goes in later messages. Changing the text means registering a new version.
+    """
+    name: str
+    version: str
+    system: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    @property
+    def fingerprint(self) -> str:
+        return hashlib.sha256(self.system.encode("utf-8")).hexdigest()[:16]
+
+    def build(self, question: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """The fixed system prefix, then any conversation history, then the question"""
+        return [
+            {"role": "system", "content": self.system},
+            *(history or []),
+            {"role": "user", "content": question}
+        ]
+
+
+def _unstable(text: str) -> Optional[str]:
+    """Why text would not make a reliable cache prefix, if it would not"""
+    if not text:
+        return "it is empty"
+    if "\r" in text:
+        return "it contains carriage returns"
+    if any(line != line.rstrip() for line in text.split("\n")):
+        return "a line has trailing whitespace"
+    return None
+
+
+class PromptRegistry:
+    """
+    Prompt templates by name and version, with one active version per name
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._active: Dict[str, str] = {}
+
+    def register(self, template: PromptTemplate, activate: bool = True) -> PromptTemplate:
+        problem = _unstable(template.system)
+        if problem:
+            raise ValueError(f"Prompt {template.key} is not byte-stable: {problem}")
+        existing = self._templates.get(template.key)
+        if existing is not None and existing.system != template.system:
+            raise ValueError(f"Prompt {template.key} is already registered with different text, register a new version")
+        self._templates[template.key] = template
+        if activate or template.name not in self._active:
+            self._active[template.name] = template.version
+        logger.info(f"Registered prompt {template.key} (fingerprint {template.fingerprint})")
+        return template
+
+    def activate(self, name: str, version: str):
+        if f"{name}@{version}" not in self._templates:
+            raise KeyError(f"Unknown prompt {name}@{version}")
+        self._active[name] = version
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        """The given version of a prompt, or its active version"""
+        return self._templates[f"{name}@{version or self._active[name]}"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "active": f"{name}@{version}",
+                "fingerprint": self.get(name).fingerprint,
+                "versions": sorted(t.version for t in self._templates.values() if t.name == name)
+            }
+            for name, version in self._active.items()
+        }
+
+
+# Create the registry instance
+prompt_registry = PromptRegistry()
+
+# v1 was an indented literal built inside LLMService; v2 is the same text without the indentation
+prompt_registry.register(PromptTemplate(TRAVEL_DOCS, "v2", "\n".join([
+    "You are a helpful travel documentation assistant. When users ask about travel requirements, "
+    "provide comprehensive, accurate, and up-to-date information including:",
+    "1. Visa requirements and application process",
+    "2. Passport requirements (validity period, blank pages)",
+    "3. Additional supporting documents",
+    "4. Health requirements (vaccinations, health certificates)",
+    "5. Travel advisories and restrictions",
+    "6. Useful tips and recommendations",
+    "",
+    "Format your response clearly with sections and bullet points for easy reading.",
+    "Be conversational and helpful while maintaining accuracy.",
+])))
+
+prompt_registry.register(PromptTemplate(CONVERSATION_SUMMARY, "v1", "\n".join([
+    "You keep a running summary of a conversation between a traveller and a travel documentation assistant.",
+    "Merge the previous summary and the new turns into one concise summary.",
+    "Keep what later answers depend on: nationalities and passports held, destinations, dates, itinerary, "
+    "purpose of travel, and what has already been answered.",
+    "Write plain sentences, no more than 150 words. Reply with the summary only.",
+])))
@@ -0,0 +1,123 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from services.providers import LLMProvider
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class ProviderScore:
+    """Exponentially weighted latency and error rate of one provider"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+
+    def record(self, latency_ms: float, ok: bool):
+        self.calls += 1
+        if ok:
+            # Failed calls often return fast; only successes say how slow the provider is
+            self.latency_ms = latency_ms if self.latency_ms is None else (
+                self.alpha * latency_ms + (1 - self.alpha) * self.latency_ms
+            )
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+    def value(self) -> float:
+        """Lower is better; errors weigh heavily so a fast but failing provider is not preferred"""
+        if self.latency_ms is None:
+            return float("inf")
+        return self.latency_ms * (1 + 4 * self.error_rate)
+
+
+class ProviderRouter:
+    """
+    Chooses the order in which providers are tried for a request.
+
+    The requested provider (or LLM_PROVIDER for "default") goes first while it is healthy and its
+    rolling error rate is below degraded_error_rate. The other configured providers follow, best
+    rolling score first, so a failing primary fails over to whichever backup is doing best.
+    Providers whose circuit is open are moved to the end.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, LLMProvider],
+        default: str,
+        is_available: Callable[[str], bool],
+        failover_order: Optional[List[str]] = None,
+        failover_enabled: bool = True,
+        degraded_error_rate: float = 0.5,
+        alpha: float = 0.2,
+    ):
+        self.providers = providers
+        self.default = default
+        self.is_available = is_available
+        self.failover_order = failover_order or list(providers)
+        self.failover_enabled = failover_enabled
+        self.degraded_error_rate = degraded_error_rate
+        self.scores = {name: ProviderScore(alpha) for name in providers}
+        self.failovers = 0
+
+    def configured(self) -> List[str]:
+        return [name for name, provider in self.providers.items() if provider.configured]
+
+    def resolve(self, requested: Optional[str]) -> str:
+        """Map a requested provider name to a configured provider"""
+        requested = (requested or "default").lower()
+        provider = self.providers.get(requested)
+        if provider is not None and provider.configured:
+            return requested
+        if requested != "default":
+            logger.warning(f"Requested LLM provider '{requested}' is not available, using {self.default}")
+        return self.default
+
+    def route(self, requested: Optional[str]) -> List[str]:
+        primary = self.resolve(requested)
+        if not self.failover_enabled:
+            return [primary]
+
+        order = {name: index for index, name in enumerate(self.failover_order)}
+        backups = sorted(
+            (name for name in self.configured() if name != primary and name in order),
+            key=lambda name: (not self.is_available(name), self.scores[name].value(), order[name])
+        )
+
+        primary_degraded = (
+            not self.is_available(primary)
+            or self.scores[primary].error_rate >= self.degraded_error_rate
+        )
+        healthy_backups = [name for name in backups if self.is_available(name)]
+        if primary_degraded and healthy_backups:
+            # Keep the primary as a last resort rather than dropping it
+            return healthy_backups + [primary] + [name for name in backups if name not in healthy_backups]
+        return [primary] + backups
+
+    def record(self, provider: str, latency_ms: float, ok: bool):
+        score = self.scores.get(provider)
+        if score is not None:
+            score.record(latency_ms, ok)
+
+    def record_failover(self, from_provider: str, to_provider: str):
+        self.failovers += 1
+        logger.warning(f"Failing over from {from_provider} to {to_provider}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "failover_enabled": self.failover_enabled,
+            "failovers": self.failovers,
+            "providers": {
+                name: {
+                    "configured": self.providers[name].configured,
+                    "available": self.is_available(name),
+                    "model": self.providers[name].model,
+                    "calls": score.calls,
+                    "latency_ms": round(score.latency_ms, 1) if score.latency_ms is not None else None,
+                    "error_rate": round(score.error_rate, 4),
+                }
+                for name, score in self.scores.items()
+            },
+        }
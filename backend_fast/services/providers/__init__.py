@@ -0,0 +1,48 @@
+from typing import Dict
+
+from core.config import settings
+from services.providers.base import Completion, LLMProvider, Messages, TextStream
+from services.providers.openai_compatible import OpenAICompatibleProvider
+from services.providers.anthropic import AnthropicProvider
+from services.providers.google import GoogleProvider
+from services.providers.mock import MockProvider
+
+
+def build_providers() -> Dict[str, LLMProvider]:
+    """All provider adapters, configured or not; unconfigured ones are never routed to"""
+    providers = [
+        OpenAICompatibleProvider("deepseek", "DeepSeek", settings.DEEPSEEK_API_KEY,
+                                 settings.DEEPSEEK_MODEL, settings.DEEPSEEK_BASE_URL),
+        OpenAICompatibleProvider("openai", "OpenAI", settings.OPENAI_API_KEY,
+                                 settings.OPENAI_MODEL, settings.OPENAI_BASE_URL),
+        AnthropicProvider(settings.ANTHROPIC_API_KEY, settings.ANTHROPIC_MODEL, settings.ANTHROPIC_BASE_URL),
+        GoogleProvider(settings.GOOGLE_API_KEY, settings.GOOGLE_MODEL, settings.GOOGLE_BASE_URL),
+        MockProvider(
+            settings.MOCK_LLM_ENABLED,
+            answer_template=settings.MOCK_LLM_ANSWER_TEMPLATE,
+            answer_tokens=settings.MOCK_LLM_ANSWER_TOKENS,
+            latency=settings.MOCK_LLM_LATENCY,
+            latency_ms=settings.MOCK_LLM_LATENCY_MS,
+            latency_sigma=settings.MOCK_LLM_LATENCY_SIGMA,
+            latency_replay_file=settings.MOCK_LLM_LATENCY_REPLAY_FILE,
+            tokens_per_second=settings.MOCK_LLM_TOKENS_PER_SECOND,
+            error_rate=settings.MOCK_LLM_ERROR_RATE,
+            rate_limit_rate=settings.MOCK_LLM_RATE_LIMIT_RATE,
+            retry_after_seconds=settings.MOCK_LLM_RETRY_AFTER_SECONDS,
+            seed=settings.MOCK_LLM_SEED,
+        ),
+    ]
+    return {provider.name: provider for provider in providers}
+
+
+__all__ = [
+    "Completion",
+    "LLMProvider",
+    "Messages",
+    "TextStream",
+    "OpenAICompatibleProvider",
+    "AnthropicProvider",
+    "GoogleProvider",
+    "MockProvider",
+    "build_providers",
+]
@@ -0,0 +1,98 @@
+import json
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from core.http_clients import http_clients, llm_timeout
+from services.providers.base import Completion, LLMProvider, Messages, TextStream, split_system, sse_data
+
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def _usage(usage: dict) -> dict:
+    # input_tokens excludes the prompt tokens read from or written to the prompt cache
+    read = usage.get("cache_read_input_tokens") or 0
+    miss = usage.get("input_tokens", 0) + (usage.get("cache_creation_input_tokens") or 0)
+    return {
+        "prompt_tokens": read + miss,
+        "completion_tokens": usage.get("output_tokens", 0),
+        "prompt_cache_hit_tokens": read,
+        "prompt_cache_miss_tokens": miss,
+    }
+
+
+class _MessagesStream(TextStream):
+    def __init__(self, response: httpx.Response):
+        super().__init__()
+        self._response = response
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        try:
+            async for data in sse_data(self._response):
+                event = json.loads(data)
+                kind = event.get("type")
+                if kind == "message_start":
+                    self.usage = _usage(event["message"].get("usage", {}))
+                elif kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield event["delta"]["text"]
+                elif kind == "message_delta" and "usage" in event:
+                    self.usage["completion_tokens"] = event["usage"].get("output_tokens", 0)
+        finally:
+            await self._response.aclose()
+
+    async def aclose(self):
+        await self._response.aclose()
+
+
+class AnthropicProvider(LLMProvider):
+    """
+    Anthropic Messages API over the shared httpx pool (no SDK dependency)
+    """
+
+    name = "anthropic"
+    label = "Anthropic"
+
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.anthropic.com"):
+        super().__init__(api_key, model, base_url.rstrip("/"))
+        self.http = http_clients.llm
+
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        self.http = http_client
+
+    def _request(self, messages: Messages, max_tokens: int, temperature: float, stream: bool,
+                 timeout: Optional[httpx.Timeout], model: Optional[str]) -> httpx.Request:
+        system, chat = split_system(messages)
+        body = {
+            "model": model or self.model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": chat,
+            "stream": stream,
+        }
+        if system:
+            # Anthropic only caches prefixes up to an explicit breakpoint; the system prompt is the stable prefix
+            body["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return self.http.build_request(
+            "POST",
+            f"{self.base_url}/v1/messages",
+            json=body,
+            headers={"x-api-key": self.api_key, "anthropic-version": ANTHROPIC_VERSION},
+            timeout=timeout or llm_timeout(),
+        )
+
+    async def complete(self, messages: Messages, max_tokens: int, temperature: float,
+                       timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> Completion:
+        response = await self.http.send(self._request(messages, max_tokens, temperature, False, timeout, model))
+        response.raise_for_status()
+        data = response.json()
+        text = "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+        return Completion(text=text, model=data.get("model", model or self.model), usage=_usage(data.get("usage", {})))
+
+    async def open_stream(self, messages: Messages, max_tokens: int, temperature: float,
+                          timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> TextStream:
+        response = await self.http.send(self._request(messages, max_tokens, temperature, True, timeout, model), stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+        return _MessagesStream(response)
@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+Messages = List[Dict[str, str]]
+
+
+@dataclass
+class Completion:
+    """A finished, non-streamed completion"""
+    text: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+class TextStream:
+    """
+    Text deltas of a streamed completion.
+    Iterate for the text; usage is filled in once the provider reports it, usually at the end.
+    """
+
+    def __init__(self):
+        self.usage: Dict[str, int] = {}
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas()
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def aclose(self):
+        pass
+
+
+class LLMProvider:
+    """
+    Common async interface of the LLM provider adapters.
+
+    Adapters only translate requests and responses. Errors are raised as the underlying
+    client's exceptions (openai.APIStatusError, httpx.HTTPStatusError, httpx.TransportError),
+    which services.retry_policy.classify_error understands; retries, hedging and circuit
+    breaking are applied by LLMService around every adapter alike.
+    """
+
+    name = ""
+    label = ""
+
+    def __init__(self, api_key: str, model: str, base_url: str = ""):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        raise NotImplementedError
+
+    async def complete(self, messages: Messages, max_tokens: int, temperature: float,
+                       timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> Completion:
+        raise NotImplementedError
+
+    async def open_stream(self, messages: Messages, max_tokens: int, temperature: float,
+                          timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> TextStream:
+        """Start a streamed completion; returns once the provider has accepted the request"""
+        raise NotImplementedError
+
+
+def split_system(messages: Messages):
+    """Separate the system prompt for APIs that take it outside the message list"""
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    return system, [m for m in messages if m["role"] != "system"]
+
+
+async def sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """data: payloads of a server-sent event stream"""
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            yield line[5:].strip()
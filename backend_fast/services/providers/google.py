@@ -0,0 +1,102 @@
+import json
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from core.http_clients import http_clients, llm_timeout
+from services.providers.base import Completion, LLMProvider, Messages, TextStream, split_system, sse_data
+
+
+def _usage(metadata: dict) -> dict:
+    usage = {
+        "prompt_tokens": metadata.get("promptTokenCount", 0),
+        "completion_tokens": metadata.get("candidatesTokenCount", 0),
+    }
+    # promptTokenCount includes the part served from cached content
+    if "cachedContentTokenCount" in metadata:
+        usage["prompt_cache_hit_tokens"] = metadata["cachedContentTokenCount"]
+        usage["prompt_cache_miss_tokens"] = usage["prompt_tokens"] - metadata["cachedContentTokenCount"]
+    return usage
+
+
+def _text(data: dict) -> str:
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+class _GenerateStream(TextStream):
+    def __init__(self, response: httpx.Response):
+        super().__init__()
+        self._response = response
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        try:
+            async for data in sse_data(self._response):
+                event = json.loads(data)
+                if "usageMetadata" in event:
+                    self.usage = _usage(event["usageMetadata"])
+                text = _text(event)
+                if text:
+                    yield text
+        finally:
+            await self._response.aclose()
+
+    async def aclose(self):
+        await self._response.aclose()
+
+
+class GoogleProvider(LLMProvider):
+    """
+    Google Gemini generateContent API over the shared httpx pool (no SDK dependency)
+    """
+
+    name = "google"
+    label = "Google Gemini"
+
+    def __init__(self, api_key: str, model: str, base_url: str = "https://generativelanguage.googleapis.com"):
+        super().__init__(api_key, model, base_url.rstrip("/"))
+        self.http = http_clients.llm
+
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        self.http = http_client
+
+    def _request(self, messages: Messages, max_tokens: int, temperature: float, method: str,
+                 timeout: Optional[httpx.Timeout], model: Optional[str], params: Optional[dict] = None) -> httpx.Request:
+        system, chat = split_system(messages)
+        body = {
+            "contents": [
+                {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+                for m in chat
+            ],
+            "generationConfig": {"maxOutputTokens": max_tokens, "temperature": temperature},
+        }
+        if system:
+            body["systemInstruction"] = {"parts": [{"text": system}]}
+        return self.http.build_request(
+            "POST",
+            f"{self.base_url}/v1beta/models/{model or self.model}:{method}",
+            json=body,
+            params=params,
+            headers={"x-goog-api-key": self.api_key},
+            timeout=timeout or llm_timeout(),
+        )
+
+    async def complete(self, messages: Messages, max_tokens: int, temperature: float,
+                       timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> Completion:
+        response = await self.http.send(self._request(messages, max_tokens, temperature, "generateContent", timeout, model))
+        response.raise_for_status()
+        data = response.json()
+        return Completion(text=_text(data), model=model or self.model, usage=_usage(data.get("usageMetadata", {})))
+
+    async def open_stream(self, messages: Messages, max_tokens: int, temperature: float,
+                          timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> TextStream:
+        request = self._request(messages, max_tokens, temperature, "streamGenerateContent", timeout, model, params={"alt": "sse"})
+        response = await self.http.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+        return _GenerateStream(response)
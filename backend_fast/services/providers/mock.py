@@ -0,0 +1,232 @@
+import asyncio
+import json
+import logging
+import math
+import random
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from core.database import SessionLocal, SessionModel
+from core.http_clients import llm_timeout
+from services.providers.base import Completion, LLMProvider, Messages, TextStream
+from services.token_accounting import estimate_prompt_tokens, estimate_tokens
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+FIXED = "fixed"
+LOGNORMAL = "lognormal"
+REPLAY = "replay"
+LATENCY_DISTRIBUTIONS = (FIXED, LOGNORMAL, REPLAY)
+
+DEFAULT_ANSWER = "\n".join([
+    "Mock answer to: {question}",
+    "",
+    "1. Visa requirements: check whether your nationality needs a visa before you travel.",
+    "2. Passport: valid for at least six months beyond your stay, with two blank pages.",
+    "3. Supporting documents: return ticket, proof of accommodation and sufficient funds.",
+])
+
+_FILLER = (
+    "Requirements can change at short notice, so confirm the details with the embassy or consulate "
+    "of your destination before you book."
+)
+
+
+def _request(method: str = "POST") -> httpx.Request:
+    return httpx.Request(method, "http://mock.invalid/v1/chat/completions")
+
+
+def _status_error(status_code: int, headers: Optional[dict] = None) -> httpx.HTTPStatusError:
+    """An error shaped like a real provider's, so retries and circuit breaking treat it the same way"""
+    request = _request()
+    response = httpx.Response(status_code, headers=headers, json={"error": {"message": "Injected by mock provider"}},
+                              request=request)
+    return httpx.HTTPStatusError(f"Mock provider returned {status_code}", request=request, response=response)
+
+
+def recorded_latencies(limit: int = 10000) -> List[float]:
+    """response_time_ms of the most recent answered, uncached sessions"""
+    db = SessionLocal()
+    try:
+        rows = db.query(SessionModel.response_time_ms).filter(
+            SessionModel.is_successful == True,
+            SessionModel.cache_hit == False,
+            SessionModel.response_time_ms > 0
+        ).order_by(SessionModel.id.desc()).limit(limit).all()
+        return [float(ms) for (ms,) in rows]
+    finally:
+        db.close()
+
+
+def _latencies_from_file(path: str) -> List[float]:
+    """Milliseconds as a JSON list or one number per line"""
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        values = json.loads(content)
+    else:
+        values = [line.split(",")[-1] for line in content.splitlines() if line.strip()]
+    samples = []
+    for value in values:
+        try:
+            samples.append(float(value))
+        except (TypeError, ValueError):
+            continue  # e.g. a CSV header
+    return [ms for ms in samples if ms > 0]
+
+
+class _MockStream(TextStream):
+    def __init__(self, words: List[str], delay: float, usage: dict):
+        super().__init__()
+        self._words = words
+        self._delay = delay
+        self._usage = usage
+        self._closed = False
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        for index, word in enumerate(self._words):
+            if self._closed:
+                return
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            yield word if index == 0 else " " + word
+        self.usage = self._usage
+
+    async def aclose(self):
+        self._closed = True
+
+
+class MockProvider(LLMProvider):
+    """
+    Local stand-in for an LLM provider, for load tests and offline development.
+
+    Answers are rendered from a template and padded to a set length, and nothing leaves the process.
+    Latency is sampled from a fixed value, a lognormal distribution (latency_ms is the median), or
+    replayed from recorded response times: latency_replay_file, or the response_time_ms of stored
+    sessions when no file is given. A sampled latency is the time of the whole completion; streams
+    spread it out, emitting words at tokens_per_second after the rest has passed as time to first
+    token. Injected errors are raised as httpx.HTTPStatusError like the real adapters', so they go
+    through retries, failover and circuit breaking. The random source is seeded for repeatable runs.
+    """
+
+    name = "mock"
+    label = "Mock LLM"
+
+    def __init__(
+        self,
+        enabled: bool,
+        model: str = "mock-1",
+        answer_template: str = DEFAULT_ANSWER,
+        answer_tokens: int = 300,
+        latency: str = FIXED,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        latency_replay_file: str = "",
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_seconds: float = 1.0,
+        seed: int = 0,
+    ):
+        super().__init__("", model)
+        self.enabled = enabled
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown mock latency distribution '{latency}', expected one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.answer_template = answer_template or DEFAULT_ANSWER
+        self.answer_tokens = answer_tokens
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.latency_replay_file = latency_replay_file
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.random = random.Random(seed)
+        self._replay: Optional[List[float]] = None
+        self._replay_lock = asyncio.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return self.enabled
+
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        pass  # Nothing goes over the network
+
+    async def _load_replay(self) -> List[float]:
+        async with self._replay_lock:
+            if self._replay is None:
+                try:
+                    if self.latency_replay_file:
+                        self._replay = await run_in_threadpool(_latencies_from_file, self.latency_replay_file)
+                    else:
+                        self._replay = await run_in_threadpool(recorded_latencies)
+                except Exception as e:
+                    logger.error(f"Could not load recorded latencies for the mock provider: {e}")
+                    self._replay = []
+                if not self._replay:
+                    logger.warning(f"No recorded latencies to replay, the mock provider uses a fixed {self.latency_ms}ms")
+                else:
+                    logger.info(f"Mock provider replaying {len(self._replay)} recorded latencies")
+        return self._replay
+
+    async def sample_latency_ms(self) -> float:
+        if self.latency == LOGNORMAL:
+            return self.random.lognormvariate(math.log(max(self.latency_ms, 1.0)), self.latency_sigma)
+        if self.latency == REPLAY:
+            samples = self._replay if self._replay is not None else await self._load_replay()
+            if samples:
+                return self.random.choice(samples)
+        return self.latency_ms
+
+    def _answer(self, messages: Messages, max_tokens: int) -> List[str]:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        text = self.answer_template.format(question=question, model=self.model)
+        limit = min(self.answer_tokens, max_tokens) if self.answer_tokens > 0 else max_tokens
+        while estimate_tokens(text) < limit:
+            text += " " + _FILLER
+        words = text.split(" ")
+        # Trim to the token limit, as a provider stops at max_tokens
+        while len(words) > 1 and estimate_tokens(" ".join(words)) > limit:
+            words = words[:max(1, int(len(words) * 0.9))]
+        return words
+
+    async def _begin(self, timeout: Optional[httpx.Timeout]) -> float:
+        """Inject an error or return the sampled latency in seconds, waiting out a read timeout like a real call"""
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            raise _status_error(429, {"retry-after": str(self.retry_after_seconds)})
+        latency = await self.sample_latency_ms() / 1000
+        read_timeout = (timeout or llm_timeout()).read
+        if read_timeout is not None and latency > read_timeout:
+            await asyncio.sleep(read_timeout)
+            raise httpx.ReadTimeout("Mock provider timed out", request=_request())
+        if roll < self.rate_limit_rate + self.error_rate:
+            await asyncio.sleep(latency)
+            raise _status_error(500)
+        return latency
+
+    def _usage(self, messages: Messages, text: str) -> dict:
+        return {"prompt_tokens": estimate_prompt_tokens(messages), "completion_tokens": estimate_tokens(text)}
+
+    async def complete(self, messages: Messages, max_tokens: int, temperature: float,
+                       timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> Completion:
+        latency = await self._begin(timeout)
+        text = " ".join(self._answer(messages, max_tokens))
+        await asyncio.sleep(latency)
+        return Completion(text=text, model=model or self.model, usage=self._usage(messages, text))
+
+    async def open_stream(self, messages: Messages, max_tokens: int, temperature: float,
+                          timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> TextStream:
+        latency = await self._begin(timeout)
+        words = self._answer(messages, max_tokens)
+        text = " ".join(words)
+        delay = 0.0
+        if self.tokens_per_second > 0:
+            delay = estimate_tokens(text) / self.tokens_per_second / len(words)
+        # Whatever the words do not take up is time to first token
+        await asyncio.sleep(max(0.0, latency - delay * len(words)))
+        return _MockStream(words, delay, self._usage(messages, text))
@@ -0,0 +1,87 @@
+from typing import AsyncIterator, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from core.http_clients import http_clients, llm_timeout
+from services.providers.base import Completion, LLMProvider, Messages, TextStream
+
+
+def _usage(usage) -> dict:
+    if usage is None:
+        return {}
+    data = usage.model_dump(exclude_none=True)
+    counts = {name: value for name, value in data.items() if isinstance(value, int)}
+    # DeepSeek reports prompt_cache_hit/miss_tokens itself; OpenAI nests the cached part in prompt_tokens_details
+    cached = (data.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached is not None and "prompt_cache_hit_tokens" not in counts:
+        counts["prompt_cache_hit_tokens"] = cached
+        counts["prompt_cache_miss_tokens"] = counts.get("prompt_tokens", 0) - cached
+    return counts
+
+
+class _ChatStream(TextStream):
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        async for chunk in self._stream:
+            if chunk.usage is not None:
+                self.usage = _usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    async def aclose(self):
+        await self._stream.close()
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Any chat completions API speaking the OpenAI protocol (OpenAI itself, DeepSeek)
+    """
+
+    def __init__(self, name: str, label: str, api_key: str, model: str, base_url: str = ""):
+        super().__init__(api_key, model, base_url)
+        self.name = name
+        self.label = label
+        self.client = AsyncOpenAI(
+            api_key=api_key or "not-configured",
+            base_url=base_url or None,
+            http_client=http_clients.llm,
+            timeout=llm_timeout(),
+            # Retries are ours (retry_policy), stacking the SDK's on top would hide latency
+            max_retries=0
+        )
+
+    def bind_http_client(self, http_client: httpx.AsyncClient):
+        self.client = self.client.with_options(http_client=http_client)
+
+    async def complete(self, messages: Messages, max_tokens: int, temperature: float,
+                       timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=False,
+            timeout=timeout or llm_timeout()
+        )
+        text = (response.choices[0].message.content or "") if response.choices else ""
+        return Completion(text=text, model=response.model or model or self.model, usage=_usage(response.usage))
+
+    async def open_stream(self, messages: Messages, max_tokens: int, temperature: float,
+                          timeout: Optional[httpx.Timeout] = None, model: Optional[str] = None) -> TextStream:
+        stream = await self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout or llm_timeout()
+        )
+        return _ChatStream(stream)
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+from services.circuit_breaker import CircuitOpenError
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Error classes
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+AUTH = "auth"
+CLIENT_ERROR = "client_error"
+CIRCUIT_OPEN = "circuit_open"
+UNKNOWN = "unknown"
+
+RETRYABLE = frozenset({RATE_LIMITED, SERVER_ERROR, TIMEOUT, CONNECTION})
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request deadline had passed before the call was attempted; the provider was never reached"""
+
+
+def classify_error(e: BaseException) -> str:
+    """Classify a provider error by exception type and HTTP status code"""
+    if isinstance(e, CircuitOpenError):
+        return CIRCUIT_OPEN
+    code = None
+    if isinstance(e, openai.APIStatusError):
+        code = e.status_code
+    elif isinstance(e, httpx.HTTPStatusError):
+        code = e.response.status_code
+    if code is not None:
+        if code == 429:
+            return RATE_LIMITED
+        if code in (401, 403):
+            return AUTH
+        if code in (408, 409) or code >= 500:
+            return SERVER_ERROR
+        return CLIENT_ERROR
+    if isinstance(e, (openai.APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError)):
+        return TIMEOUT
+    if isinstance(e, (openai.APIConnectionError, httpx.TransportError)):
+        return CONNECTION
+    return UNKNOWN
+
+
+def retry_after_seconds(e: BaseException) -> Optional[float]:
+    """Server supplied delay from retry-after-ms / Retry-After (seconds or HTTP date), if any"""
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries, so retrying cannot multiply load on a provider that is down.
+
+    Over a sliding window, retries may be at most `ratio` of first attempts, plus a small
+    floor of min_per_second so a quiet process can still retry at all.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, window_seconds: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.exhausted = 0
+
+    def _trim(self, now: float):
+        horizon = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < horizon:
+                events.popleft()
+
+    def record_request(self):
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        allowed = self.min_per_second * self.window_seconds + self.ratio * len(self._requests)
+        if len(self._retries) + 1 > allowed:
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "ratio": self.ratio,
+            "window_seconds": self.window_seconds,
+            "requests_in_window": len(self._requests),
+            "retries_in_window": len(self._retries),
+            "exhausted": self.exhausted,
+        }
+
+
+class RetryPolicy:
+    """
+    Retries transient provider errors with decorrelated-jitter backoff.
+
+    Only rate limits, 5xx, timeouts and connection errors are retried. A Retry-After from the
+    provider overrides a shorter backoff, no attempt starts after the request deadline, and
+    every retry has to be paid for from the shared RetryBudget.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.25,
+        max_delay: float = 8.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+        self.attempts = 0
+        self.retries = 0
+        self.gave_up: Dict[str, int] = {}
+
+    def next_delay(self, previous: float) -> float:
+        # Decorrelated jitter: sleep = min(cap, random(base, previous * 3))
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+    def _give_up(self, reason: str):
+        self.gave_up[reason] = self.gave_up.get(reason, 0) + 1
+
+    async def run(self, call: Callable[[Optional[float]], Awaitable[T]], deadline: Optional[float] = None,
+                  pause: Optional[Callable[[], AsyncContextManager]] = None) -> T:
+        """
+        Run call(remaining_seconds) until it succeeds or retrying is pointless.
+        deadline is an absolute time.time() value; remaining_seconds is None without one.
+        Backoff sleeps run inside pause(), e.g. to hand back a bulkhead slot while waiting.
+        """
+        self.budget.record_request()
+        delay = self.base_delay
+        retry = 0
+        last_error: Optional[Exception] = None
+
+        while True:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                if last_error is not None:
+                    self._give_up("deadline")
+                    raise last_error
+                raise DeadlineExceeded("LLM request deadline exceeded")
+
+            self.attempts += 1
+            try:
+                return await call(remaining)
+            except Exception as e:
+                last_error = e
+                error_class = classify_error(e)
+                if error_class not in RETRYABLE:
+                    raise
+                if retry >= self.max_retries:
+                    self._give_up("attempts")
+                    raise
+
+                delay = self.next_delay(delay)
+                hint = retry_after_seconds(e)
+                if hint is not None:
+                    delay = max(delay, hint)
+                if deadline is not None and time.time() + delay >= deadline:
+                    self._give_up("deadline")
+                    raise
+                if not self.budget.try_spend():
+                    self._give_up("budget")
+                    raise
+
+                retry += 1
+                self.retries += 1
+                logger.warning(f"Retrying LLM call after {error_class} in {delay:.2f}s (retry {retry}/{self.max_retries})")
+                if pause is None:
+                    await asyncio.sleep(delay)
+                else:
+                    async with pause():
+                        await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_retries": self.max_retries,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "gave_up": dict(self.gave_up),
+            "budget": self.budget.stats(),
+        }
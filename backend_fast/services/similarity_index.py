@@ -0,0 +1,295 @@
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from services.answer_cache import normalize_question
+
+# (code, country names, nationality words) of common origins and destinations. A nationality
+# becomes nat_<code>, residency res_<code>, "from <country>" from_<code> and any other country
+# name to_<code>, so "as an American", "US citizens" and "American passport holders" are one term,
+# while "Japanese going to China" differs from "Chinese going to Japan", "from Japan to China"
+# from "from China to Japan", and "US resident" from "US citizen".
+COUNTRIES = [
+    ("us", ["united states of america", "united states", "usa", "america", "the us"], ["american", "americans"]),
+    ("uk", ["united kingdom", "great britain", "britain", "england", "the uk"], ["british", "brits", "briton", "britons"]),
+    ("jp", ["japan"], ["japanese"]),
+    ("cn", ["china"], ["chinese"]),
+    ("in", ["india"], ["indian", "indians"]),
+    ("de", ["germany"], ["german", "germans"]),
+    ("fr", ["france"], ["french"]),
+    ("it", ["italy"], ["italian", "italians"]),
+    ("es", ["spain"], ["spanish", "spaniards"]),
+    ("nl", ["netherlands", "holland"], ["dutch"]),
+    ("ie", ["ireland"], ["irish"]),
+    ("pl", ["poland"], ["polish", "poles"]),
+    ("ru", ["russia"], ["russian", "russians"]),
+    ("tr", ["turkey", "turkiye"], ["turkish"]),
+    ("ca", ["canada"], ["canadian", "canadians"]),
+    ("mx", ["mexico"], ["mexican", "mexicans"]),
+    ("br", ["brazil"], ["brazilian", "brazilians"]),
+    ("ar", ["argentina"], ["argentine", "argentinian", "argentinians"]),
+    ("cl", ["chile"], ["chilean", "chileans"]),
+    ("pe", ["peru"], ["peruvian", "peruvians"]),
+    ("co", ["colombia"], ["colombian", "colombians"]),
+    ("au", ["australia"], ["australian", "australians"]),
+    ("nz", ["new zealand"], ["new zealander", "new zealanders", "kiwi", "kiwis"]),
+    ("kr", ["south korea", "korea"], ["south korean", "south koreans", "korean", "koreans"]),
+    ("vn", ["vietnam", "viet nam"], ["vietnamese"]),
+    ("th", ["thailand"], ["thai"]),
+    ("ph", ["philippines"], ["filipino", "filipinos", "filipina", "philippine"]),
+    ("id", ["indonesia"], ["indonesian", "indonesians"]),
+    ("sg", ["singapore"], ["singaporean", "singaporeans"]),
+    ("pk", ["pakistan"], ["pakistani", "pakistanis"]),
+    ("ae", ["united arab emirates", "uae", "dubai"], ["emirati", "emiratis"]),
+    ("eg", ["egypt"], ["egyptian", "egyptians"]),
+    ("ng", ["nigeria"], ["nigerian", "nigerians"]),
+    ("ke", ["kenya"], ["kenyan", "kenyans"]),
+    ("za", ["south africa"], ["south african", "south africans"]),
+]
+
+# Words that do not change what a travel question asks. Question words (what, when, where, who,
+# which, how) are not among them: "when to apply" and "where to apply" have different answers.
+STOPWORDS = frozenset("""
+a am an and any are as at be can do does for from get go going i if im in into is it me my
+need needs needed necessary of on or our require required requires should that the there this
+to travel traveling travelling trip us visit visiting we will with
+you your enter
+""".split())
+
+_HOLDER = r"(?:citizens?|nationals?|passport holders?|passports?)"
+_RESIDENT = r"(?:residents?|residency)"
+
+# Ordered word pairs are scored alongside single terms, at this weight relative to a term. They
+# keep some word order, yet a reordered paraphrase ("a Japan visa" for "a visa for Japan") still
+# shares every single term.
+BIGRAM_WEIGHT = 0.35
+
+
+def _alternatives(words: List[str]) -> str:
+    # Longest first, so "south korea" wins over "korea"
+    return "|".join(sorted((re.escape(word) for word in words), key=len, reverse=True))
+
+
+def _rules() -> List[Tuple["re.Pattern", str]]:
+    # Phases run in order over the whole text: residency before nationality ("American resident"
+    # is not a citizen), and "from <country>" before the catch-all destination rule
+    residency, nationality, origin, destination = [], [], [], []
+    for code, names, nationalities in COUNTRIES:
+        # Bare "us"/"uk" only count as countries in front of citizens, passports and the like
+        holder_names = _alternatives(names + ([code] if code in ("us", "uk") else []))
+        names_pattern = _alternatives(names)
+        nationalities_pattern = _alternatives(nationalities)
+        # "permanent" survives as a term of its own: "US permanent resident" is "permanent res_us"
+        residency.append((re.compile(rf"\b(?:{holder_names}|{nationalities_pattern}) (permanent )?{_RESIDENT}\b"),
+                          rf" \1res_{code} "))
+        residency.append((re.compile(rf"\b{_RESIDENT} (?:of|in) (?:the )?(?:{names_pattern})\b"), f" res_{code} "))
+        nationality.append((re.compile(rf"\b(?:{nationalities_pattern})(?: {_HOLDER})?\b"), f" nat_{code} "))
+        nationality.append((re.compile(rf"\b(?:{holder_names}) {_HOLDER}\b"), f" nat_{code} "))
+        nationality.append((re.compile(rf"\b{_HOLDER} (?:of|from) (?:the )?(?:{names_pattern})\b"), f" nat_{code} "))
+        origin.append((re.compile(rf"\bfrom (?:the )?(?:{names_pattern})\b"), f" from_{code} "))
+        destination.append((re.compile(rf"\b(?:{names_pattern})\b"), f" to_{code} "))
+    return residency + nationality + origin + destination
+
+
+_RULES = _rules()
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping; enough for visas/visa, documents/document, travelling/travel"""
+    if word.startswith(("nat_", "res_", "from_", "to_")):
+        return word
+    if word.endswith("ing") and len(word) > 5:
+        word = word[:-3]
+        if word[-1] == word[-2]:
+            word = word[:-1]
+    elif word.endswith("ed") and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def question_terms(normalized: str) -> List[str]:
+    """Canonical content terms of a normalized question"""
+    text = f" {normalized} "
+    for pattern, replacement in _RULES:
+        text = pattern.sub(replacement, text)
+    terms = (_stem(word) for word in text.split() if word not in STOPWORDS)
+    return [term for term in terms if term not in STOPWORDS]
+
+
+def _hash64(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(normalized: str) -> Dict[str, float]:
+    """Weighted features of a question: its canonical terms and, at BIGRAM_WEIGHT, ordered pairs of them"""
+    terms = question_terms(normalized)
+    weights: Dict[str, float] = Counter(terms)
+    for first, second in zip(terms, terms[1:]):
+        pair = f"{first} {second}"
+        weights[pair] = weights.get(pair, 0.0) + BIGRAM_WEIGHT
+    return weights
+
+
+def term_vector(normalized: str) -> Dict[int, float]:
+    """Unit-length vector of hashed shingle weights"""
+    weights: Dict[int, float] = {}
+    for feature, weight in shingles(normalized).items():
+        key = _hash64(feature)
+        weights[key] = weights.get(key, 0.0) + weight
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {key: weight / norm for key, weight in weights.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two unit vectors"""
+    if len(b) < len(a):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+
+@dataclass
+class NearDuplicateMatch:
+    cache_key: str
+    similarity: float
+    question: str
+
+
+@dataclass
+class _Entry:
+    namespace: str
+    normalized: str
+    cache_key: str
+    vector: Dict[int, float]
+
+
+class NearDuplicateIndex:
+    """
+    Local near-duplicate index over previously answered questions.
+
+    Questions are reduced to canonical terms (nationality, residency, origin and destination as
+    codes, filler words dropped, plurals and verb forms stemmed) and scored by the cosine
+    similarity of hashed shingle vectors: each term plus, at BIGRAM_WEIGHT, each ordered pair of
+    adjacent terms, so word order counts without making reworded paraphrases miss. So "Do I need a
+    visa for Japan as an American?" and "Do US citizens need a Japan visa?" are the same question,
+    while "when should I apply" and "where should I apply" are not. The default threshold of 0.9
+    sits in the gap of the labelled pairs in tests/test_similarity_index.py: paraphrases score
+    0.92 or more, non-paraphrases (one changed word, swapped routes, resident vs citizen) 0.83
+    or less.
+
+    Candidates come from an inverted index with a prefix filter: the query's rarest terms are
+    looked up until the weight of the rest could not reach the threshold on its own, so a lookup
+    never scans postings of common terms like "visa". Memory is bounded by max_entries; the
+    oldest questions are evicted first.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._postings: Dict[Tuple[str, int], Set[int]] = {}
+        self._by_question: Dict[Tuple[str, str], int] = {}
+        self._next_id = 0
+
+        self.lookups = 0
+        self.matches = 0
+
+    def add(self, question: str, cache_key: str, namespace: str = ""):
+        """Index an answered question; cache_key points at its answer in the answer cache"""
+        normalized = normalize_question(question)
+        vector = term_vector(normalized)
+        if not vector:
+            return
+
+        existing = self._by_question.get((namespace, normalized))
+        if existing is not None:
+            self._remove(existing)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(namespace, normalized, cache_key, vector)
+        self._by_question[(namespace, normalized)] = entry_id
+        for term in vector:
+            self._postings.setdefault((namespace, term), set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._by_question.pop((entry.namespace, entry.normalized), None)
+        for term in entry.vector:
+            posting = self._postings.get((entry.namespace, term))
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[(entry.namespace, term)]
+
+    def discard(self, cache_key: str):
+        """Forget entries pointing at an answer that is no longer cached"""
+        for entry_id in [i for i, entry in self._entries.items() if entry.cache_key == cache_key]:
+            self._remove(entry_id)
+
+    def _candidates(self, vector: Dict[int, float], namespace: str) -> Set[int]:
+        # An entry sharing none of the looked-up terms scores at most the norm of the rest
+        terms = sorted(vector, key=lambda term: len(self._postings.get((namespace, term), ())))
+        remaining = sum(weight * weight for weight in vector.values())
+        candidates: Set[int] = set()
+        for term in terms:
+            if math.sqrt(max(remaining, 0.0)) < self.threshold:
+                break
+            candidates.update(self._postings.get((namespace, term), ()))
+            remaining -= vector[term] * vector[term]
+        return candidates
+
+    def lookup(self, question: str, namespace: str = "") -> Optional[NearDuplicateMatch]:
+        """Return the most similar indexed question above the threshold, if any"""
+        self.lookups += 1
+        vector = term_vector(normalize_question(question))
+        if not vector:
+            return None
+
+        best = None
+        for entry_id in self._candidates(vector, namespace):
+            entry = self._entries[entry_id]
+            similarity = cosine(vector, entry.vector)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = NearDuplicateMatch(entry.cache_key, similarity, entry.normalized)
+
+        if best is not None:
+            self.matches += 1
+        return best
+
+    def clear(self):
+        self._entries.clear()
+        self._postings.clear()
+        self._by_question.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "terms": len(self._postings),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "match_rate": round(self.matches / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+# Create the index instance
+near_duplicate_index = NearDuplicateIndex(
+    threshold=settings.NEAR_DUP_THRESHOLD,
+    max_entries=settings.NEAR_DUP_MAX_ENTRIES,
+)
@@ -0,0 +1,150 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Characters that usually take a token each (CJK, kana, hangul)
+_WIDE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+# Chat formatting overhead per message and per request, as in OpenAI's published counts
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough local token count for text, without a tokenizer.
+    English BPE averages about four characters per token; wide scripts are about one per character.
+    """
+    if not text:
+        return 0
+    wide = len(_WIDE.findall(text))
+    rest = _WIDE.sub("", text)
+    # Long words split into several tokens, short words and punctuation are one each
+    by_chars = len(rest) / 4
+    by_words = len(_WORD.findall(rest))
+    return wide + math.ceil(max(by_chars, by_words * 0.75))
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return TOKENS_PER_REQUEST + sum(TOKENS_PER_MESSAGE + estimate_tokens(m["content"]) for m in messages)
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int
+    completion_tokens: int
+    # True when the provider did not report usage and these are local estimates
+    estimated: bool = False
+    # Prompt tokens served from / missing the provider's prefix cache, None when it reports neither
+    prompt_cache_hit_tokens: Optional[int] = None
+    prompt_cache_miss_tokens: Optional[int] = None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def usage_from(reported: Dict[str, int], messages: List[Dict[str, str]], answer: str) -> TokenUsage:
+    """Provider reported usage, falling back to local estimates for what is missing"""
+    prompt = reported.get("prompt_tokens")
+    completion = reported.get("completion_tokens")
+    return TokenUsage(
+        prompt if prompt is not None else estimate_prompt_tokens(messages),
+        completion if completion is not None else estimate_tokens(answer),
+        estimated=prompt is None or completion is None,
+        prompt_cache_hit_tokens=reported.get("prompt_cache_hit_tokens"),
+        prompt_cache_miss_tokens=reported.get("prompt_cache_miss_tokens"),
+    )
+
+
+def cache_hit_ratio(hit_tokens: int, miss_tokens: int) -> Optional[float]:
+    total = hit_tokens + miss_tokens
+    return round(hit_tokens / total, 4) if total else None
+
+
+class _Totals:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "generation_ms", "cache_hit_tokens", "cache_miss_tokens")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.generation_ms = 0
+        self.cache_hit_tokens = 0
+        self.cache_miss_tokens = 0
+
+    def add(self, usage: TokenUsage, generation_ms: int):
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.generation_ms += generation_ms
+        self.cache_hit_tokens += usage.prompt_cache_hit_tokens or 0
+        self.cache_miss_tokens += usage.prompt_cache_miss_tokens or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "generation_ms": self.generation_ms,
+            "avg_completion_tokens": round(self.completion_tokens / self.requests, 1) if self.requests else 0.0,
+            "prompt_cache_hit_tokens": self.cache_hit_tokens,
+            "prompt_cache_miss_tokens": self.cache_miss_tokens,
+            "prompt_cache_hit_ratio": cache_hit_ratio(self.cache_hit_tokens, self.cache_miss_tokens),
+        }
+
+
+class TokenRollup:
+    """
+    In-process token and generation time rollups since startup: global, per tier, per provider,
+    per prompt version and per user. Persisted per-session counts in the database remain the source of truth.
+    stats() is aggregate only and safe for public metrics; top_users() names users and is for admins.
+    """
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self.total = _Totals()
+        self.by_tier: Dict[str, _Totals] = {}
+        self.by_provider: Dict[str, _Totals] = {}
+        self.by_prompt: Dict[str, _Totals] = {}
+        self.by_user: Dict[str, _Totals] = {}
+        self.estimated = 0
+
+    def record(self, user_id: Optional[str], tier: str, provider: str, usage: TokenUsage, generation_ms: int,
+               prompt: str = ""):
+        self.total.add(usage, generation_ms)
+        self.by_tier.setdefault(tier or "untiered", _Totals()).add(usage, generation_ms)
+        self.by_provider.setdefault(provider, _Totals()).add(usage, generation_ms)
+        if prompt:
+            self.by_prompt.setdefault(prompt, _Totals()).add(usage, generation_ms)
+        if usage.estimated:
+            self.estimated += 1
+
+        user = user_id or "anonymous"
+        if user not in self.by_user and len(self.by_user) >= self.max_users:
+            # Keep memory bounded: drop the lightest user
+            lightest = min(self.by_user, key=lambda u: self.by_user[u].completion_tokens)
+            del self.by_user[lightest]
+        self.by_user.setdefault(user, _Totals()).add(usage, generation_ms)
+
+    def top_users(self, limit: int = 10) -> List[Dict[str, Any]]:
+        heaviest = Counter({user: totals.generation_ms for user, totals in self.by_user.items()}).most_common(limit)
+        return [{"user_id": user, **self.by_user[user].as_dict()} for user, _ in heaviest]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.as_dict(),
+            "estimated_requests": self.estimated,
+            "by_tier": {name: totals.as_dict() for name, totals in self.by_tier.items()},
+            "by_provider": {name: totals.as_dict() for name, totals in self.by_provider.items()},
+            "by_prompt": {name: totals.as_dict() for name, totals in self.by_prompt.items()},
+            "users": len(self.by_user),
+        }
+
+
+# Create the rollup instance
+token_rollup = TokenRollup()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the app's modules the way main.py does, from the backend_fast directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
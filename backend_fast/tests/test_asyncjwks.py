@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from clerk_backend_api.jwks_helpers.asyncjwks import AsyncJWKSProvider
+from clerk_backend_api.jwks_helpers.verifytoken import (
+    TokenVerificationError,
+    TokenVerificationErrorReason,
+    VerifyTokenOptions,
+)
+
+
+def _jwks(*kids):
+    keys = []
+    for kid in kids:
+        public_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key()
+        jwk = json.loads(RSAAlgorithm.to_jwk(public_key))
+        jwk["kid"] = kid
+        keys.append(jwk)
+    return {"keys": keys}
+
+
+def _provider(jwks, min_refetch_interval=30.0):
+    fetches = []
+
+    def handler(request):
+        fetches.append(request.url.path)
+        return httpx.Response(200, json=jwks)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    provider = AsyncJWKSProvider(VerifyTokenOptions(secret_key="sk_test"), client=client,
+                                 min_refetch_interval=min_refetch_interval)
+    return provider, fetches
+
+
+def _reason(coroutine):
+    with pytest.raises(TokenVerificationError) as error:
+        asyncio.run(coroutine)
+    return error.value.reason
+
+
+def test_known_kid_is_fetched_once():
+    provider, fetches = _provider(_jwks("kid_a"))
+
+    async def run():
+        first = await provider.get_key("kid_a")
+        second = await provider.get_key("kid_a")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert "BEGIN PUBLIC KEY" in first
+    assert len(fetches) == 1
+
+
+def test_unknown_kid_after_refetch_is_a_mismatch():
+    provider, fetches = _provider(_jwks("kid_a"))
+
+    assert _reason(provider.get_key("kid_b")) == TokenVerificationErrorReason.JWK_KID_MISMATCH
+    assert len(fetches) == 1
+
+
+def test_unknown_kid_inside_refetch_interval_is_rate_limited_not_a_mismatch():
+    provider, fetches = _provider(_jwks("kid_a"))
+
+    async def run():
+        await provider.get_key("kid_a")
+        await provider.get_key("kid_rotated")
+
+    # The kid may belong to a freshly rotated key; the refetch is only deferred
+    assert _reason(run()) == TokenVerificationErrorReason.JWK_KID_REFETCH_RATE_LIMITED
+    assert len(fetches) == 1
+    assert provider.stats()["rate_limited"] == 1
+
+
+def test_unknown_kid_refetches_once_the_interval_has_passed():
+    provider, fetches = _provider(_jwks("kid_a"), min_refetch_interval=0.0)
+
+    async def run():
+        await provider.get_key("kid_a")
+        await provider.get_key("kid_b")
+
+    assert _reason(run()) == TokenVerificationErrorReason.JWK_KID_MISMATCH
+    assert len(fetches) == 2
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from services.bulkhead import Bulkhead, BulkheadFullError
+
+
+def _bulkhead(max_concurrent=1, max_queue=1, max_wait=1.0):
+    return Bulkhead("test", max_concurrent=max_concurrent, max_queue=max_queue, max_wait=max_wait)
+
+
+def test_limits_concurrency_and_serves_waiters_in_order():
+    bulkhead = _bulkhead(max_concurrent=2, max_queue=10)
+    running, peak, order = [0], [0], []
+
+    async def work(index):
+        async with bulkhead.slot():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            order.append(index)
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+    async def run():
+        await asyncio.gather(*(work(index) for index in range(6)))
+
+    asyncio.run(run())
+    assert peak[0] == 2
+    assert order == list(range(6))
+    assert bulkhead.stats()["active"] == 0
+
+
+def test_rejects_when_the_queue_is_full():
+    bulkhead = _bulkhead(max_queue=1)
+
+    async def run():
+        await bulkhead.acquire()
+        waiter = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError) as rejected:
+            await bulkhead.acquire()
+        bulkhead.release()
+        await waiter
+        return rejected.value
+
+    error = asyncio.run(run())
+    assert error.reason == "queue full"
+    assert error.retry_after >= 1
+    assert bulkhead.stats()["rejected"] == 1
+
+
+def test_queue_wait_times_out():
+    bulkhead = _bulkhead(max_wait=0.01)
+
+    async def run():
+        await bulkhead.acquire()
+        with pytest.raises(BulkheadFullError) as timed_out:
+            await bulkhead.acquire()
+        return timed_out.value
+
+    assert asyncio.run(run()).reason == "queue wait timed out"
+    assert bulkhead.stats()["queued"] == 0
+    assert bulkhead.stats()["timed_out"] == 1
+
+
+def test_try_acquire_never_waits():
+    bulkhead = _bulkhead()
+
+    assert bulkhead.try_acquire()
+    assert not bulkhead.try_acquire()
+    bulkhead.release()
+    assert bulkhead.stats()["active"] == 0
+
+
+def test_released_slot_is_usable_by_others_and_taken_back():
+    bulkhead = _bulkhead()
+    events = []
+
+    async def holder():
+        async with bulkhead.slot() as slot:
+            async with slot.released():
+                events.append(("paused", bulkhead.stats()["active"]))
+                await asyncio.sleep(0.02)
+            events.append(("resumed", slot.held))
+
+    async def other():
+        await asyncio.sleep(0.005)
+        async with bulkhead.slot():
+            events.append(("other", bulkhead.stats()["active"]))
+
+    async def run():
+        await asyncio.gather(holder(), other())
+
+    asyncio.run(run())
+    assert events == [("paused", 0), ("other", 1), ("resumed", True)]
+    assert bulkhead.stats()["active"] == 0
+
+
+def test_slot_released_and_not_taken_back_is_not_released_twice():
+    bulkhead = _bulkhead()
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with bulkhead.slot() as slot:
+                async with slot.released():
+                    raise RuntimeError("cancelled during backoff")
+
+    asyncio.run(run())
+    assert bulkhead.stats()["active"] == 0
+    assert bulkhead.try_acquire()
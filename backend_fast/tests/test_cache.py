@@ -0,0 +1,96 @@
+import pytest
+
+from clerk_backend_api.jwks_helpers import cache as cache_module
+from core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_get_returns_what_was_set(clock):
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_per_entry_ttl_is_capped_by_the_cache_ttl(clock):
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.set("short", 1, ttl=2)
+    cache.set("long", 2, ttl=60)
+    cache.set("never", 3, ttl=0)
+
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.get("never") is None
+    clock.now += 5
+    assert cache.get("long") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_set_sweeps_expired_entries_that_are_never_read(clock):
+    cache = TTLCache(maxsize=100, ttl=10, sweep_batch=8)
+    for index in range(5):
+        cache.set(index, index)
+
+    clock.now += 11
+    cache.set("fresh", 1)
+    assert len(cache) == 1
+
+
+def test_sweep_and_invalidation(clock):
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set("old", {"user": "u1"}, ttl=1)
+    cache.set("a", {"user": "u1"})
+    cache.set("b", {"user": "u2"})
+
+    clock.now += 2
+    assert cache.sweep() == 1
+    assert cache.invalidate_where(lambda value: value["user"] == "u1") == 1
+    assert cache.invalidate("b")
+    assert not cache.invalidate("b")
+    assert len(cache) == 0
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
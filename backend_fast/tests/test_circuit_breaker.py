@@ -0,0 +1,121 @@
+import pytest
+
+from services import circuit_breaker as circuit_breaker_module
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", clock)
+    return clock
+
+
+def _breaker(**kwargs):
+    kwargs.setdefault("window_size", 10)
+    kwargs.setdefault("minimum_calls", 4)
+    kwargs.setdefault("open_seconds", 30)
+    kwargs.setdefault("half_open_max_calls", 2)
+    return CircuitBreaker("test", **kwargs)
+
+
+def _trip(breaker):
+    for _ in range(breaker.minimum_calls):
+        breaker.acquire()
+        breaker.record(10, failed=True)
+
+
+def test_stays_closed_below_minimum_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(10, failed=True)
+
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate_and_rejects_calls(clock):
+    breaker = _breaker()
+    _trip(breaker)
+
+    assert breaker.state == OPEN
+    assert not breaker.allows_calls()
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.acquire()
+    assert rejected.value.retry_after == 30
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["last_opened_reason"] == "failure rate 100%"
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = _breaker(slow_call_ms=1000, slow_call_rate_threshold=0.5)
+    for duration in (10, 2000, 2000, 10):
+        breaker.record(duration, failed=False)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["last_opened_reason"] == "slow call rate 50%"
+
+
+def test_mostly_successful_calls_keep_it_closed(clock):
+    breaker = _breaker()
+    for failed in (True, False, False, False, True, False, False, False):
+        breaker.record(10, failed=failed)
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probes_close_it_again(clock):
+    breaker = _breaker()
+    _trip(breaker)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    breaker.acquire()
+    breaker.acquire()
+    # Only half_open_max_calls probes at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record(10, failed=False)
+    breaker.record(10, failed=False)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_opens_it_again(clock):
+    breaker = _breaker()
+    _trip(breaker)
+
+    clock.now += 30
+    breaker.acquire()
+    breaker.record(10, failed=True)
+    assert breaker.state == OPEN
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_guard_records_only_errors_that_count_as_failures(clock):
+    breaker = _breaker(is_failure=lambda e: not isinstance(e, ValueError))
+    for _ in range(4):
+        with pytest.raises(ValueError):
+            with breaker.guard():
+                raise ValueError("bad request, not the provider's fault")
+
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failure_rate"] == 0.0
+
+
+def test_cancelled_probe_gives_its_slot_back(clock):
+    breaker = _breaker(half_open_max_calls=1)
+    _trip(breaker)
+
+    clock.now += 30
+    with pytest.raises(KeyboardInterrupt):
+        with breaker.guard():
+            raise KeyboardInterrupt()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allows_calls()
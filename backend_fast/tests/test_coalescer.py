@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from services.coalescer import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert len(calls) == 1
+    assert flight.stats() == {"upstream_calls": 1, "upstream_calls_saved": 4, "in_flight": 0}
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+    assert flight.stats()["upstream_calls"] == 2
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing),
+                                       return_exceptions=True)
+        again = await flight.do("key", lambda: asyncio.sleep(0, "recovered"))
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert again == ("recovered", False)
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", lambda: asyncio.sleep(0.02, "answer")))
+        second = asyncio.ensure_future(flight.do("key", lambda: asyncio.sleep(0.02, "other")))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == ("answer", True)
+
+
+def test_caller_after_the_last_waiter_cancelled_starts_a_new_call():
+    flight = SingleFlight()
+    started = []
+
+    async def slow():
+        started.append(1)
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            # Cleanup keeps the cancelled call alive for a while after cancel()
+            await asyncio.sleep(0.02)
+            raise
+        return "stale"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert flight.stats()["in_flight"] == 0
+        return await flight.do("key", lambda: asyncio.sleep(0, "fresh"))
+
+    assert asyncio.run(run()) == ("fresh", False)
+    assert len(started) == 1
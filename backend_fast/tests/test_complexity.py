@@ -0,0 +1,66 @@
+import pytest
+
+from services.complexity import FAST, FULL, QuestionClassifier, Tier
+
+
+def _classifier(**kwargs):
+    return QuestionClassifier(Tier(FAST, 300, {"deepseek": "small-model"}), Tier(FULL, 1500, {}), **kwargs)
+
+
+@pytest.mark.parametrize("question", [
+    "Do I need a visa for Japan?",
+    "Is Peru visa-free for Chileans?",
+    "How long can Americans stay in Mexico?",
+])
+def test_short_factual_questions_get_the_fast_tier(question):
+    assert _classifier().classify(question).tier.name == FAST
+
+
+@pytest.mark.parametrize("question", [
+    "I am a German citizen planning an itinerary through Japan, China and Vietnam with a layover in "
+    "Seoul. What documents do I need for each country, and how do I apply?",
+    "Explain the process and documents required to get a work permit in Canada for my family",
+    "Compare visa requirements for Brazil versus Argentina",
+])
+def test_multi_part_questions_get_the_full_tier(question):
+    assert _classifier().classify(question).tier.name == FULL
+
+
+def test_features():
+    features = QuestionClassifier.features("Do I need a visa for Japan, China and Korea? how about Vietnam?")
+
+    assert features["extra_places"] == 2.0
+    assert features["extra_questions"] == 1.0
+    assert features["conjunctions"] == 2.0
+    assert features["factual_opener"] == 1.0
+
+
+def test_score_grows_with_complexity_cues():
+    classifier = _classifier()
+    plain = classifier.score(classifier.features("Visa for Japan"))
+    cued = classifier.score(classifier.features("Visa for Japan with a layover and transit"))
+
+    assert 0 < plain < cued < 1
+
+
+def test_threshold_moves_the_split():
+    question = "Compare visa requirements for Brazil versus Argentina"
+
+    assert _classifier(threshold=0.99).classify(question).tier.name == FAST
+
+
+def test_disabled_classifier_always_gives_the_full_tier():
+    classifier = _classifier(enabled=False)
+
+    assert classifier.classify("Do I need a visa for Japan?").tier.name == FULL
+    assert classifier.stats()["fast"] == 0
+
+
+def test_tier_models_and_stats():
+    classifier = _classifier()
+    classifier.classify("Do I need a visa for Japan?")
+    classifier.classify("Explain the process and documents required to get a work permit in Canada")
+
+    assert classifier.fast.model_for("deepseek") == "small-model"
+    assert classifier.fast.model_for("openai") is None
+    assert classifier.stats()["fast_rate"] == 0.5
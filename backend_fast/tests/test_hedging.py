@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from services.bulkhead import Bulkhead
+from services.hedging import HedgePolicy
+from services.retry_policy import RetryBudget
+
+
+def _policy(**kwargs):
+    # No samples yet, so the hedge delay is max_delay_ms
+    kwargs.setdefault("budget", RetryBudget(ratio=1.0, min_per_second=0, window_seconds=60))
+    return HedgePolicy(min_delay_ms=1, max_delay_ms=20, min_samples=5, **kwargs)
+
+
+class Attempts:
+    """call() whose attempts take the given seconds in turn and return their index"""
+
+    def __init__(self, *durations):
+        self.durations = list(durations)
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        index = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(self.durations[index])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return index
+
+
+def test_fast_call_is_not_hedged():
+    policy = _policy()
+    call = Attempts(0.001)
+
+    assert asyncio.run(policy.run(call)) == 0
+    assert call.started == 1
+    assert policy.stats()["hedged"] == 0
+
+
+def test_slow_call_is_hedged_and_the_faster_attempt_wins():
+    policy = _policy()
+    call = Attempts(1.0, 0.001)
+
+    assert asyncio.run(policy.run(call)) == 1
+    assert call.cancelled == 1
+    assert policy.stats()["hedged"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_hedge_delay_follows_the_latency_quantile():
+    policy = _policy(quantile=0.5)
+    for _ in range(5):
+        asyncio.run(policy.run(Attempts(0.005)))
+
+    assert 5 <= policy.delay_ms() < 20
+
+
+def test_no_hedge_without_budget():
+    policy = _policy(budget=RetryBudget(ratio=0.0, min_per_second=0))
+    call = Attempts(0.05, 0.001)
+
+    assert asyncio.run(policy.run(call)) == 0
+    assert call.started == 1
+    assert policy.stats()["over_budget"] == 1
+
+
+def test_hedge_takes_its_own_bulkhead_slot():
+    policy = _policy()
+    bulkhead = Bulkhead("test", max_concurrent=2, max_queue=0, max_wait=1.0)
+    call = Attempts(1.0, 0.001)
+
+    async def run():
+        async with bulkhead.slot():
+            result = await policy.run(call, bulkhead=bulkhead)
+            await asyncio.sleep(0)
+            return result, bulkhead.stats()["active"]
+
+    # The hedge's slot is back once it finished, the caller's is held until the block ends
+    assert asyncio.run(run()) == (1, 1)
+    assert bulkhead.stats()["active"] == 0
+
+
+def test_no_hedge_without_a_free_bulkhead_slot():
+    policy = _policy()
+    bulkhead = Bulkhead("test", max_concurrent=1, max_queue=0, max_wait=1.0)
+    call = Attempts(0.05, 0.001)
+
+    async def run():
+        async with bulkhead.slot():
+            return await policy.run(call, bulkhead=bulkhead)
+
+    assert asyncio.run(run()) == 0
+    assert call.started == 1
+    assert policy.stats()["no_slot"] == 1
+    assert policy.stats()["hedged"] == 0
+
+
+def test_losing_result_is_discarded():
+    policy = _policy()
+    discarded = []
+
+    async def run():
+        hedged = asyncio.Event()
+        started = []
+
+        async def call():
+            started.append(len(started))
+            if started[-1] == 0:
+                await hedged.wait()
+                return "primary stream"
+            hedged.set()
+            return "hedge stream"
+
+        async def discard(result):
+            discarded.append(result)
+
+        return await policy.run(call, discard=discard)
+
+    # Both attempts finish together; the primary's result is used and the hedge's released
+    assert asyncio.run(run()) == "primary stream"
+    assert discarded == ["hedge stream"]
+
+
+def test_primary_error_surfaces_when_every_attempt_fails():
+    policy = _policy()
+
+    async def call():
+        await asyncio.sleep(0.03)
+        raise ValueError("provider down")
+
+    with pytest.raises(ValueError):
+        asyncio.run(policy.run(call))
+    assert policy.stats()["hedged"] == 1
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.retry_policy import (
+    AUTH, CLIENT_ERROR, RATE_LIMITED, SERVER_ERROR, TIMEOUT,
+    DeadlineExceeded, RetryBudget, RetryPolicy, classify_error, retry_after_seconds,
+)
+
+
+def _status_error(status_code, headers=None):
+    request = httpx.Request("POST", "http://provider.invalid/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status_code}", request=request, response=response)
+
+
+class Flaky:
+    """A call that fails with the given errors in turn, then returns "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self, remaining):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def _policy(max_retries=2, budget=None):
+    return RetryPolicy(max_retries=max_retries, base_delay=0.001, max_delay=0.005,
+                       budget=budget or RetryBudget(min_per_second=100.0))
+
+
+@pytest.mark.parametrize("error, expected", [
+    (_status_error(429), RATE_LIMITED),
+    (_status_error(503), SERVER_ERROR),
+    (_status_error(401), AUTH),
+    (_status_error(400), CLIENT_ERROR),
+    (httpx.ReadTimeout("slow"), TIMEOUT),
+    (asyncio.TimeoutError(), TIMEOUT),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(_status_error(429, {"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_status_error(429)) is None
+
+
+def test_transient_errors_are_retried_until_success():
+    policy = _policy()
+    call = Flaky(_status_error(503), httpx.ConnectError("refused"))
+
+    assert asyncio.run(policy.run(call)) == "ok"
+    assert call.calls == 3
+    assert policy.stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    call = Flaky(_status_error(400))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_policy().run(call))
+    assert call.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    policy = _policy(max_retries=1)
+    call = Flaky(_status_error(503), _status_error(503), _status_error(503))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(policy.run(call))
+    assert call.calls == 2
+    assert policy.stats()["gave_up"] == {"attempts": 1}
+
+
+def test_no_retry_when_the_backoff_would_pass_the_deadline():
+    policy = _policy()
+    call = Flaky(_status_error(429, {"retry-after": "10"}))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(policy.run(call, deadline=time.time() + 1))
+    assert call.calls == 1
+    assert policy.stats()["gave_up"] == {"deadline": 1}
+
+
+def test_spent_deadline_raises_without_calling():
+    call = Flaky()
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(_policy().run(call, deadline=time.time() - 1))
+    assert call.calls == 0
+
+
+def test_deadline_passing_between_attempts_raises_the_last_error():
+    error = _status_error(503)
+
+    async def slow_failure(remaining):
+        await asyncio.sleep(0.05)
+        raise error
+
+    # The provider was reached, so the caller sees its error rather than DeadlineExceeded
+    with pytest.raises(httpx.HTTPStatusError) as raised:
+        asyncio.run(_policy().run(slow_failure, deadline=time.time() + 0.052))
+    assert raised.value is error
+
+
+def test_budget_limits_retries_to_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, window_seconds=10.0)
+    for _ in range(4):
+        budget.record_request()
+
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.stats()["exhausted"] == 1
+
+
+def test_exhausted_budget_stops_retrying():
+    policy = _policy(budget=RetryBudget(ratio=0.0, min_per_second=0.0))
+    call = Flaky(_status_error(503))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(policy.run(call))
+    assert call.calls == 1
+    assert policy.stats()["gave_up"] == {"budget": 1}
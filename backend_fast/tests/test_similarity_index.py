@@ -0,0 +1,101 @@
+import pytest
+
+from services.similarity_index import NearDuplicateIndex, question_terms
+
+# Labelled pairs the default threshold was calibrated on
+PARAPHRASES = [
+    ("Do I need a visa for Japan as an American?", "Do US citizens need a Japan visa?"),
+    ("What documents do I need to travel to Japan?", "What documents do I need for travel to Japan?"),
+    ("Do Americans need a visa for Japan?", "Is a visa required for Americans visiting Japan?"),
+    ("Do I need a visa to visit Peru as a Chilean?", "Do Chilean citizens need a visa for Peru?"),
+    ("Does a British passport holder need a visa for Turkey?", "Do UK citizens need a visa for Turkey?"),
+    ("Do Canadians need an eTA for the UK?", "Do Canadian citizens need an ETA to visit the United Kingdom?"),
+    ("How many blank pages does my passport need for South Africa?", "How many blank passport pages do I need for South Africa?"),
+    ("Do Filipinos need a visa for Singapore?", "Do Philippine passport holders need a visa for Singapore?"),
+    ("Do I need a visa to travel from Japan to China?", "Do I need a visa to travel to China from Japan?"),
+    ("Can I drive from Canada to the US?", "Can I drive from Canada into the United States?"),
+    ("Do US residents need a visa for Mexico?", "Do residents of the United States need a visa for Mexico?"),
+    ("When should I apply for a Japan visa?", "When should I apply for a visa for Japan?"),
+]
+
+DIFFERENT_QUESTIONS = [
+    ("Do I need a visa for Japan?", "Do I need a visa for China?"),
+    ("Do Americans need a visa for Japan?", "Do Indians need a visa for Japan?"),
+    ("Do Japanese need a visa for China?", "Do Chinese need a visa for Japan?"),
+    ("How long can Americans stay in Japan without a visa?", "Do Americans need a visa for Japan?"),
+    ("Do I need a visa for Japan?", "Do I need a visa for Japan as an American?"),
+    ("Can I work in Canada on a tourist visa?", "Do I need a tourist visa for Canada?"),
+    ("Do US citizens need a passport for Mexico?", "Do US citizens need a visa for Mexico?"),
+    ("Do children need a passport to travel to Canada?", "Do adults need a passport to travel to Canada?"),
+    # Swapped routes
+    ("Do I need a visa to travel from Japan to China?", "Do I need a visa to travel from China to Japan?"),
+    ("Can I drive from Canada to the US?", "Can I drive from the US to Canada?"),
+    # Residency is not citizenship
+    ("Do I need a visa for Japan if I am a US resident?", "Do I need a visa for Japan if I am a US citizen?"),
+    # Question words change the answer
+    ("When should I apply for a Japan visa?", "Where should I apply for a Japan visa?"),
+    ("Who needs a visa for Japan?", "Do I need a visa for Japan?"),
+]
+
+
+@pytest.mark.parametrize("indexed, asked", PARAPHRASES)
+def test_paraphrases_match(indexed, asked):
+    index = NearDuplicateIndex()
+    index.add(indexed, "answer-key")
+    match = index.lookup(asked)
+    assert match is not None
+    assert match.cache_key == "answer-key"
+
+
+@pytest.mark.parametrize("indexed, asked", DIFFERENT_QUESTIONS)
+def test_different_questions_do_not_match(indexed, asked):
+    index = NearDuplicateIndex()
+    index.add(indexed, "answer-key")
+    assert index.lookup(asked) is None
+
+
+def test_nationality_and_destination_are_distinct_terms():
+    assert "nat_jp" in question_terms("do japanese need a visa for china")
+    assert "to_cn" in question_terms("do japanese need a visa for china")
+    assert question_terms("do us citizens need a japan visa") == ["nat_us", "to_jp", "visa"]
+
+
+def test_origin_and_residency_are_distinct_terms():
+    assert question_terms("do i need a visa to travel from japan to china") == ["visa", "from_jp", "to_cn"]
+    assert question_terms("can i drive from the us to canada") == ["drive", "from_us", "to_ca"]
+    assert question_terms("do us residents need a visa") == ["res_us", "visa"]
+    assert question_terms("do us permanent residents need a visa") == ["permanent", "res_us", "visa"]
+    assert question_terms("when should i apply for a japan visa")[0] == "when"
+
+
+def test_one_changed_word_is_never_an_exact_hit():
+    index = NearDuplicateIndex(threshold=0.0)
+    index.add("When should I apply for a Japan visa?", "answer-key")
+    assert index.lookup("Where should I apply for a Japan visa?").similarity < 0.9
+
+
+def test_best_match_wins_among_candidates():
+    index = NearDuplicateIndex()
+    index.add("Do Americans need a visa for China?", "china")
+    index.add("Do Americans need a visa for Japan?", "japan")
+    index.add("How long can Americans stay in Japan without a visa?", "stay")
+    assert index.lookup("Do US citizens need a Japan visa?").cache_key == "japan"
+
+
+def test_namespaces_are_separate():
+    index = NearDuplicateIndex()
+    index.add("Do Americans need a visa for Japan?", "answer-key", namespace="deepseek|full")
+    assert index.lookup("Do Americans need a visa for Japan?", namespace="openai|full") is None
+    assert index.lookup("Do Americans need a visa for Japan?", namespace="deepseek|full") is not None
+
+
+def test_discard_and_eviction():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("Do I need a visa for Japan?", "japan")
+    index.add("Do I need a visa for China?", "china")
+    index.add("Do I need a visa for Peru?", "peru")
+    assert index.lookup("Do I need a visa for Japan?") is None
+    index.discard("china")
+    assert index.lookup("Do I need a visa for China?") is None
+    assert index.lookup("Do I need a visa for Peru?").cache_key == "peru"
+    assert index.stats()["entries"] == 1